@@ -0,0 +1 @@
+"""Synthetic dealership data and repeatable benchmarks for the backend hot paths."""
@@ -0,0 +1,47 @@
+import sys
+import json
+import argparse
+from typing import List
+
+############################ COMPARE BENCHMARK RUNS #########################
+#   python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+# Prints the median of every benchmark in both runs; exits 1 if any got slower
+# by more than the threshold (a fraction of the baseline median).
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> List[dict]:
+    rows = []
+    for name, base in baseline["benchmarks"].items():
+        new = candidate["benchmarks"].get(name)
+        if new is None:
+            continue
+        change = (new["median"] - base["median"]) / base["median"] if base["median"] else 0.0
+        rows.append({"name": name, "baseline": base["median"], "candidate": new["median"],
+                     "change": change, "regression": change > threshold})
+    return rows
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    if baseline.get("params") != candidate.get("params"):
+        print(f"warning: runs used different parameters\n  {baseline.get('params')}\n  {candidate.get('params')}")
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"{'benchmark':<32}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<32}{row['baseline']:>11.4f}s{row['candidate']:>11.4f}s{row['change']:>+9.1%}{flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
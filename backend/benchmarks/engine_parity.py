@@ -0,0 +1,140 @@
+import sys
+import random
+import argparse
+from typing import Any, Dict, List
+
+import pandas as pd
+
+############################ STRUCTURED ENGINE PARITY #########################
+# Checks the batch structured-rule matching in calculation_engine.py against
+# the per-sale iterrows() loop it replaced, on randomized sales and rule sets.
+# No database is needed. details.structured and the structured totals must be
+# identical, in order, for every employee.
+#
+#   python -m benchmarks.engine_parity [--cases 200 --seed 1]
+#
+# Rule bands of one (role, vehicle_type) never share a min_units: the old loop
+# broke such ties by an unstable sort, the engine keeps the rule fetched first.
+
+ROLES = ["Sales Executive", "Team Lead", "Branch Manager"]
+VEHICLE_TYPES = ["Car", "SUV", "EV", "Bike"]
+
+
+def reference_structured(df_sales: pd.DataFrame, df_rules: pd.DataFrame) -> List[Dict[str, Any]]:
+    """The structured part of the pre-vectorization calculate_incentives loop, kept verbatim."""
+    results = []
+    for emp_id, emp_sales in df_sales.groupby("employee_id"):
+        structured_total = 0.0
+        details_structured = []
+
+        if not df_rules.empty:
+            for _, sale in emp_sales.iterrows():
+                qty = int(sale['total_quantity'])
+                sale_role = str(sale['role']).lower()
+
+                matching_rules = df_rules[
+                    (df_rules['role'] == sale_role) &
+                    (df_rules['vehicle_type'] == sale['vehicle_type'].lower()) &
+                    (qty >= df_rules['min_units']) &
+                    (qty <= df_rules['max_units'])
+                ]
+
+                if matching_rules.empty:
+                    continue
+
+                # pick the first matching rule (lowest min_units)
+                rule = matching_rules.sort_values('min_units').iloc[0]
+
+                bonus_units = max(0, qty - rule['min_units'])
+                structured_amount = rule['incentive_amount_inr'] + bonus_units * rule['bonus_per_unit_inr']
+                structured_total += structured_amount
+                details_structured.append({
+                    "vehicle_model": sale['vehicle_model'],
+                    "vehicle_type": sale['vehicle_type'],
+                    "quantity": qty,
+                    "rule_applied": rule['rule_id'],
+                    "amount": structured_amount
+                })
+
+        results.append({"employee_id": emp_id, "structured_incentive": structured_total,
+                        "details": {"structured": details_structured}})
+    return results
+
+
+def random_case(rng: random.Random):
+    """Aggregated sales rows and structured rule rows (as fetched from the DB) for one case."""
+    employees = [f"EMP{i:03d}" for i in range(rng.randint(1, 25))]
+    sales = []
+    for emp_id in employees:
+        role = rng.choice(ROLES)
+        for _ in range(rng.randint(1, 6)):
+            vehicle_type = rng.choice(VEHICLE_TYPES)
+            sales.append({
+                "employee_id": emp_id,
+                # stored values are not case-normalized
+                "role": rng.choice([role, role.upper(), role.lower()]),
+                "vehicle_type": rng.choice([vehicle_type, vehicle_type.lower()]),
+                "vehicle_model": f"{vehicle_type}-{rng.randint(1, 9)}",
+                "total_quantity": rng.randint(0, 40),
+            })
+    rng.shuffle(sales)
+
+    rules = []
+    for role in ROLES:
+        for vehicle_type in VEHICLE_TYPES:
+            for min_units in sorted(rng.sample(range(0, 35), rng.randint(0, 4))):
+                rules.append({
+                    "RULE_ID": f"R{len(rules) + 1:04d}",
+                    "ROLE": role,
+                    "VEHICLE_TYPE": vehicle_type,
+                    "MIN_UNITS": min_units,
+                    # bands may overlap and leave gaps
+                    "MAX_UNITS": min_units + rng.randint(0, 15),
+                    "INCENTIVE_AMOUNT_INR": float(rng.randint(0, 50) * 500),
+                    "BONUS_PER_UNIT_INR": rng.choice([0.0, 250.0, 333.33, 1250.5]),
+                })
+    rng.shuffle(rules)
+    return pd.DataFrame(sales), pd.DataFrame(rules)
+
+
+def check_case(df_sales: pd.DataFrame, df_rules: pd.DataFrame) -> List[str]:
+    from calculation_engine import CompiledRules, calculate_employee_incentives, prepare_structured_rules
+
+    expected = reference_structured(df_sales, prepare_structured_rules(df_rules))
+    actual = calculate_employee_incentives(df_sales, CompiledRules("parity", df_rules, pd.DataFrame()))
+    if [e["employee_id"] for e in expected] != [a["employee_id"] for a in actual]:
+        return ["employee order differs"]
+    problems = []
+    for want, got in zip(expected, actual):
+        emp_id = want["employee_id"]
+        if want["details"]["structured"] != got["details"]["structured"]:
+            problems.append(f"{emp_id}: details.structured differs")
+        if want["structured_incentive"] != got["structured_incentive"]:
+            problems.append(f"{emp_id}: structured_incentive {want['structured_incentive']} != "
+                            f"{got['structured_incentive']}")
+        if got["total_incentive"] != got["structured_incentive"]:
+            problems.append(f"{emp_id}: total_incentive includes ad-hoc awards without schemes")
+    return problems
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check batch structured matching against the old iterrows loop")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    failed = 0
+    for case in range(args.cases):
+        problems = check_case(*random_case(rng))
+        if problems:
+            failed += 1
+            print(f"case {case}:")
+            for problem in problems[:20]:
+                print(f"  {problem}")
+    print(f"{'PASS' if not failed else 'FAIL'}: {args.cases - failed}/{args.cases} cases match (seed {args.seed})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
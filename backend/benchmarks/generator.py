@@ -0,0 +1,158 @@
+import os
+import csv
+import random
+import calendar
+import argparse
+from datetime import date
+from typing import Dict, List
+
+############################ SYNTHETIC DATA GENERATOR #########################
+# Writes files in exactly the formats the ingestion endpoints accept:
+#   sales CSV             -> /data-ingestion/upload_sales_data
+#   structured rule CSV   -> /data-ingestion/upload_structured_rule
+#   ad-hoc scheme TXT     -> /data-ingestion/upload_ad_hoc_rule
+# Output is deterministic for a given seed.
+
+ROLES = ["RM", "ASM", "SE"]
+BRANCHES = ["Mumbai", "Pune", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Kolkata", "Jaipur"]
+VEHICLES = {
+    "Compact": ["Swift", "i20", "Tiago", "Baleno"],
+    "Sedan": ["City", "Verna", "Ciaz", "Slavia"],
+    "SUV": ["Creta", "Seltos", "XUV700", "Harrier"],
+    "EV": ["Nexon EV", "ZS EV", "Atto 3"],
+    "Commercial": ["Ace", "Bolero Pickup", "Dost"],
+}
+SCHEME_LINES = [
+    "Sell {n}+ {vtype} units this month: ₹{amount:,} bonus",
+    "All {roles} achieving branch target: ₹{amount:,}",
+    "Top performer in each branch: {mult}x base structured incentive",
+    "Customer satisfaction above 90%: Variable",
+    "Zero cancellations for the month: ₹{amount:,}",
+]
+NOTE_LINES = [
+    "Schemes are cumulative with base incentives",
+    "Payout requires minimum 80% attendance",
+    "Rules may change based on inventory levels",
+]
+ROLE_TEXT = {"RM": "RMs", "ASM": "ASMs", "SE": "employees"}
+
+
+def month_bounds(period: str):
+    year, month = (int(part) for part in period.split("-"))
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def employee_roster(employees: int, seed: int = 7) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    return [
+        {"employee_id": f"E{i:06d}", "branch": rng.choice(BRANCHES), "role": rng.choices(ROLES, weights=[2, 3, 5])[0]}
+        for i in range(1, employees + 1)
+    ]
+
+
+def write_sales_csv(path: str, employees: int, rows: int, period: str, seed: int = 7) -> int:
+    """`rows` sales lines spread over `employees` salespeople within `period`."""
+    rng = random.Random(seed)
+    roster = employee_roster(employees, seed)
+    start, end = month_bounds(period)
+    days = (end - start).days + 1
+    vehicle_types = list(VEHICLES)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["employee_id", "branch", "role", "vehicle_model", "vehicle_type", "quantity", "sale_date"])
+        for _ in range(rows):
+            emp = roster[rng.randrange(len(roster))]
+            vehicle_type = rng.choice(vehicle_types)
+            writer.writerow([
+                emp["employee_id"], emp["branch"], emp["role"],
+                rng.choice(VEHICLES[vehicle_type]), vehicle_type,
+                rng.choices([1, 2, 3], weights=[6, 3, 1])[0],
+                date.fromordinal(start.toordinal() + rng.randrange(days)).isoformat(),
+            ])
+    return rows
+
+
+def write_structured_rules_csv(path: str, rules: int, period: str, seed: int = 7) -> int:
+    """Contiguous unit bands per (role, vehicle_type) until `rules` rules are written."""
+    rng = random.Random(seed)
+    start, end = month_bounds(period)
+    combos = [(role, vtype) for role in ROLES for vtype in VEHICLES]
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "rule_id", "role", "vehicle_type", "min_units", "max_units",
+            "incentive_amount_inr", "bonus_per_unit_inr", "valid_from", "valid_to", "rule_type"
+        ])
+        band = 0
+        while written < rules:
+            for role, vtype in combos:
+                if written >= rules:
+                    break
+                min_units = band * 5 + 1
+                writer.writerow([
+                    f"R-{written + 1:04d}", role, vtype, min_units, min_units + 4,
+                    1000 * (band + 1) + rng.randrange(0, 500, 50), rng.randrange(100, 1000, 50),
+                    start.isoformat(), end.isoformat(), "volume"
+                ])
+                written += 1
+            band += 1
+    return written
+
+
+def write_ad_hoc_txt(path: str, schemes: int, period: str, seed: int = 7) -> int:
+    """`schemes` *SCHEME blocks in the layout the TXT parser expects."""
+    rng = random.Random(seed)
+    start, end = month_bounds(period)
+    valid = f"{start:%B} {start.day}, {start.year} - {end:%B} {end.day}, {end.year}"
+    blocks = []
+    for number in range(1, schemes + 1):
+        role = rng.choice(ROLES)
+        lines = [f"*SCHEME {number}: {rng.choice(['Festive', 'Monsoon', 'Year End', 'Weekend'])} Drive {number}",
+                 f"- Applicable to: All {ROLE_TEXT[role]}",
+                 f"- Valid: {valid}"]
+        for template in rng.sample(SCHEME_LINES, 2):
+            lines.append("- " + template.format(
+                n=rng.randint(3, 10), vtype=rng.choice(list(VEHICLES)), roles=ROLE_TEXT[role],
+                amount=rng.randrange(1000, 20000, 500), mult=rng.choice([1.2, 1.5, 2])
+            ))
+        if number % 3 == 0:
+            lines += ["NOTES:", "- " + NOTE_LINES[number // 3 % len(NOTE_LINES)]]
+        blocks.append("\n".join(lines))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(blocks) + "\n")
+    return schemes
+
+
+def generate_dataset(directory: str, employees: int, rows: int, rules: int, schemes: int,
+                     period: str, seed: int = 7) -> Dict[str, str]:
+    """Write all three input files into `directory`; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "sales": os.path.join(directory, f"sales_{period}.csv"),
+        "structured_rules": os.path.join(directory, f"structured_rules_{period}.csv"),
+        "ad_hoc": os.path.join(directory, f"ad_hoc_{period}.txt"),
+    }
+    write_sales_csv(paths["sales"], employees, rows, period, seed)
+    write_structured_rules_csv(paths["structured_rules"], rules, period, seed)
+    write_ad_hoc_txt(paths["ad_hoc"], schemes, period, seed)
+    return paths
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Generate synthetic dealership input files")
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--rules", type=int, default=150)
+    parser.add_argument("--schemes", type=int, default=10)
+    parser.add_argument("--period", default=date.today().strftime("%Y-%m"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for kind, path in generate_dataset(args.out, args.employees, args.rows, args.rules,
+                                       args.schemes, args.period, args.seed).items():
+        print(f"{kind}: {path}")
+
+
+if __name__ == "__main__":
+    _main()
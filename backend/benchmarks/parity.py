@@ -0,0 +1,156 @@
+import sys
+import json
+import uuid
+import argparse
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import pandas as pd
+
+############################ ENGINE PARITY CHECK #########################
+# Compares the SQL engine (sql_engine.py) with the Python engine on the data of
+# one period. Both SQL modes are checked: the set-based query used for
+# incremental runs, and INSERT ... SELECT into the result tables (inside a
+# transaction that is rolled back, so nothing is kept). The sales_monthly_agg
+# groups both engines read are also checked against a fresh GROUP BY over
+# sales_transactions.
+#
+#   python -m benchmarks.parity --period YYYY-MM
+#
+# Concurrency: the three engine runs share one consistent snapshot
+# (calculation_runs.source_snapshot), like a calculation, so uploads committed
+# meanwhile cannot make them disagree; insert mode reads its source rows with
+# plain SELECTs in that snapshot rather than the locking reads of
+# INSERT ... SELECT, so the check does not block uploads either. The aggregate
+# check runs after the rollback, in a new snapshot: a sales upload committed
+# in between shows up as drift, so re-run it on a database with live uploads.
+
+TOLERANCE = 0.01  # rule amounts are FLOAT columns
+
+
+def _normalize(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """employee_id -> totals plus the structured / ad-hoc detail lists, in stored order."""
+    return {
+        emp["employee_id"]: {
+            "total_units": int(emp["total_units"]),
+            "structured_incentive": float(emp["structured_incentive"]),
+            "ad_hoc_incentive": float(emp["ad_hoc_incentive"]),
+            "total_incentive": float(emp["total_incentive"]),
+            "structured": [
+                (d["vehicle_type"], d["vehicle_model"], int(d["quantity"]), d["rule_applied"], round(float(d["amount"]), 2))
+                for d in emp["details"]["structured"]
+            ],
+            "ad_hoc": [
+                (d["scheme_name"], d["condition"], round(float(d["amount"]), 2)) for d in emp["details"]["ad_hoc"]
+            ],
+        }
+        for emp in results
+    }
+
+
+def diff_results(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]], limit: int = 20) -> List[str]:
+    expected_map, actual_map = _normalize(expected), _normalize(actual)
+    problems = [f"{emp}: missing" for emp in sorted(set(expected_map) - set(actual_map))]
+    problems += [f"{emp}: unexpected" for emp in sorted(set(actual_map) - set(expected_map))]
+    for emp in sorted(set(expected_map) & set(actual_map)):
+        want, got = expected_map[emp], actual_map[emp]
+        for key in ("structured_incentive", "ad_hoc_incentive", "total_incentive"):
+            if abs(want[key] - got[key]) > TOLERANCE:
+                problems.append(f"{emp}: {key} {want[key]} != {got[key]}")
+        for key in ("total_units", "structured", "ad_hoc"):
+            if want[key] != got[key]:
+                problems.append(f"{emp}: {key} differs")
+    return problems[:limit]
+
+
+def aggregate_drift(cursor, start_date, end_date, aggregated: List[Dict[str, Any]], limit: int = 20) -> List[str]:
+    """Sales groups whose sales_monthly_agg quantity differs from the raw sales of the period."""
+    cursor.execute("""
+        SELECT employee_id, role, vehicle_type, vehicle_model, SUM(quantity) AS total_quantity
+        FROM sales_transactions
+        WHERE sale_date BETWEEN %s AND %s
+        GROUP BY employee_id, vehicle_type, role, vehicle_model
+    """, (start_date, end_date))
+
+    def keyed(rows):
+        # Grouping follows the case-insensitive column collation
+        return {
+            tuple(str(row[c]).lower() for c in ("employee_id", "vehicle_type", "role", "vehicle_model")):
+                int(row["total_quantity"])
+            for row in rows
+        }
+
+    expected, actual = keyed(cursor.fetchall()), keyed(aggregated)
+    problems = []
+    for group in sorted(set(expected) | set(actual)):
+        if expected.get(group) != actual.get(group):
+            problems.append(f"{'/'.join(group)}: total_quantity {expected.get(group)} != {actual.get(group)}")
+    return problems[:limit]
+
+
+def _stored_results(cursor, run_id: str, period: str) -> List[Dict[str, Any]]:
+    cursor.execute("""
+        SELECT employee_id, total_units, total_incentive, structured_incentive, ad_hoc_incentive, details
+        FROM incentive_calculations WHERE run_id = %s AND period = %s
+    """, (run_id, period))
+    return [{**row, "details": json.loads(row["details"])} for row in cursor.fetchall()]
+
+
+def check_parity(conn, period: str) -> Dict[str, Any]:
+    from calculation_engine import calculate_employee_incentives
+    from routes.calculator import _fetch_rules, _fetch_sales, _period_bounds
+    from calculation_runs import source_snapshot
+    from rule_cache import rule_cache
+    from sql_engine import calculate_incentives_sql, insert_results_sql
+
+    start_date, end_date = _period_bounds(datetime.strptime(period, "%Y-%m"))
+    cursor = conn.cursor()
+    try:
+        source_snapshot(cursor)
+        rules = rule_cache.get(period, start_date, end_date, lambda: _fetch_rules(cursor, start_date, end_date))
+        sales = _fetch_sales(cursor, start_date, end_date)
+        python_results = calculate_employee_incentives(pd.DataFrame(sales), rules)
+        query_results = calculate_incentives_sql(cursor, start_date, end_date, rules)
+
+        # ---------- Insert mode into a throwaway run, rolled back afterwards ----------
+        run_id = str(uuid.uuid4())
+        try:
+            insert_results_sql(cursor, run_id, period, start_date, end_date, rules, datetime.now())
+            insert_results = _stored_results(cursor, run_id, period)
+        finally:
+            conn.rollback()
+
+        report = {
+            "period": period,
+            "employees": len(python_results),
+            "query_mode": diff_results(python_results, query_results),
+            "insert_mode": diff_results(python_results, insert_results),
+            "aggregate": aggregate_drift(cursor, start_date, end_date, sales),
+        }
+        report["ok"] = not report["query_mode"] and not report["insert_mode"] and not report["aggregate"]
+        return report
+    finally:
+        cursor.close()
+
+
+def _main(argv: List[str]) -> int:
+    from database import get_connection
+
+    parser = argparse.ArgumentParser(description="Check the SQL engine against the Python engine")
+    parser.add_argument("--period", default=date.today().strftime("%Y-%m"))
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        report = check_parity(conn, args.period)
+    finally:
+        conn.close()
+    print(f"{'PASS' if report['ok'] else 'FAIL'}: {report['employees']} employees in {report['period']}")
+    for mode in ("query_mode", "insert_mode", "aggregate"):
+        for problem in report[mode]:
+            print(f"  [{mode}] {problem}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
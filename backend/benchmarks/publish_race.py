@@ -0,0 +1,125 @@
+import sys
+import uuid
+import argparse
+import threading
+from datetime import datetime
+from typing import List
+
+from benchmarks.run import BENCH_DB_NAME, prepare_database, truncate
+
+############################ RUN PUBLICATION RACE #########################
+# Interleaves two complete_run() calls for the same period on separate
+# connections: the first publishes and holds its transaction open, the second
+# publishes meanwhile. Exactly one run must end up completed, the other
+# superseded with its result rows deleted, so the period is not counted twice.
+#
+#   python -m benchmarks.publish_race [--db-name incentive_bench]
+#
+# Uses (and wipes) the benchmark's scratch database.
+
+PERIOD = "2000-01"
+EMPLOYEES = 3
+HOLD_SECONDS = 1.0
+
+
+def _running_run_with_results(period: str, amount: float) -> str:
+    from calculation_runs import start_run
+    from database import get_connection
+
+    run_id = start_run(period)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        now = datetime.now()
+        cursor.executemany("""
+            INSERT INTO incentive_calculations (
+                id, run_id, employee_id, period, total_units, total_incentive, structured_incentive,
+                ad_hoc_incentive, calculation_date, details, created_at
+            ) VALUES (%s, %s, %s, %s, 0, %s, %s, 0, %s, '{}', %s)
+        """, [(str(uuid.uuid4()), run_id, f"E{i:03d}", period, amount, amount, now, now) for i in range(EMPLOYEES)])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return run_id
+
+
+def _publish(run_id: str, published: threading.Event = None, hold: threading.Event = None):
+    from calculation_runs import complete_run
+    from database import get_connection
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        complete_run(cursor, run_id, PERIOD, EMPLOYEES, EMPLOYEES, datetime.now(), 0)
+        if published:
+            published.set()
+        if hold:
+            hold.wait(HOLD_SECONDS)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def check_race() -> List[str]:
+    from database import get_connection
+
+    truncate("incentive_rule_applications", "incentive_calculations", "dashboard_summary", "calculation_runs",
+             "calculation_period_locks", "employees")
+    first = _running_run_with_results(PERIOD, 100.0)
+    second = _running_run_with_results(PERIOD, 200.0)
+
+    published, hold = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_publish, args=(first, published, hold))
+    holder.start()
+    published.wait()
+    # Publishes while the first publication is still uncommitted
+    contender = threading.Thread(target=_publish, args=(second,))
+    contender.start()
+    contender.join(HOLD_SECONDS / 2)
+    hold.set()
+    holder.join()
+    contender.join()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, status FROM calculation_runs WHERE period = %s", (PERIOD,))
+        status = {row["id"]: row["status"] for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT COUNT(*) AS results, COALESCE(SUM(total_incentive), 0) AS total
+            FROM incentive_calculations WHERE period = %s
+        """, (PERIOD,))
+        results = cursor.fetchone()
+        cursor.execute("SELECT run_id, total_incentive FROM dashboard_summary WHERE period = %s", (PERIOD,))
+        summary = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+    problems = []
+    if status.get(first) != "superseded" or status.get(second) != "completed":
+        problems.append(f"run states: first {status.get(first)}, second {status.get(second)}")
+    if int(results["results"]) != EMPLOYEES or float(results["total"]) != 200.0 * EMPLOYEES:
+        problems.append(f"{results['results']} result rows totalling {results['total']} for {EMPLOYEES} employees")
+    if not summary or summary["run_id"] != second:
+        problems.append(f"dashboard_summary points at {summary and summary['run_id']}")
+    return problems
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check that two concurrent publications of a period serialise")
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    args = parser.parse_args(argv)
+
+    prepare_database(args.db_name)
+    problems = check_race()
+    print(f"{'PASS' if not problems else 'FAIL'}: two interleaved publications of {PERIOD}")
+    for problem in problems:
+        print(f"  {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+############################ ENDPOINT BENCHMARKS #########################
+# Loads synthetic data into a scratch database and times the hot endpoints
+# through the real FastAPI app (TestClient, no network). Every repeat starts
+# from the same state, so results are comparable from run to run.
+#
+#   python -m benchmarks.run [--employees N --rows N --rules N --schemes N --repeat N]
+#   python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+#
+# The scratch database (BENCH_DB_NAME, default incentive_bench) is created and
+# migrated on the configured DB_HOST; it is wiped by every run, never point it
+# at real data.
+
+load_dotenv()
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "incentive_bench")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DATA_TABLES = [
+    "incentive_rule_applications", "incentive_calculations", "dashboard_summary", "calculation_runs",
+    "calculation_period_locks",
+    "sales_transactions", "sales_monthly_agg", "employees", "structured_rules", "ad_hoc_rules", "uploaded_files",
+]
+JOB_POLL_SECONDS = 0.05
+
+
+# ---------- Scratch database ----------
+def prepare_database(db_name: str):
+    """Create and migrate the scratch database; must run before `database` is imported."""
+    import pymysql
+
+    conn = pymysql.connect(host=os.environ.get("DB_HOST"), user=os.environ.get("DB_USER"),
+                           password=os.environ.get("DB_PASSWORD"), connect_timeout=5)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+    finally:
+        conn.close()
+
+    os.environ["DB_NAME"] = db_name
+    from migrate import apply_migrations
+    apply_migrations()
+
+
+def truncate(*tables: str):
+    from database import get_connection
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in tables:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ---------- Timing ----------
+def time_repeats(name: str, repeat: int, action: Callable[[], dict],
+                 setup: Optional[Callable[[], None]] = None) -> Dict[str, object]:
+    """Run `action` `repeat` times (setup untimed before each); summary of wall-clock seconds."""
+    seconds: List[float] = []
+    detail = {}
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        detail = action()
+        seconds.append(time.perf_counter() - started)
+    ordered = sorted(seconds)
+    result = {
+        "repeat": repeat,
+        "seconds": [round(s, 6) for s in seconds],
+        "min": round(ordered[0], 6),
+        "median": round(statistics.median(ordered), 6),
+        "mean": round(statistics.fmean(ordered), 6),
+        "p95": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 6),
+        "max": round(ordered[-1], 6),
+        "detail": detail,
+    }
+    print(f"{name:<28} median {result['median']:.4f}s  min {result['min']:.4f}s  max {result['max']:.4f}s")
+    return result
+
+
+def _checked(response) -> dict:
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> "
+                           f"{response.status_code}: {response.text[:500]}")
+    return response.json()
+
+
+def _upload(client, path: str, endpoint: str, content_type: str) -> dict:
+    with open(path, "rb") as f:
+        body = _checked(client.post(endpoint, files={"file": (os.path.basename(path), f, content_type)}))
+    # A content-hash hit (dedup.py) inserts nothing and would time a no-op
+    if body.get("duplicate"):
+        raise RuntimeError(f"{endpoint} answered from an earlier upload: {body.get('message')}")
+    return {key: body[key] for key in ("message", "write_stats") if key in body}
+
+
+def _calculate(client, period: str, mode: str, engine: str = "python") -> dict:
+    queued = _checked(client.post(
+        "/calculator/api/incentives/calculate", json={"period": period, "mode": mode, "engine": engine}
+    ))
+    while True:
+        job = _checked(client.get(queued["status_url"]))["data"]
+        if job["status"] == "completed":
+            return {"run_id": job["run_id"], "employees": job["employees_total"]}
+        if job["status"] == "failed":
+            raise RuntimeError(f"calculation job failed: {job.get('error')}")
+        time.sleep(JOB_POLL_SECONDS)
+
+
+def _all_results(client, period: str, limit: int) -> dict:
+    pages, records, cursor = 0, 0, None
+    while True:
+        params = {"period": period, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = _checked(client.get("/results/GETincentiveresults", params=params))
+        pages += 1
+        records += len(body["data"])
+        cursor = body.get("next_cursor")
+        if not cursor:
+            return {"pages": pages, "records": records}
+
+
+# ---------- Run ----------
+def run_benchmarks(args) -> Dict[str, object]:
+    prepare_database(args.db_name)
+
+    from fastapi.testclient import TestClient
+    from benchmarks.generator import generate_dataset
+    import main
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="incentive_bench_")
+    paths = generate_dataset(data_dir, args.employees, args.rows, args.rules, args.schemes, args.period, args.seed)
+    truncate(*DATA_TABLES)
+
+    results = {}
+    with TestClient(main.app) as client:
+        # ---------- Ingestion (each repeat re-loads into empty tables) ----------
+        results["upload_structured_rule"] = time_repeats(
+            "upload_structured_rule", args.repeat,
+            lambda: _upload(client, paths["structured_rules"], "/data-ingestion/upload_structured_rule", "text/csv"),
+            setup=lambda: truncate("structured_rules", "uploaded_files"))
+        results["upload_ad_hoc_rule"] = time_repeats(
+            "upload_ad_hoc_rule", args.repeat,
+            lambda: _upload(client, paths["ad_hoc"], "/data-ingestion/upload_ad_hoc_rule", "text/plain"),
+            setup=lambda: truncate("ad_hoc_rules", "uploaded_files"))
+        results["upload_sales_data"] = time_repeats(
+            "upload_sales_data", args.repeat,
+            lambda: _upload(client, paths["sales"], "/data-ingestion/upload_sales_data", "text/csv"),
+            setup=lambda: truncate("sales_transactions", "sales_monthly_agg", "employees", "uploaded_files"))
+
+        # ---------- Calculation (queued job, timed until it completes) ----------
+        results["calculate_incentives_sql"] = time_repeats(
+            "calculate_incentives (sql)", args.repeat, lambda: _calculate(client, args.period, "full", "sql"))
+        results["calculate_incentives"] = time_repeats(
+            "calculate_incentives", args.repeat, lambda: _calculate(client, args.period, "full"))
+
+        # ---------- What-if simulation (first repeat also loads the sales cache) ----------
+        results["simulate_incentives"] = time_repeats(
+            "simulate_incentives", args.repeat,
+            lambda: _checked(client.post("/calculator/api/incentives/simulate", json={
+                "period": args.period, "overrides": [{"vehicle_type": "SUV", "bonus_per_unit_delta": 200}]
+            }))["totals"])
+
+        # ---------- Reads ----------
+        results["GETincentiveresults"] = time_repeats(
+            "GETincentiveresults", args.repeat,
+            lambda: {"records": len(_checked(client.get(
+                "/results/GETincentiveresults", params={"period": args.period, "limit": args.page_size}))["data"])})
+        results["GETincentiveresults_all_pages"] = time_repeats(
+            "GETincentiveresults (all)", args.repeat, lambda: _all_results(client, args.period, args.page_size))
+        results["GETdashboard_stats"] = time_repeats(
+            "GETdashboard_stats", args.repeat,
+            lambda: _checked(client.get("/results/GETdashboard_stats", params={"period": args.period}))["data"])
+
+    # ---------- SQL engine must agree with the Python engine ----------
+    from benchmarks.parity import check_parity
+    from database import get_connection
+
+    conn = get_connection()
+    try:
+        parity = check_parity(conn, args.period)
+    finally:
+        conn.close()
+    print(f"engine parity: {'ok' if parity['ok'] else 'MISMATCH'}")
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "params": {key: value for key, value in vars(args).items() if key not in ("out", "data_dir")},
+        "benchmarks": results,
+        "parity": parity,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time the ingestion, calculation and results endpoints")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--rules", type=int, default=150)
+    parser.add_argument("--schemes", type=int, default=10)
+    parser.add_argument("--period", default=date.today().strftime("%Y-%m"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--data-dir", help="keep the generated input files here")
+    parser.add_argument("--out", help="result file (default benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,73 @@
+import io
+import sys
+from typing import Dict, List
+
+import pandas as pd
+
+############################ SALES CSV VALIDATION CHECK #########################
+# Reads small sales CSVs the way _ingest_sales_csv does and validates them with
+# csv_validation.validate_frame. Bad quantities and sale dates must be reported
+# per row in invalid_rows while the other rows stay valid, never rejecting the
+# whole upload. No database is needed.
+#
+#   python -m benchmarks.sales_validation
+
+HEADER = "employee_id,branch,role,vehicle_model,vehicle_type,quantity,sale_date\n"
+GOOD_ROW = "E001,Pune,Sales Executive,Nexon,Car,2,2025-09-03\n"
+
+# name -> (bad row, CSV line of the bad row, expected error type on quantity / sale_date)
+CASES = {
+    "quantity 0": ("E002,Pune,Sales Executive,Nexon,Car,0,2025-09-04\n", "quantity", "greater_than_equal"),
+    "quantity abc": ("E002,Pune,Sales Executive,Nexon,Car,abc,2025-09-04\n", "quantity", "int_parsing"),
+    "quantity 1.5": ("E002,Pune,Sales Executive,Nexon,Car,1.5,2025-09-04\n", "quantity", "int_from_float"),
+    "quantity blank": ("E002,Pune,Sales Executive,Nexon,Car,,2025-09-04\n", "quantity", "int_parsing"),
+    "sale_date bad": ("E002,Pune,Sales Executive,Nexon,Car,1,not-a-date\n", "sale_date", "date_from_datetime_parsing"),
+}
+
+
+def read_chunks(text: str, chunk_rows: int = 2) -> List[pd.DataFrame]:
+    """Chunks of a sales CSV with the column names and dtypes _ingest_sales_csv uses."""
+    from routes.data_ingestion import sales_csv_dtypes
+
+    header = pd.read_csv(io.StringIO(text), nrows=0).columns
+    column_map = {c: c.strip().lower() for c in header}
+    reader = pd.read_csv(io.StringIO(text), chunksize=chunk_rows, dtype=sales_csv_dtypes(column_map))
+    return [chunk.rename(columns=column_map) for chunk in reader]
+
+
+def check_case(bad_row: str, field: str, error_type: str) -> List[str]:
+    from csv_validation import validate_frame
+    from models import SalesRow
+
+    # The bad row lands in the second chunk, after a chunk of good rows
+    valid: List[pd.DataFrame] = []
+    invalid: List[Dict] = []
+    for chunk in read_chunks(HEADER + GOOD_ROW * 2 + bad_row + GOOD_ROW.replace("E001", "E003")):
+        clean, chunk_invalid = validate_frame(chunk, SalesRow)
+        valid.append(clean)
+        invalid.extend(chunk_invalid)
+
+    problems = []
+    valid_rows = sum(len(frame) for frame in valid)
+    if valid_rows != 3:
+        problems.append(f"{valid_rows} valid rows, expected 3")
+    if [row["row_number"] for row in invalid] != [4]:
+        problems.append(f"invalid rows {[row['row_number'] for row in invalid]}, expected [4]")
+    elif [(e["loc"][0], e["type"]) for e in invalid[0]["errors"]] != [(field, error_type)]:
+        problems.append(f"errors {invalid[0]['errors']}, expected {error_type} on {field}")
+    return problems
+
+
+def _main(argv: List[str]) -> int:
+    failed = 0
+    for name, case in CASES.items():
+        problems = check_case(*case)
+        print(f"[{'PASS' if not problems else 'FAIL'}] {name}")
+        for problem in problems:
+            print(f"       {problem}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
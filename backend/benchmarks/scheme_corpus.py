@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import platform
+import argparse
+import tempfile
+from datetime import date, datetime
+from typing import List
+
+from benchmarks.generator import write_ad_hoc_txt
+from benchmarks.run import RESULTS_DIR, _git_commit, time_repeats
+
+############################ SCHEME PARSER CORPUS BENCHMARK #########################
+# Times scheme_parser.parse_schemes on generated circulars of increasing size
+# (no database needed). Results use the benchmarks.run file layout, so two
+# runs can be compared with benchmarks.compare.
+#
+#   python -m benchmarks.scheme_corpus [--schemes 100 1000 10000 --repeat 5]
+
+
+def run_corpus(sizes: List[int], period: str, seed: int, repeat: int) -> dict:
+    from scheme_parser import parse_schemes
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"ad_hoc_{size}.txt")
+            write_ad_hoc_txt(path, size, period, seed)
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            lines = text.count("\n")
+
+            def parse():
+                found, rows, invalid = parse_schemes(text)
+                return {"schemes": found, "rows": len(rows), "invalid": len(invalid)}
+
+            result = time_repeats(f"parse_schemes[{size}]", repeat, parse)
+            result["detail"].update({
+                "lines": lines,
+                "bytes": len(text.encode("utf-8")),
+                "lines_per_second": round(lines / result["median"]) if result["median"] else None,
+            })
+            results[f"parse_schemes[{size}]"] = result
+    return results
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time the ad-hoc scheme parser on generated circulars")
+    parser.add_argument("--schemes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--period", default=date.today().strftime("%Y-%m"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="result file (default benchmarks/results/scheme_corpus_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "params": {key: value for key, value in vars(args).items() if key != "out"},
+        "benchmarks": run_corpus(args.schemes, args.period, args.seed, args.repeat),
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"scheme_corpus_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
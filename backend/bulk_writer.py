@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+from typing import Iterable, List, Sequence, Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+####################### BULK WRITE SETTINGS ######################
+BULK_INSERT_BATCH_SIZE = int(os.environ.get("BULK_INSERT_BATCH_SIZE", 1000))
+
+
+def _chunks(rows: Iterable[Sequence[Any]], size: int):
+    batch: List[Sequence[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(
+    cursor,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    batch_size: Optional[int] = None,
+    on_duplicate: Optional[str] = None,
+    ignore: bool = False,
+) -> Dict[str, Any]:
+    """
+    Write rows with chunked multi-row INSERT statements.
+
+    Each chunk of `batch_size` rows becomes a single
+    `INSERT INTO table (...) VALUES (...), (...), ...` round trip. The caller
+    owns the transaction. Returns write stats (rows, batches, seconds, rows_per_sec).
+    With `ignore`, rows hitting a unique key are skipped (INSERT IGNORE) and
+    counted in the stats as `skipped`.
+    """
+    batch_size = batch_size or BULK_INSERT_BATCH_SIZE
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    base_sql = f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) VALUES "
+    suffix = f" ON DUPLICATE KEY UPDATE {on_duplicate}" if on_duplicate else ""
+
+    total_rows = 0
+    inserted = 0
+    batches = 0
+    started = time.perf_counter()
+    for batch in _chunks(rows, batch_size):
+        sql = base_sql + ", ".join([placeholders] * len(batch)) + suffix
+        cursor.execute(sql, [value for row in batch for value in row])
+        total_rows += len(batch)
+        inserted += cursor.rowcount
+        batches += 1
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        "table": table,
+        "rows": total_rows,
+        "batches": batches,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(total_rows / elapsed, 1) if elapsed > 0 else float(total_rows),
+    }
+    if ignore:
+        stats["skipped"] = total_rows - inserted
+    logger.info("bulk insert into %s: %s rows in %s batches (%.1f rows/sec)",
+                table, total_rows, batches, stats["rows_per_sec"])
+    return stats
+
+
+def combine_write_stats(table: str, parts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum the stats of several bulk_insert() calls into one stats dict for `table`."""
+    rows = batches = 0
+    seconds = 0.0
+    skipped = None
+    for stats in parts:
+        rows += stats["rows"]
+        batches += stats["batches"]
+        seconds += stats["seconds"]
+        if "skipped" in stats:
+            skipped = (skipped or 0) + stats["skipped"]
+    combined = {
+        "table": table,
+        "rows": rows,
+        "batches": batches,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else float(rows),
+    }
+    if skipped is not None:
+        combined["skipped"] = skipped
+    return combined
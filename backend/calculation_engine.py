@@ -0,0 +1,281 @@
+import pandas as pd
+from typing import Dict, List, Any
+from scheme_parser import BONUS_FIXED, BONUS_MULTIPLIER, BONUS_VARIABLE
+
+############################ CALCULATION ENGINE #########################
+# Pure DataFrame-in / results-out calculation, no DB access.
+# Structured rules are matched against aggregated sales in one set-based
+# batch instead of a per-sale iterrows() + boolean-mask lookup. Ad-hoc schemes
+# only depend on the employee's role: CompiledRules keeps one award table per
+# role and it is joined to all employees at once.
+#
+# Ad-hoc bonus kinds (typed by scheme_parser):
+#   fixed       pays bonus_value
+#   multiplier  "1.5x base structured incentive" pays (1.5 - 1) x the
+#               employee's structured incentive on top of it
+#   variable    pays 0 and is flagged needs_review for a manual amount
+
+RULE_COLUMNS = ["rule_id", "min_units", "max_units", "incentive_amount_inr", "bonus_per_unit_inr"]
+AWARD_COLUMNS = ["role_key", "award_order", "scheme_name", "condition", "bonus_kind", "fixed_amount", "multiplier",
+                 "needs_review"]
+
+
+def prepare_structured_rules(df_rules: pd.DataFrame) -> pd.DataFrame:
+    """Normalize structured rule rows fetched from the DB (column case, dtypes, match keys)."""
+    if df_rules.empty:
+        return df_rules
+    df_rules = df_rules.copy()
+    df_rules.columns = [c.lower() for c in df_rules.columns]
+    df_rules['min_units'] = df_rules['min_units'].astype(int)
+    df_rules['max_units'] = df_rules['max_units'].astype(int)
+    df_rules['incentive_amount_inr'] = df_rules['incentive_amount_inr'].astype(float)
+    df_rules['bonus_per_unit_inr'] = df_rules['bonus_per_unit_inr'].astype(float)
+    df_rules['role'] = df_rules['role'].str.lower()
+    df_rules['vehicle_type'] = df_rules['vehicle_type'].str.lower()
+    return df_rules
+
+
+def match_structured_rules(df_sales: pd.DataFrame, df_rules: pd.DataFrame) -> pd.DataFrame:
+    """
+    Match every aggregated sales row to at most one structured rule in a single batch.
+
+    Sales rows are joined to rules on (role, vehicle_type), filtered to the
+    min_units/max_units band and the rule with the lowest min_units wins
+    (ties keep the rule fetched first). Returns one row per matched sale,
+    in the original sales order, with the computed structured amount.
+    """
+    columns = ["employee_id", "vehicle_model", "vehicle_type", "quantity", "rule_applied", "amount"]
+    if df_sales.empty or df_rules.empty:
+        return pd.DataFrame(columns=columns)
+
+    sales = pd.DataFrame({
+        "_sale_pos": range(len(df_sales)),
+        "employee_id": df_sales["employee_id"].to_numpy(),
+        "vehicle_model": df_sales["vehicle_model"].to_numpy(),
+        "vehicle_type": df_sales["vehicle_type"].to_numpy(),
+        "quantity": df_sales["total_quantity"].astype(int).to_numpy(),
+        "_role": df_sales["role"].astype(str).str.lower().to_numpy(),
+        "_vehicle_type": df_sales["vehicle_type"].str.lower().to_numpy(),
+    })
+    rules = df_rules[RULE_COLUMNS].copy()
+    rules["_rule_pos"] = range(len(rules))
+    rules["_role"] = df_rules["role"].to_numpy()
+    rules["_vehicle_type"] = df_rules["vehicle_type"].to_numpy()
+
+    # ---------- Join on (role, vehicle_type) and keep rows inside the unit band ----------
+    joined = sales.merge(rules, on=["_role", "_vehicle_type"], how="inner")
+    joined = joined[
+        (joined["quantity"] >= joined["min_units"]) &
+        (joined["quantity"] <= joined["max_units"])
+    ]
+    if joined.empty:
+        return pd.DataFrame(columns=columns)
+
+    # ---------- Lowest min_units per sale row ----------
+    joined = joined.sort_values(["_sale_pos", "min_units", "_rule_pos"], kind="mergesort")
+    joined = joined.drop_duplicates("_sale_pos", keep="first")
+
+    bonus_units = (joined["quantity"] - joined["min_units"]).clip(lower=0)
+    joined["amount"] = joined["incentive_amount_inr"] + bonus_units * joined["bonus_per_unit_inr"]
+    joined = joined.rename(columns={"rule_id": "rule_applied"})
+    return joined[columns].reset_index(drop=True)
+
+
+def structured_breakdown(df_sales: pd.DataFrame, df_rules: pd.DataFrame) -> Dict[Any, List[Dict[str, Any]]]:
+    """Group matched rules into the `details.structured` entries stored per employee."""
+    matched = match_structured_rules(df_sales, df_rules)
+    breakdown: Dict[Any, List[Dict[str, Any]]] = {}
+    for emp_id, model, vehicle_type, qty, rule_id, amount in zip(
+        matched["employee_id"], matched["vehicle_model"], matched["vehicle_type"],
+        matched["quantity"], matched["rule_applied"], matched["amount"]
+    ):
+        breakdown.setdefault(emp_id, []).append({
+            "vehicle_model": model,
+            "vehicle_type": vehicle_type,
+            "quantity": int(qty),
+            "rule_applied": rule_id,
+            "amount": float(amount)
+        })
+    return breakdown
+
+
+class CompiledRules:
+    """
+    Rules valid for one period, compiled once and reused across calculations.
+
+    `structured` is the prepared rules DataFrame used for batch matching and
+    `bands` indexes the same rules by (role, vehicle_type) with unit bands
+    sorted by min_units for point lookups. Ad-hoc schemes are pre-split into
+    eligible roles and typed amounts, and expanded into a per-role award
+    table on first use, so no per-employee scheme scan happens.
+    """
+
+    def __init__(self, period: str, df_rules: pd.DataFrame, df_ad_hoc: pd.DataFrame):
+        self.period = period
+        self.structured = prepare_structured_rules(df_rules)
+        self.bands: Dict[tuple, List[tuple]] = {}
+        if not self.structured.empty:
+            ordered = self.structured.reset_index(drop=True)
+            ordered = ordered.iloc[ordered["min_units"].argsort(kind="mergesort")]
+            for role, vehicle_type, min_units, max_units, rule_id, amount, bonus in zip(
+                ordered["role"], ordered["vehicle_type"], ordered["min_units"], ordered["max_units"],
+                ordered["rule_id"], ordered["incentive_amount_inr"], ordered["bonus_per_unit_inr"]
+            ):
+                self.bands.setdefault((role, vehicle_type), []).append(
+                    (int(min_units), int(max_units), rule_id, float(amount), float(bonus))
+                )
+        self.ad_hoc = [self._compile_scheme(scheme) for scheme in self._scheme_rows(df_ad_hoc)]
+        self._awards: Dict[str, List[tuple]] = {}
+
+    @staticmethod
+    def _scheme_rows(df_ad_hoc: pd.DataFrame):
+        if df_ad_hoc.empty:
+            return []
+        df_ad_hoc = df_ad_hoc.copy()
+        df_ad_hoc.columns = [c.lower() for c in df_ad_hoc.columns]
+        return df_ad_hoc.to_dict(orient="records")
+
+    @staticmethod
+    def _compile_scheme(scheme: Dict[str, Any]) -> Dict[str, Any]:
+        roles = frozenset(r.strip().lower() for r in str(scheme['role']).split(','))
+        # bonus_kind / bonus_value are typed by scheme_parser at upload time
+        kind = scheme.get('bonus_kind')
+        value = scheme.get('bonus_value')
+        value = float(value) if pd.notna(value) else None
+        return {
+            "scheme_name": scheme['scheme_name'],
+            "condition": scheme['conditions'],
+            "all_roles": 'all' in roles,
+            "roles": roles,
+            "bonus_kind": kind,
+            # Notes rows, and rows whose amount could not be read, award nothing
+            "pays": kind == BONUS_VARIABLE or (kind in (BONUS_FIXED, BONUS_MULTIPLIER) and value is not None),
+            "fixed_amount": value if kind == BONUS_FIXED else 0.0,
+            "multiplier": value if kind == BONUS_MULTIPLIER else None
+        }
+
+    def match_band(self, role: str, vehicle_type: str, quantity: int):
+        """Lowest-min_units band containing `quantity`, or None."""
+        for band in self.bands.get((role.lower(), vehicle_type.lower()), ()):
+            if band[0] > quantity:
+                break
+            if quantity <= band[1]:
+                return band
+        return None
+
+    def ad_hoc_for_role(self, role: str) -> List[Dict[str, Any]]:
+        """Schemes an employee with `role` is eligible for, in scheme order."""
+        role = role.lower()
+        return [s for s in self.ad_hoc if s["all_roles"] or role in s["roles"]]
+
+    def award_table(self, role_keys) -> pd.DataFrame:
+        """
+        Paying ad-hoc awards of every role in `role_keys` (lower-cased), one row
+        per (role, award) in scheme order. Rows per role are built once and
+        kept with the compiled rules.
+        """
+        rows = []
+        for role_key in role_keys:
+            awards = self._awards.get(role_key)
+            if awards is None:
+                awards = self._awards[role_key] = [
+                    (role_key, order, s["scheme_name"], s["condition"], s["bonus_kind"], s["fixed_amount"],
+                     s["multiplier"], s["bonus_kind"] == BONUS_VARIABLE)
+                    for order, s in enumerate(x for x in self.ad_hoc_for_role(role_key) if x["pays"])
+                ]
+            rows.extend(awards)
+        return pd.DataFrame(rows, columns=AWARD_COLUMNS)
+
+    def with_structured(self, df_rules: pd.DataFrame) -> "CompiledRules":
+        """Same ad-hoc schemes with `df_rules` as the structured rules (what-if simulations)."""
+        rules = CompiledRules(self.period, df_rules, pd.DataFrame())
+        rules.ad_hoc = self.ad_hoc
+        rules._awards = self._awards
+        return rules
+
+
+def price_ad_hoc_awards(employee_roles: pd.Series, structured_totals: pd.Series,
+                        rules: CompiledRules) -> pd.DataFrame:
+    """
+    One row per (employee, paying award) with its amount, in employee then
+    scheme order. `employee_roles` maps employee_id to role and
+    `structured_totals` employee_id to the structured incentive (the base of
+    multiplier awards).
+    """
+    roles = employee_roles.astype(str).str.lower()
+    table = rules.award_table(roles.unique())
+    employees = pd.DataFrame({
+        "employee_id": roles.index,
+        "_employee_pos": range(len(roles)),
+        "role_key": roles.to_numpy(),
+        "structured_incentive": structured_totals.reindex(roles.index, fill_value=0.0).astype(float).to_numpy(),
+    })
+    joined = employees.merge(table, on="role_key", how="inner")
+    joined = joined.sort_values(["_employee_pos", "award_order"], kind="mergesort")
+    extra = (joined["multiplier"].astype(float) - 1).clip(lower=0).fillna(0.0)
+    joined["amount"] = joined["fixed_amount"].astype(float) + extra * joined["structured_incentive"]
+    return joined.drop(columns=["_employee_pos"]).reset_index(drop=True)
+
+
+def ad_hoc_awards(employee_roles: pd.Series, structured_totals: pd.Series,
+                  rules: CompiledRules) -> Dict[Any, tuple]:
+    """
+    employee_id -> (ad_hoc_total, details.ad_hoc entries) for the arguments of
+    price_ad_hoc_awards. Employees without awards are left out.
+    """
+    joined = price_ad_hoc_awards(employee_roles, structured_totals, rules)
+    if joined.empty:
+        return {}
+
+    multipliers = joined["multiplier"].astype(float)
+    columns = [
+        joined["employee_id"].tolist(), joined["scheme_name"].tolist(), joined["condition"].tolist(),
+        joined["bonus_kind"].tolist(), multipliers.astype(object).where(multipliers.notna(), None).tolist(),
+        joined["needs_review"].astype(bool).tolist(), joined["amount"].astype(float).tolist()
+    ]
+    totals: Dict[Any, float] = {}
+    details: Dict[Any, List[Dict[str, Any]]] = {}
+    for emp_id, scheme_name, condition, kind, multiplier, needs_review, amount in zip(*columns):
+        totals[emp_id] = totals.get(emp_id, 0.0) + amount
+        details.setdefault(emp_id, []).append({
+            "scheme_name": scheme_name,
+            "condition": condition,
+            "amount": amount,
+            "bonus_kind": kind,
+            "multiplier": multiplier,
+            "needs_review": needs_review
+        })
+    return {emp_id: (totals[emp_id], items) for emp_id, items in details.items()}
+
+
+def calculate_employee_incentives(df_sales: pd.DataFrame, rules: CompiledRules) -> List[Dict[str, Any]]:
+    """
+    Compute structured + ad-hoc incentives for every employee in `df_sales`.
+    Returns one dict per employee (sorted by employee_id) with totals and the
+    `details` breakdown stored alongside each result row.
+    """
+    if df_sales.empty:
+        return []
+    structured_details = structured_breakdown(df_sales, rules.structured)
+    structured_totals = {
+        emp_id: sum((item["amount"] for item in items), 0.0) for emp_id, items in structured_details.items()
+    }
+    # An employee's ad-hoc eligibility follows the role of their first sales row
+    employee_roles = df_sales.groupby("employee_id", sort=True)["role"].first()
+    awards = ad_hoc_awards(employee_roles, pd.Series(structured_totals, dtype=float), rules)
+
+    results = []
+    for emp_id in employee_roles.index.tolist():
+        details_structured = structured_details.get(emp_id, [])
+        structured_total = structured_totals.get(emp_id, 0.0)
+        ad_hoc_total, details_ad_hoc = awards.get(emp_id, (0.0, []))
+        results.append({
+            "employee_id": emp_id,
+            "total_units": sum(item["quantity"] for item in details_structured),
+            "structured_incentive": structured_total,
+            "ad_hoc_incentive": ad_hoc_total,
+            "total_incentive": structured_total + ad_hoc_total,
+            "details": {"structured": details_structured, "ad_hoc": details_ad_hoc}
+        })
+
+    return results
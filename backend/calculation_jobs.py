@@ -0,0 +1,232 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException
+import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+############################ BACKGROUND CALCULATION JOBS #########################
+# The calculate endpoint only enqueues a job; a small in-process executor (its
+# work queue is the local job queue) runs it and the job record is polled for
+# progress. Jobs live in memory of the process that accepted them; the durable
+# outcome of every job is its calculation_runs row.
+#
+# On shutdown queued jobs are cancelled and running ones are stopped at their
+# next progress report (the job body then fails its run). A job still inside a
+# long query after CALC_JOB_SHUTDOWN_SECONDS is left to finish; if the process
+# dies first, its run is failed by the startup sweep (fail_stale_runs).
+
+CALC_JOB_WORKERS = int(os.environ.get("CALC_JOB_WORKERS", 1))
+CALC_JOB_HISTORY = int(os.environ.get("CALC_JOB_HISTORY", 100))
+CALC_JOB_SHUTDOWN_SECONDS = float(os.environ.get("CALC_JOB_SHUTDOWN_SECONDS", 30))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Rough share of a period calculation's time spent in each stage. The ETA is
+# extrapolated from the stage-weighted fraction done, so loading and
+# calculating count too, not only the writes.
+STAGE_WEIGHTS = {"loading": 0.15, "finding_changes": 0.15, "calculating": 0.45, "writing": 0.35, "publishing": 0.05}
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress reports once the runner is shutting down."""
+
+
+class StageProgress:
+    """Stage-weighted fraction done of one calculation; employees_done counts within the current stage."""
+
+    def __init__(self, employees_total: Optional[int] = None):
+        self.stage: Optional[str] = None
+        self.employees_total = employees_total
+        self.employees_done = 0
+        self._finished = 0.0
+
+    def enter(self, stage: str, employees_total: Optional[int] = None):
+        if stage != self.stage:
+            self._finished += STAGE_WEIGHTS.get(self.stage, 0.0)
+            self.stage = stage
+            self.employees_done = 0
+        if employees_total is not None:
+            self.employees_total = employees_total
+
+    def fraction(self) -> float:
+        within = min(self.employees_done / self.employees_total, 1.0) if self.employees_total else 0.0
+        return min(self._finished + STAGE_WEIGHTS.get(self.stage, 0.0) * within, 1.0)
+
+
+class JobProgress:
+    """
+    Progress callback handed to the job body: stage changes and employees
+    done/total. employees_done restarts at 0 with every stage (calculated, then
+    written).
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self._runner = runner
+        self._job_id = job_id
+        self._stages = StageProgress()
+
+    def stage(self, stage: str, employees_total: Optional[int] = None):
+        self._stages.enter(stage, employees_total)
+        self._report_stages()
+
+    def advance(self, employees_done: int):
+        self._stages.employees_done = employees_done
+        self._report_stages()
+
+    def _report_stages(self):
+        stages = self._stages
+        self.report(stages.stage, stages.employees_total, stages.employees_done, stages.fraction())
+
+    def report(self, stage: str, employees_total: Optional[int], employees_done: int, fraction: float):
+        """Set stage, employee counts and fraction done at once (batch jobs combine several periods)."""
+        if self._runner.stopping:
+            raise JobCancelled("Calculation cancelled: server shutting down")
+        self._runner._update(self._job_id, stage=stage, employees_total=employees_total,
+                             employees_done=employees_done, progress=round(fraction, 4))
+
+    def attach_run(self, run_id: str):
+        self._runner._update(self._job_id, run_id=run_id)
+
+
+class JobRunner:
+    """Thread-backed job queue with bounded in-memory history."""
+
+    def __init__(self, workers: int = CALC_JOB_WORKERS, history: int = CALC_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="calc-job")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._history = max(history, 1)
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._stopping = threading.Event()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def submit(self, kind: str, params: Dict[str, Any], fn: Callable[..., Dict[str, Any]]) -> Dict[str, Any]:
+        """Queue `fn(progress, **params)`; returns the new job record."""
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "params": params,
+            "status": JOB_QUEUED,
+            "stage": JOB_QUEUED,
+            "run_id": None,
+            "employees_total": None,
+            "employees_done": 0,
+            "progress": 0.0,
+            "queued_at": datetime.now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "metrics": None,
+            "_started": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim()
+        future = self._executor.submit(self._run, job_id, kind, fn, params)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget_future(job_id))
+        return self.get(job_id)
+
+    def _forget_future(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id: str, kind: str, fn: Callable[..., Dict[str, Any]], params: Dict[str, Any]):
+        self._update(job_id, status=JOB_RUNNING, stage="starting", started_at=datetime.now(), _started=time.monotonic())
+        with metrics.request_scope(f"job {kind}") as scope:
+            status = JOB_FAILED
+            try:
+                result = fn(JobProgress(self, job_id), **params)
+                status = JOB_COMPLETED
+                self._update(job_id, status=JOB_COMPLETED, stage=JOB_COMPLETED, progress=1.0, result=result,
+                             finished_at=datetime.now())
+            except HTTPException as e:
+                self._update(job_id, status=JOB_FAILED, stage=JOB_FAILED, error=str(e.detail), finished_at=datetime.now())
+            except JobCancelled as e:
+                self._update(job_id, status=JOB_FAILED, stage=JOB_FAILED, error=str(e), finished_at=datetime.now())
+            except Exception as e:
+                logger.exception("Calculation job %s failed", job_id)
+                self._update(job_id, status=JOB_FAILED, stage=JOB_FAILED, error=str(e), finished_at=datetime.now())
+            finally:
+                # Stage / query breakdown of the run, kept with the job for polling
+                summary = scope.summary()
+                self._update(job_id, metrics=summary)
+                metrics.JOB_SECONDS.observe(summary["duration_ms"] / 1000, kind, status)
+                metrics.log_if_slow(scope, job_id=job_id, status=status)
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(changes)
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond the history limit (never queued/running ones)
+        finished = [jid for jid, job in self._jobs.items() if job["status"] in (JOB_COMPLETED, JOB_FAILED)]
+        for jid in finished[:max(len(self._jobs) - self._history, 0)]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job with elapsed time and ETA, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        started = job.pop("_started")
+        elapsed = None
+        eta = None
+        if started is not None:
+            if job["finished_at"] is not None:
+                elapsed = (job["finished_at"] - job["started_at"]).total_seconds()
+            else:
+                elapsed = time.monotonic() - started
+                fraction = job["progress"]
+                if 0 < fraction < 1:
+                    eta = elapsed / fraction * (1 - fraction)
+        job["elapsed_seconds"] = round(elapsed, 2) if elapsed is not None else None
+        job["eta_seconds"] = round(eta, 2) if eta is not None else None
+        return job
+
+    def shutdown(self, timeout: float = CALC_JOB_SHUTDOWN_SECONDS):
+        """
+        Cancel queued jobs, stop running ones at their next progress report and
+        wait up to `timeout` seconds for them to fail their runs.
+        """
+        self._stopping.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        now = datetime.now()
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == JOB_QUEUED:
+                    job.update(status=JOB_FAILED, stage=JOB_FAILED, finished_at=now,
+                               error="Calculation cancelled: server shutting down")
+            running = list(self._futures.values())
+
+        _, still_running = wait(running, timeout=timeout)
+        if still_running:
+            logger.warning("%d calculation job(s) still running at shutdown; their runs are failed on next startup",
+                           len(still_running))
+
+
+job_runner = JobRunner()
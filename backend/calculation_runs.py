@@ -0,0 +1,212 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from database import get_connection
+
+############################ CALCULATION RUN LIFECYCLE #########################
+# A run is one calculation of one period. Result rows are written under the
+# run while it is "running" (invisible to readers), then complete_run()
+# swaps it in for the period's previous run in a single transaction.
+# `source_seq` records which uploads a run reflects (uploaded_files.seq, see
+# migration 0007), so an incremental refresh only has to look at files
+# committed after it; `source_cutoff` is the matching time, for display.
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+RUN_SUPERSEDED = "superseded"
+
+
+def start_run(period: str, mode: str = "full") -> str:
+    """Insert a run in `running` state and commit it so failures stay visible."""
+    run_id = str(uuid.uuid4())
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO calculation_runs (id, period, mode, status, started_at)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (run_id, period, mode, RUN_RUNNING, datetime.now()))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return run_id
+
+
+def latest_completed_run(cursor, period: Optional[str] = None) -> Optional[dict]:
+    """Latest completed run, for a given period or across all periods."""
+    if period:
+        cursor.execute("""
+            SELECT * FROM calculation_runs
+            WHERE period = %s AND status = %s
+            ORDER BY completed_at DESC LIMIT 1
+        """, (period, RUN_COMPLETED))
+    else:
+        cursor.execute("""
+            SELECT * FROM calculation_runs
+            WHERE status = %s
+            ORDER BY completed_at DESC LIMIT 1
+        """, (RUN_COMPLETED,))
+    return cursor.fetchone()
+
+
+def complete_run(cursor, run_id: str, period: str, employee_count: int, sales_row_count: int,
+                 source_cutoff: datetime, source_seq: int):
+    """
+    Publish `run_id` as the period's current run and drop the previous one.
+    Must run inside the caller's transaction; the caller commits.
+    """
+    # Serialise publications of the period (migration 0009). The upsert X-locks the
+    # row even when it exists, so a concurrent complete_run waits here until this
+    # transaction commits and then supersedes this run instead of publishing beside it.
+    cursor.execute("""
+        INSERT INTO calculation_period_locks (period) VALUES (%s)
+        ON DUPLICATE KEY UPDATE period = VALUES(period)
+    """, (period,))
+    cursor.execute("""
+        SELECT id FROM calculation_runs
+        WHERE period = %s AND status = %s AND id <> %s
+        FOR UPDATE
+    """, (period, RUN_COMPLETED, run_id))
+    previous_ids = [row["id"] for row in cursor.fetchall()]
+
+    if previous_ids:
+        placeholders = ", ".join(["%s"] * len(previous_ids))
+        # period = %s lets MySQL prune to the period's partition
+        for table in ("incentive_rule_applications", "incentive_calculations"):
+            cursor.execute(
+                f"DELETE FROM {table} WHERE period = %s AND run_id IN ({placeholders})",
+                [period] + previous_ids
+            )
+        cursor.execute(
+            f"UPDATE calculation_runs SET status = %s WHERE id IN ({placeholders})",
+            [RUN_SUPERSEDED] + previous_ids
+        )
+
+    completed_at = datetime.now()
+    cursor.execute("""
+        UPDATE calculation_runs
+        SET status = %s, completed_at = %s, employee_count = %s, sales_row_count = %s,
+            source_cutoff = %s, source_seq = %s
+        WHERE id = %s
+    """, (RUN_COMPLETED, completed_at, employee_count, sales_row_count, source_cutoff, source_seq, run_id))
+    write_dashboard_summary(cursor, run_id, period, completed_at)
+    return previous_ids
+
+
+def refresh_run(cursor, run_id: str, period: str, source_cutoff: datetime, source_seq: int):
+    """
+    Record an incremental refresh of a completed run: uploads up to
+    `source_seq` are now reflected. Runs inside the caller's transaction.
+    """
+    completed_at = datetime.now()
+    cursor.execute("""
+        UPDATE calculation_runs
+        SET completed_at = %s, source_cutoff = %s, source_seq = %s,
+            employee_count = (SELECT COUNT(*) FROM incentive_calculations WHERE period = %s AND run_id = %s)
+        WHERE id = %s
+    """, (completed_at, source_cutoff, source_seq, period, run_id, run_id))
+    write_dashboard_summary(cursor, run_id, period, completed_at)
+
+
+# ---------- Upload sequence ----------
+def stamp_upload(cursor, upload_file_id: str) -> int:
+    """
+    Give an upload the next upload sequence number. Call it as the upload's last
+    statement before commit: the upload_sequence row stays locked until then, so
+    concurrent uploads are numbered in commit order.
+    """
+    cursor.execute("UPDATE upload_sequence SET seq = LAST_INSERT_ID(seq + 1) WHERE id = 1")
+    cursor.execute("UPDATE uploaded_files SET seq = LAST_INSERT_ID() WHERE id = %s", (upload_file_id,))
+    cursor.execute("SELECT LAST_INSERT_ID() AS seq")
+    return int(cursor.fetchone()["seq"])
+
+
+def source_snapshot(cursor) -> int:
+    """
+    Start a consistent-snapshot transaction and return the last upload seq it
+    sees; the calculation's reads on this cursor then reflect exactly the
+    uploads up to that seq.
+    """
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    cursor.execute("SELECT seq FROM upload_sequence WHERE id = 1")
+    return int(cursor.fetchone()["seq"])
+
+
+def write_dashboard_summary(cursor, run_id: str, period: str, completed_at: datetime):
+    """
+    Upsert the period's dashboard_summary row from the run's result rows.
+    Called when a run is published or refreshed, inside that transaction.
+    """
+    cursor.execute("""
+        SELECT COALESCE(SUM(total_incentive), 0) AS total_incentive,
+               COUNT(DISTINCT employee_id) AS salesperson_count
+        FROM incentive_calculations
+        WHERE period = %s AND run_id = %s
+    """, (period, run_id))
+    totals = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT ic.employee_id, e.branch, e.role, ic.total_incentive
+        FROM incentive_calculations ic
+        LEFT JOIN employees e ON e.employee_id = ic.employee_id
+        WHERE ic.period = %s AND ic.run_id = %s
+        ORDER BY ic.total_incentive DESC
+        LIMIT 1
+    """, (period, run_id))
+    top = cursor.fetchone() or {}
+
+    cursor.execute("""
+        INSERT INTO dashboard_summary (
+            period, run_id, total_incentive, salesperson_count,
+            top_employee_id, top_branch, top_role, top_total_incentive,
+            last_calculation_run, updated_at
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            run_id = VALUES(run_id), total_incentive = VALUES(total_incentive),
+            salesperson_count = VALUES(salesperson_count), top_employee_id = VALUES(top_employee_id),
+            top_branch = VALUES(top_branch), top_role = VALUES(top_role),
+            top_total_incentive = VALUES(top_total_incentive),
+            last_calculation_run = VALUES(last_calculation_run), updated_at = VALUES(updated_at)
+    """, (
+        period, run_id, float(totals["total_incentive"]), int(totals["salesperson_count"]),
+        top.get("employee_id"), top.get("branch"), top.get("role"),
+        float(top["total_incentive"]) if top else None,
+        completed_at, datetime.now()
+    ))
+
+
+def fail_run(run_id: str, error: str):
+    """Mark a run failed and discard any rows it wrote (separate connection, best effort)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM incentive_rule_applications WHERE run_id = %s", (run_id,))
+        cursor.execute("DELETE FROM incentive_calculations WHERE run_id = %s", (run_id,))
+        cursor.execute("""
+            UPDATE calculation_runs SET status = %s, completed_at = %s, error = %s
+            WHERE id = %s
+        """, (RUN_FAILED, datetime.now(), error[:2000], run_id))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fail_stale_runs() -> List[str]:
+    """
+    Fail runs left `running` by a previous process (jobs live in memory, so
+    nothing can finish them); called once at startup. Returns their ids.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM calculation_runs WHERE status = %s", (RUN_RUNNING,))
+        run_ids = [row["id"] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    for run_id in run_ids:
+        fail_run(run_id, "Calculation interrupted: server restarted")
+    return run_ids
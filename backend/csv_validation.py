@@ -0,0 +1,122 @@
+import math
+from datetime import date
+from typing import Any, Dict, List, Tuple, Type
+import pandas as pd
+from annotated_types import Ge
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+############################ COLUMNAR CSV VALIDATION #########################
+# Validates a whole DataFrame chunk with vectorized masks instead of building
+# one Pydantic model per row. Field names, types and constraints are read from
+# the Pydantic row models (models.py), which stay the schema source of truth;
+# errors use the same shape as ValidationError.errors().
+
+
+def _json_safe(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    return value
+
+
+def _error(field: str, error_type: str, msg: str, value: Any) -> Dict[str, Any]:
+    return {"type": error_type, "loc": (field,), "msg": msg, "input": _json_safe(value)}
+
+
+def _check_str(series: pd.Series):
+    missing = series.isna()
+    coerced = series.where(missing, series.astype(str))
+    return coerced, [(missing, "string_type", "Input should be a valid string")]
+
+
+def _check_int(series: pd.Series):
+    numeric = pd.to_numeric(series, errors="coerce")
+    unparsable = numeric.isna()
+    fractional = ~unparsable & (numeric % 1 != 0)
+    coerced = numeric.where(~(unparsable | fractional), 0).astype("int64")
+    return coerced, [
+        (unparsable, "int_parsing", "Input should be a valid integer, unable to parse string as an integer"),
+        (fractional, "int_from_float", "Input should be a valid integer, got a number with a fractional part"),
+    ]
+
+
+def _check_float(series: pd.Series):
+    numeric = pd.to_numeric(series, errors="coerce").astype("float64")
+    return numeric, [(numeric.isna(), "float_parsing", "Input should be a valid number, unable to parse string as a number")]
+
+
+def _check_date(series: pd.Series):
+    parsed = pd.to_datetime(series, errors="coerce")
+    invalid = parsed.isna()
+    coerced = pd.Series([d.date() if not pd.isna(d) else None for d in parsed], index=series.index, dtype=object)
+    return coerced, [(invalid, "date_from_datetime_parsing", "Input should be a valid date or datetime")]
+
+
+_CHECKS = {str: _check_str, int: _check_int, float: _check_float, date: _check_date}
+
+
+def _check_with_adapter(annotation):
+    """Fallback for field types without a vectorized check: validate each distinct value once."""
+    adapter = TypeAdapter(annotation)
+
+    def check(series: pd.Series):
+        results = {}
+        failures: Dict[Tuple[str, str], List[Any]] = {}  # (error type, msg) -> values failing with it
+        for value in series.dropna().unique():
+            try:
+                results[value] = adapter.validate_python(value)
+            except ValidationError as e:
+                error = e.errors()[0]
+                failures.setdefault((error["type"], error["msg"]), []).append(value)
+        masks = [(series.isna(), "missing", "Field required")]
+        masks += [(series.isin(values), error_type, msg) for (error_type, msg), values in failures.items()]
+        return series.map(results), masks
+
+    return check
+
+
+def validate_frame(df: pd.DataFrame, model: Type[BaseModel]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Validate `df` against `model` column by column.
+
+    Returns (clean, invalid_rows): `clean` holds only rows that passed every
+    check, with columns coerced to the model's types, and `invalid_rows` is
+    [{"row_number", "errors"}] using the CSV line number (index + 2).
+    """
+    row_errors: Dict[Any, List[Dict[str, Any]]] = {}
+    clean = pd.DataFrame(index=df.index)
+
+    for field, info in model.model_fields.items():
+        series = df[field] if field in df.columns else pd.Series(None, index=df.index, dtype=object)
+        check = _CHECKS.get(info.annotation) or _check_with_adapter(info.annotation)
+        coerced, failures = check(series)
+
+        # ---------- Numeric constraints declared on the model (e.g. Field(ge=1)) ----------
+        for constraint in info.metadata:
+            if isinstance(constraint, Ge):
+                failed = pd.Series(False, index=df.index)
+                for mask, _, _ in failures:
+                    failed |= mask
+                failures.append((
+                    ~failed & (coerced < constraint.ge),
+                    "greater_than_equal",
+                    f"Input should be greater than or equal to {constraint.ge}"
+                ))
+
+        for mask, error_type, msg in failures:
+            for idx in mask.index[mask.to_numpy()]:
+                row_errors.setdefault(idx, []).append(_error(field, error_type, msg, series.at[idx]))
+        clean[field] = coerced
+
+    invalid_index = list(row_errors)
+    invalid_rows = [
+        {"row_number": int(idx) + 2, "errors": row_errors[idx]}  # +2 for CSV header & 0-index
+        for idx in sorted(invalid_index)
+    ]
+    return clean.drop(index=invalid_index), invalid_rows
+
+
+def frame_rows(df: pd.DataFrame, columns: List[str]):
+    """Yield plain-Python tuples (no numpy scalars) for the DB writer."""
+    return df[columns].astype(object).itertuples(index=False, name=None)
@@ -1,7 +1,12 @@
 import pymysql
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from pymysql.cursors import DictCursor
+from metrics import TimedCursor, observe_acquire
 
 load_dotenv()
 
@@ -11,8 +16,15 @@ DBNAME = os.environ.get("DB_NAME")
 PASSWORD = os.environ.get("DB_PASSWORD")
 USER = os.environ.get("DB_USER")
 
+####################### POOL SETTINGS ######################
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 2))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))          # seconds to wait for a free connection
+POOL_RECYCLE = float(os.environ.get("DB_POOL_RECYCLE", 1800))        # max connection age in seconds
+POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", 5))     # ping connections idle longer than this
 
-def get_connection():
+
+def _connect():
     return pymysql.connect(
         host=HOST,
         user=USER,
@@ -22,5 +34,219 @@ def get_connection():
         connect_timeout=5
     )
 
-conn = get_connection()
-db = conn.cursor()
\ No newline at end of file
+
+class PooledConnection:
+    """
+    Thin proxy around a pymysql connection checked out from the pool.
+    Behaves like the raw connection; close() hands it back to the pool.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self._checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        # Statements are timed for the /metrics endpoint and the per-request stats
+        return TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._checked_out:
+            self._pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded MySQL connection pool with checkout health checks and recycling."""
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 recycle=POOL_RECYCLE, ping_after=POOL_PING_AFTER, connect=_connect):
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._connect = connect
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._warmed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+
+    # ---------- Internal helpers ----------
+    def _open(self):
+        conn = PooledConnection(self, self._connect())
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _drop(self, conn):
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn):
+        now = time.monotonic()
+        if now - conn.created_at > self.recycle:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if now - conn.last_used_at > self.ping_after:
+            try:
+                conn._raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                return False
+        return True
+
+    def _warm_up(self):
+        """Open min_size connections up front, best effort, on the first checkout."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                return
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    # ---------- Public API ----------
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise TimeoutError(f"Timed out after {self.timeout}s waiting for a DB connection")
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            # Connects and pings happen outside the lock
+            if conn is not None:
+                if self._is_healthy(conn):
+                    break
+                self._drop(conn)
+                continue
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            break
+
+        wait_time = time.monotonic() - started
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_seconds_total"] += wait_time
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait_time)
+            warm_up = not self._warmed
+            self._warmed = True
+        observe_acquire(wait_time)
+        if warm_up:
+            self._warm_up()
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn):
+        conn._checked_out = False
+        conn.last_used_at = time.monotonic()
+        try:
+            # Never hand out a connection with a half-finished transaction
+            conn._raw.rollback()
+            healthy = conn._raw.open
+        except Exception:
+            healthy = False
+        if not healthy:
+            self._drop(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._drop(conn)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._stats["checkouts"]
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                **self._stats,
+                "wait_seconds_avg": self._stats["wait_seconds_total"] / checkouts if checkouts else 0.0,
+            }
+
+
+# stats() keys that only ever increase (exported as Prometheus counters)
+POOL_COUNTER_STATS = (
+    "checkouts", "waits", "wait_seconds_total", "timeouts", "created", "recycled", "health_check_failures"
+)
+
+pool = ConnectionPool()
+
+
+def get_connection():
+    """Check a connection out of the pool. Call close() (or use it as a context manager) to return it."""
+    return pool.acquire()
+
+
+def get_pool_stats():
+    return pool.stats()
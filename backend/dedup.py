@@ -0,0 +1,69 @@
+import hashlib
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional
+
+############################ UPLOAD DEDUPLICATION #########################
+# Two levels, both backed by unique indexes (migration 0004):
+#   - whole files: uploaded_files.content_hash is the SHA-256 of the uploaded
+#     bytes; an identical re-upload of the same file type is answered from
+#     the earlier uploaded_files row without any write.
+#   - rows: sales_transactions / structured_rules / ad_hoc_rules carry
+#     row_hash, an MD5 of the row's natural key, and are inserted with
+#     INSERT IGNORE so rows already loaded by another file are skipped.
+
+# Natural key of each table, in the order hashed
+SALES_HASH_COLUMNS = ["employee_id", "branch", "role", "vehicle_model", "vehicle_type", "quantity", "sale_date"]
+STRUCTURED_HASH_COLUMNS = [
+    "rule_id", "role", "vehicle_type", "min_units", "max_units",
+    "incentive_amount_inr", "bonus_per_unit_inr", "valid_from", "valid_to", "rule_type"
+]
+AD_HOC_HASH_COLUMNS = [
+    "scheme_id", "scheme_name", "conditions", "role", "bonus_amount", "validity_from", "validity_to", "notes"
+]
+HASHED_TABLES = {
+    "sales_transactions": SALES_HASH_COLUMNS,
+    "structured_rules": STRUCTURED_HASH_COLUMNS,
+    "ad_hoc_rules": AD_HOC_HASH_COLUMNS,
+}
+
+
+def _canonical(value: Any) -> str:
+    # Same text whether the value comes from a validated CSV row or back from MySQL
+    if value is None:
+        return "\x00"
+    if isinstance(value, float):
+        # The natural keys' floats are FLOAT columns, which MySQL returns rounded to
+        # 6 significant digits; round CSV values the same way before hashing
+        value = float(f"{value:.6g}")
+        if value.is_integer():
+            return str(int(value))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def row_hash(values: Iterable[Any]) -> bytes:
+    """16-byte digest of a row's natural-key values (BINARY(16) row_hash column)."""
+    return hashlib.md5("\x1f".join(_canonical(v) for v in values).encode("utf-8")).digest()
+
+
+def find_upload(cursor, file_type: str, content_hash: str) -> Optional[Dict[str, Any]]:
+    cursor.execute("""
+        SELECT id, file_name, uploaded_at, total_records, invalid_rows_count
+        FROM uploaded_files WHERE file_type = %s AND content_hash = %s
+    """, (file_type, content_hash))
+    return cursor.fetchone()
+
+
+def duplicate_upload_response(upload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "status": True,
+        "message": f"Identical file already uploaded as {upload['file_name']} on {upload['uploaded_at']}; nothing inserted",
+        "file_id": upload["id"],
+        "duplicate": True,
+        "total_records": upload["total_records"],
+        "invalid_rows_count": upload["invalid_rows_count"],
+        "invalid_rows": [],
+        "saved_file": None,
+        "write_stats": None
+    }
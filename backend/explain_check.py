@@ -0,0 +1,135 @@
+import sys
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import get_connection
+from routes.calculator import _fetch_rules, _fetch_sales, _period_bounds
+from routes.results import RESULT_COLUMNS_SQL, _build_filters
+from sales_aggregate import aggregate_upload
+
+############################ EXPLAIN CHECK #########################
+# Verifies that the calculator's and results' hot queries use the indexes,
+# monthly partitions and sales aggregate from migrations 0002/0003/0006. Since
+# 0008 dropped idx_sales_calc_cover, the only sales_transactions read on a hot
+# path is the per-upload aggregation (idx_sales_file_date). The
+# calculator queries are captured by running the real helpers against a cursor
+# that prefixes every statement with EXPLAIN, so the checked SQL is exactly
+# what ships.
+#
+#   python explain_check.py [--period YYYY-MM]
+#
+# Run it against a database holding realistic volumes (for instance the
+# benchmark database); on near-empty tables MySQL may prefer full scans.
+
+
+class ExplainCursor:
+    """Cursor stand-in: execute() runs EXPLAIN <sql> and fetch*() return the plan rows."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._plan: List[Dict[str, Any]] = []
+        self.plans: List[List[Dict[str, Any]]] = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self._cursor.execute("EXPLAIN " + sql, params)
+        self._plan = list(self._cursor.fetchall())
+        self.plans.append(self._plan)
+
+    def fetchall(self):
+        return self._plan
+
+    def fetchone(self):
+        return self._plan[0] if self._plan else None
+
+
+def _plan_row(plan: List[Dict[str, Any]], table: str) -> Optional[Dict[str, Any]]:
+    return next((row for row in plan if row.get("table") == table), None)
+
+
+def _check(name: str, plan: List[Dict[str, Any]], table: str, index: str,
+           covering: bool = False, single_partition: bool = False) -> Dict[str, Any]:
+    row = _plan_row(plan, table)
+    problems = []
+    if row is None:
+        problems.append(f"table {table} not in plan")
+    else:
+        if row.get("key") != index:
+            problems.append(f"uses key {row.get('key')!r} (type {row.get('type')}), expected {index}")
+        if covering and "Using index" not in (row.get("Extra") or ""):
+            problems.append("not index-only (no 'Using index')")
+        partitions = (row.get("partitions") or "").split(",")
+        if single_partition and len(partitions) != 1:
+            problems.append(f"reads partitions {row.get('partitions')!r}, expected one month")
+    return {"check": name, "ok": not problems, "problems": problems, "plan": row}
+
+
+def run_checks(conn, period: str) -> List[Dict[str, Any]]:
+    start_date, end_date = _period_bounds(datetime.strptime(period, "%Y-%m"))
+    cursor = conn.cursor()
+    try:
+        explain = ExplainCursor(cursor)
+        results = []
+
+        # ---------- Calculator ----------
+        _fetch_sales(explain, start_date, end_date)
+        results.append(_check("calculator: month sales aggregate", explain.plans[-1], "sales_monthly_agg",
+                              "PRIMARY"))
+
+        _fetch_sales(explain, start_date, end_date, ["E001", "E002"])
+        results.append(_check("calculator: sales of changed employees", explain.plans[-1], "sales_monthly_agg",
+                              "PRIMARY"))
+
+        # ---------- Sales upload: one file's rows added to the aggregate ----------
+        aggregate_upload(explain, "00000000-0000-0000-0000-000000000000")
+        results.append(_check("ingest: aggregate one sales upload", explain.plans[-1], "sales_transactions",
+                              "idx_sales_file_date"))
+
+        _fetch_rules(explain, start_date, end_date)
+        structured_plan, ad_hoc_plan = explain.plans[-2:]
+        results.append(_check("calculator: structured rules valid in period", structured_plan,
+                              "structured_rules", "idx_rules_validity"))
+        results.append(_check("calculator: ad-hoc rules valid in period", ad_hoc_plan,
+                              "ad_hoc_rules", "idx_adhoc_validity"))
+
+        # ---------- Results ----------
+        for name, filters, index, single_partition in (
+            ("results: one employee", {"employee_id": "E001"}, "idx_calc_employee_date", False),
+            ("results: one period", {"period": period}, "idx_calc_period_date", True),
+        ):
+            clauses, params = _build_filters(
+                filters.get("period"), None, None, filters.get("employee_id")
+            )
+            explain.execute(
+                f"{RESULT_COLUMNS_SQL} WHERE {' AND '.join(clauses)} "
+                f"ORDER BY ic.calculation_date DESC, ic.id DESC LIMIT %s",
+                params + [500]
+            )
+            results.append(_check(name, explain.plans[-1], "ic", index, single_partition=single_partition))
+        return results
+    finally:
+        cursor.close()
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN assertions for the calculator/results queries")
+    parser.add_argument("--period", default=datetime.now().strftime("%Y-%m"))
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        results = run_checks(conn, args.period)
+    finally:
+        conn.close()
+
+    for result in results:
+        print(f"[{'PASS' if result['ok'] else 'FAIL'}] {result['check']}")
+        for problem in result["problems"]:
+            print(f"       {problem}")
+        if result["problems"]:
+            print(f"       plan: {result['plan']}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
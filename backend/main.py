@@ -1,9 +1,19 @@
 import uvicorn
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from database import POOL_COUNTER_STATS, pool, get_pool_stats
+from calculation_jobs import job_runner
+from calculation_runs import fail_stale_runs
+from migrate import apply_migrations
+import metrics
+import os
+import logging
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -25,9 +35,63 @@ app.include_router(data_ingestion_router, prefix="/data-ingestion")
 app.include_router(calculator_router, prefix="/calculator")
 app.include_router(results_router, prefix="/results")
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+   # Per-request stage / DB stats; stages run in the threadpool share this scope
+   with metrics.request_scope(f"{request.method} {request.url.path}") as scope:
+      started = time.perf_counter()
+      status = 500
+      try:
+         response = await call_next(request)
+         status = response.status_code
+         return response
+      finally:
+         # Endpoint name rather than raw path keeps label cardinality bounded
+         endpoint = getattr(request.scope.get("endpoint"), "__name__", "unmatched")
+         metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, endpoint, str(status))
+         metrics.HTTP_REQUEST_DB_QUERIES.observe(scope.db_queries, request.method, endpoint)
+         metrics.log_if_slow(scope, method=request.method, endpoint=endpoint, status=status)
+
 @app.get("/")
 async def index():
    return {"message": "Hello World"}
 
+@app.get("/db/pool_stats")
+def db_pool_stats():
+   return {"status": True, "data": get_pool_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+   stats = get_pool_stats()
+   return PlainTextResponse(
+      metrics.render(
+         gauges={"incentive_db_pool": {k: v for k, v in stats.items() if k not in POOL_COUNTER_STATS}},
+         counters={"incentive_db_pool": {k: stats[k] for k in POOL_COUNTER_STATS}}
+      ),
+      media_type="text/plain; version=0.0.4"
+   )
+
+@app.on_event("startup")
+def auto_migrate():
+   # Opt-in: apply pending schema migrations when the server starts
+   if os.environ.get("DB_AUTO_MIGRATE", "0") == "1":
+      apply_migrations()
+
+@app.on_event("startup")
+def fail_interrupted_runs():
+   # Runs still `running` belong to jobs of a previous process that died mid-run
+   try:
+      run_ids = fail_stale_runs()
+   except Exception as e:
+      logger.warning("Could not fail interrupted calculation runs: %s", e)
+      return
+   if run_ids:
+      logger.warning("Failed %d calculation run(s) interrupted by a restart: %s", len(run_ids), ", ".join(run_ids))
+
+@app.on_event("shutdown")
+def close_db_pool():
+   job_runner.shutdown()
+   pool.close_all()
+
 if __name__ == "__main__":
    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+slow_logger = logging.getLogger("metrics.slow")
+
+############################ HOT-PATH METRICS #########################
+# Process-wide counters / histograms rendered in the Prometheus text format
+# by GET /metrics, plus a per-request (or per-job) scope that collects stage
+# timings, rows processed, DB query count / time and connection acquisition
+# time for the structured slow-request log.
+#
+#   with metrics.stage("calc.fetch_sales"):
+#       rows = _fetch_sales(...)
+#   metrics.add_rows("calc.sales_groups", len(rows))
+
+####################### METRICS SETTINGS ######################
+# Requests / jobs slower than this are logged as one JSON line (0 = off)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+# ---------- Registry ----------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            lines.extend(self._render_value(values, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _render_value(self, values, value):
+        return [f"{self.name}{self._label_text(values)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, values, state):
+        bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+        counts = state["buckets"] + [state["count"]]
+        lines = [
+            f"{self.name}_bucket{self._label_text(values, bound)} {count}"
+            for bound, count in zip(bounds, counts)
+        ]
+        lines.append(f"{self.name}_sum{self._label_text(values)} {state['sum']}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {state['count']}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "incentive_http_request_seconds", "HTTP request duration until the response starts.",
+    ("method", "endpoint", "status"))
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "incentive_http_request_db_queries", "DB statements executed per HTTP request.",
+    ("method", "endpoint"), buckets=COUNT_BUCKETS)
+JOB_SECONDS = Histogram("incentive_job_seconds", "Background job duration.", ("kind", "status"))
+STAGE_SECONDS = Histogram("incentive_stage_seconds", "Duration of instrumented hot-path stages.", ("stage",))
+ROWS_PROCESSED = Counter("incentive_rows_processed_total", "Rows processed by hot-path stages.", ("stage",))
+DB_QUERY_SECONDS = Histogram("incentive_db_query_seconds", "DB statement execution time.", ("statement",))
+DB_ACQUIRE_SECONDS = Histogram("incentive_db_connection_acquire_seconds", "Time to check a connection out of the pool.")
+
+REGISTRY: List[_Metric] = [
+    HTTP_REQUEST_SECONDS, HTTP_REQUEST_DB_QUERIES, JOB_SECONDS, STAGE_SECONDS, ROWS_PROCESSED,
+    DB_QUERY_SECONDS, DB_ACQUIRE_SECONDS,
+]
+
+
+# ---------- Per-request scope ----------
+class RequestMetrics:
+    """What one request or job spent its time on; shared by the threads working for it."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.rows: Dict[str, int] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "stages_ms": {name: round(s * 1000, 3) for name, s in self.stages.items()},
+                "rows": dict(self.rows),
+                "db_queries": self.db_queries,
+                "db_ms": round(self.db_seconds * 1000, 3),
+                "connection_acquire_ms": round(self.acquire_seconds * 1000, 3),
+            }
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def request_scope(label: str):
+    """Collect the metrics of everything run inside the block (threadpool calls inherit the context)."""
+    scope = RequestMetrics(label)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+def log_if_slow(scope: RequestMetrics, **fields):
+    summary = scope.summary()
+    if SLOW_REQUEST_MS and summary["duration_ms"] >= SLOW_REQUEST_MS:
+        slow_logger.warning(json.dumps({"event": "slow_request", "label": scope.label, **fields, **summary},
+                                       default=str))
+
+
+# ---------- Recording ----------
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, name)
+    scope = _current.get()
+    if scope is not None:
+        with scope._lock:
+            scope.stages[name] = scope.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def add_rows(stage_name: str, count: int):
+    ROWS_PROCESSED.inc(count, stage_name)
+    scope = _current.get()
+    if scope is not None:
+        with scope._lock:
+            scope.rows[stage_name] = scope.rows.get(stage_name, 0) + count
+
+
+def observe_query(sql: str, seconds: float):
+    words = str(sql).split(None, 1)
+    statement = words[0].lower() if words else "other"
+    if statement not in ("select", "insert", "update", "delete", "replace", "explain"):
+        statement = "other"
+    DB_QUERY_SECONDS.observe(seconds, statement)
+    scope = _current.get()
+    if scope is not None:
+        with scope._lock:
+            scope.db_queries += 1
+            scope.db_seconds += seconds
+
+
+def observe_acquire(seconds: float):
+    DB_ACQUIRE_SECONDS.observe(seconds)
+    scope = _current.get()
+    if scope is not None:
+        with scope._lock:
+            scope.acquire_seconds += seconds
+
+
+class TimedCursor:
+    """Cursor proxy recording every execute()/executemany() in the query metrics."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            observe_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            observe_query(query, time.perf_counter() - started)
+
+
+# ---------- Exposition ----------
+def render(gauges: Optional[Dict[str, Dict[str, float]]] = None,
+           counters: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    """
+    Prometheus text format. `gauges` and `counters` map a metric prefix to
+    extra name -> value samples; counter names get a `_total` suffix.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for kind, samples in (("gauge", gauges), ("counter", counters)):
+        for prefix, values in (samples or {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{key}"
+                    if kind == "counter" and not name.endswith("_total"):
+                        name += "_total"
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,254 @@
+import os
+import re
+import sys
+import hashlib
+import logging
+import importlib.util
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from database import get_connection
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+############################ SCHEMA MIGRATIONS #########################
+# Versioned schema changes live in migrations/ as NNNN_name.sql (statements
+# separated by ";" at end of line) or NNNN_name.py (defining upgrade(cursor)).
+# Applied versions are recorded in schema_migrations. MySQL DDL commits
+# implicitly, so each migration is recorded right after it succeeds.
+#
+#   python migrate.py status            list applied / pending migrations
+#   python migrate.py up                apply pending migrations
+#   python migrate.py baseline 0001     mark migrations up to 0001 applied
+#   python migrate.py partitions        add upcoming monthly partitions
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.(sql|py)$")
+
+####################### MONTHLY PARTITION SETTINGS ######################
+PARTITION_MONTHS_BACK = int(os.environ.get("PARTITION_MONTHS_BACK", 24))
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", 12))
+# table -> format of the exclusive upper bound of a month's partition
+MONTH_PARTITIONED_TABLES = {
+    "sales_transactions": "%Y-%m-01",       # RANGE COLUMNS (sale_date)
+    "incentive_calculations": "%Y-%m",      # RANGE COLUMNS (period)
+}
+
+
+# ---------- Discovery ----------
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Dict[str, str]]:
+    migrations = []
+    for file_name in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(file_name)
+        if not match:
+            continue
+        path = os.path.join(directory, file_name)
+        with open(path, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append({
+            "version": match.group(1),
+            "name": match.group(2),
+            "kind": match.group(3),
+            "path": path,
+            "checksum": checksum,
+        })
+    return migrations
+
+
+def split_sql(text: str) -> List[str]:
+    """Statements of a migration file: full-line comments dropped, split on ';' at end of line."""
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def _load_python_migration(migration: Dict[str, str]):
+    spec = importlib.util.spec_from_file_location(f"migration_{migration['version']}", migration["path"])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------- Bookkeeping ----------
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version CHAR(4) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+
+
+def _applied(cursor) -> Dict[str, dict]:
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row["version"]: row for row in cursor.fetchall()}
+
+
+def _record(cursor, migration: Dict[str, str]):
+    cursor.execute(
+        "INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (%s, %s, %s, %s)",
+        (migration["version"], migration["name"], migration["checksum"], datetime.now())
+    )
+
+
+def migration_status(conn=None) -> List[Dict[str, object]]:
+    """Every known migration with applied_at (None if pending) and whether its file changed since."""
+    own_conn = conn is None
+    conn = conn or get_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        applied = _applied(cursor)
+        return [
+            {
+                "version": m["version"],
+                "name": m["name"],
+                "applied_at": applied[m["version"]]["applied_at"] if m["version"] in applied else None,
+                "modified": m["version"] in applied and applied[m["version"]]["checksum"] != m["checksum"],
+            }
+            for m in discover_migrations()
+        ]
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+def apply_migrations(conn=None, target: Optional[str] = None) -> List[str]:
+    """Apply pending migrations in version order (up to `target`); returns the versions applied."""
+    own_conn = conn is None
+    conn = conn or get_connection()
+    cursor = conn.cursor()
+    done = []
+    try:
+        _ensure_migrations_table(cursor)
+        applied = _applied(cursor)
+        for migration in discover_migrations():
+            if migration["version"] in applied or (target and migration["version"] > target):
+                continue
+            logger.info("Applying migration %s_%s", migration["version"], migration["name"])
+            if migration["kind"] == "sql":
+                with open(migration["path"], encoding="utf-8") as f:
+                    for statement in split_sql(f.read()):
+                        cursor.execute(statement)
+            else:
+                _load_python_migration(migration).upgrade(cursor)
+            _record(cursor, migration)
+            conn.commit()
+            done.append(migration["version"])
+        return done
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+def baseline(version: str, conn=None) -> List[str]:
+    """Record migrations up to `version` as applied without running them (hand-made databases)."""
+    own_conn = conn is None
+    conn = conn or get_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        applied = _applied(cursor)
+        marked = []
+        for migration in discover_migrations():
+            if migration["version"] <= version and migration["version"] not in applied:
+                _record(cursor, migration)
+                marked.append(migration["version"])
+        conn.commit()
+        return marked
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+# ---------- Monthly range partitions ----------
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_clauses(table: str, first_month: date, last_month: date) -> List[str]:
+    """PARTITION clauses for every month in [first_month, last_month] (no MAXVALUE partition)."""
+    bound_format = MONTH_PARTITIONED_TABLES[table]
+    clauses = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        upper = _add_months(month, 1)
+        clauses.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper.strftime(bound_format)}')")
+        month = upper
+    return clauses
+
+
+def partition_window(earliest: Optional[date] = None) -> Tuple[date, date]:
+    """Months to pre-create: from the earliest data (or PARTITION_MONTHS_BACK) to PARTITION_MONTHS_AHEAD."""
+    this_month = date.today().replace(day=1)
+    first = _add_months(this_month, -PARTITION_MONTHS_BACK)
+    if earliest is not None:
+        first = min(first, earliest.replace(day=1))
+    return first, _add_months(this_month, PARTITION_MONTHS_AHEAD)
+
+
+def ensure_month_partitions(cursor, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Split the catch-all pmax partition so monthly partitions exist `months_ahead` months out."""
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    months = [row["PARTITION_NAME"] for row in cursor.fetchall() if row["PARTITION_NAME"] != "pmax"]
+    if not months:
+        return []  # table is not partitioned (migration 0003 not applied)
+
+    last = datetime.strptime(months[-1], "p%Y%m").date()
+    target = _add_months(date.today().replace(day=1), months_ahead)
+    clauses = month_partition_clauses(table, _add_months(last, 1), target)
+    if not clauses:
+        return []
+    cursor.execute(
+        f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ("
+        + ", ".join(clauses + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]) + ")"
+    )
+    return [clause.split()[1] for clause in clauses]
+
+
+def _main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command = argv[0] if argv else "status"
+
+    if command == "status":
+        for m in migration_status():
+            state = f"applied {m['applied_at']}" if m["applied_at"] else "pending"
+            changed = " (file modified since applied)" if m["modified"] else ""
+            print(f"{m['version']}_{m['name']}: {state}{changed}")
+    elif command == "up":
+        applied = apply_migrations(target=argv[1] if len(argv) > 1 else None)
+        print(f"Applied: {', '.join(applied) if applied else 'nothing to apply'}")
+    elif command == "baseline" and len(argv) == 2:
+        print(f"Marked as applied: {', '.join(baseline(argv[1])) or 'nothing'}")
+    elif command == "partitions":
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            for table in MONTH_PARTITIONED_TABLES:
+                added = ensure_month_partitions(cursor, table)
+                print(f"{table}: {', '.join(added) if added else 'up to date'}")
+        finally:
+            cursor.close()
+            conn.close()
+    else:
+        print("usage: python migrate.py [status | up [VERSION] | baseline VERSION | partitions]")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+-- 0001: tables as of the introduction of versioned migrations
+
+CREATE TABLE uploaded_files (
+  id CHAR(36) PRIMARY KEY,
+  file_name VARCHAR(255),
+  file_type VARCHAR(50),
+  uploaded_at DATETIME,
+  total_records INT DEFAULT 0,
+  invalid_rows_count INT DEFAULT 0,
+  invalid_rows JSON DEFAULT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  INDEX idx_uploaded_files_created (created_at)
+);
+
+CREATE TABLE sales_transactions (
+  id CHAR(36) PRIMARY KEY,
+  employee_id VARCHAR(50),
+  branch VARCHAR(100),
+  role VARCHAR(50),
+  vehicle_model VARCHAR(100),
+  vehicle_type VARCHAR(50),
+  quantity INT,
+  sale_date DATE,
+  upload_file_id CHAR(36),
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (upload_file_id) REFERENCES uploaded_files(id),
+  INDEX idx_sales_file_date (upload_file_id, sale_date, employee_id)
+);
+
+-- One row per salesperson; kept current by upload_sales_data (latest upload wins)
+CREATE TABLE employees (
+  employee_id VARCHAR(50) PRIMARY KEY,
+  branch VARCHAR(100),
+  role VARCHAR(50),
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Backfill for databases created before the employees table existed:
+-- INSERT INTO employees (employee_id, branch, role, updated_at)
+-- SELECT employee_id, MAX(branch), MAX(role), NOW() FROM sales_transactions GROUP BY employee_id;
+
+CREATE TABLE structured_rules (
+    id VARCHAR(36) PRIMARY KEY,
+    rule_id VARCHAR(50),
+    role VARCHAR(50),
+    vehicle_type VARCHAR(50),
+    min_units INT,
+    max_units INT,
+    incentive_amount_inr FLOAT,
+    bonus_per_unit_inr FLOAT,
+    valid_from DATE,
+    valid_to DATE,
+    rule_type VARCHAR(50),
+    upload_file_id VARCHAR(36),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (upload_file_id) REFERENCES uploaded_files(id)
+);
+
+CREATE TABLE ad_hoc_rules (
+    id CHAR(36) PRIMARY KEY DEFAULT (UUID()), -- UUID for each row
+    scheme_id INT NOT NULL,                    -- group multiple rows under same scheme
+    scheme_name VARCHAR(255) NOT NULL,
+    conditions TEXT NOT NULL,                 -- incentive condition
+    role VARCHAR(255) NOT NULL,                -- eligible roles
+    bonus_amount VARCHAR(50),                  -- numeric, "Variable" or "1.5x base"
+    validity_from DATE NOT NULL,
+    validity_to DATE NOT NULL,
+    notes TEXT,
+    upload_file_id CHAR(36) NOT NULL,          -- FK to uploaded_files
+    created_at DATETIME NOT NULL,
+    CONSTRAINT fk_upload_file FOREIGN KEY (upload_file_id)
+        REFERENCES uploaded_files(id)
+        ON DELETE CASCADE
+);
+
+-- One row per calculation of a period; only the latest completed run per period keeps results
+CREATE TABLE calculation_runs (
+    id CHAR(36) PRIMARY KEY,
+    period CHAR(7) NOT NULL,                  -- "YYYY-MM"
+    mode VARCHAR(20) NOT NULL DEFAULT 'full', -- full | incremental
+    status VARCHAR(20) NOT NULL,              -- running | completed | failed | superseded
+    started_at DATETIME NOT NULL,
+    completed_at DATETIME NULL,
+    source_cutoff DATETIME NULL,              -- uploads created after this are not reflected yet
+    employee_count INT DEFAULT 0,
+    sales_row_count INT DEFAULT 0,
+    error TEXT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_runs_period_status (period, status, completed_at),
+    INDEX idx_runs_status_completed (status, completed_at)
+);
+
+CREATE TABLE incentive_calculations (
+    id CHAR(36) PRIMARY KEY,
+    run_id CHAR(36) NOT NULL,
+    employee_id VARCHAR(50) NOT NULL,
+    period CHAR(7) NOT NULL,                  -- "YYYY-MM" the calculation was run for
+    total_units INT NOT NULL DEFAULT 0,       -- units matched by structured rules
+    total_incentive DOUBLE NOT NULL,
+    structured_incentive DOUBLE NOT NULL,
+    ad_hoc_incentive DOUBLE NOT NULL,
+    calculation_date DATETIME NOT NULL,
+    details LONGTEXT NOT NULL,
+    created_at DATETIME NOT NULL,
+    UNIQUE KEY uq_calc_run_employee (run_id, employee_id),
+    INDEX idx_calc_date_id (calculation_date, id),            -- keyset pagination
+    INDEX idx_calc_period_date (period, calculation_date, id),
+    INDEX idx_calc_employee (employee_id)
+);
+
+-- One row per structured rule / ad-hoc scheme applied to a result row, for SQL breakdowns
+CREATE TABLE incentive_rule_applications (
+    id CHAR(36) PRIMARY KEY,
+    result_id CHAR(36) NOT NULL,              -- incentive_calculations.id
+    run_id CHAR(36) NOT NULL,
+    employee_id VARCHAR(50) NOT NULL,
+    period CHAR(7) NOT NULL,
+    rule_type VARCHAR(20) NOT NULL,           -- structured | ad_hoc
+    rule_id VARCHAR(255) NOT NULL,            -- structured rule_id or ad-hoc scheme name
+    vehicle_model VARCHAR(100) NULL,
+    vehicle_type VARCHAR(50) NULL,
+    quantity INT NULL,
+    calculation_details TEXT NULL,            -- ad-hoc condition text
+    incentive_amount DOUBLE NOT NULL,
+    created_at DATETIME NOT NULL,
+    INDEX idx_ira_run_employee (run_id, employee_id),     -- replace/patch a run, per-employee drill-down
+    INDEX idx_ira_rule_period (rule_type, rule_id, period),  -- "which employees hit rule R-12"
+    INDEX idx_ira_period_rule (period, rule_type, rule_id)   -- per-rule / per-scheme totals for a period
+);
+
+-- One row per period describing its current (completed) run; written by the
+-- calculator when a run completes so the dashboard is a single-row read
+CREATE TABLE dashboard_summary (
+    period CHAR(7) PRIMARY KEY,
+    run_id CHAR(36) NOT NULL,
+    total_incentive DOUBLE NOT NULL DEFAULT 0,
+    salesperson_count INT NOT NULL DEFAULT 0,
+    top_employee_id VARCHAR(50) NULL,
+    top_branch VARCHAR(100) NULL,
+    top_role VARCHAR(50) NULL,
+    top_total_incentive DOUBLE NULL,
+    last_calculation_run DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    INDEX idx_summary_last_run (last_calculation_run)
+);
+
+-- ---------------------------------------------------------------------------
+-- Databases created by hand from the old backend/schemas.sql (before
+-- migrations existed): bring them up to the tables above with the statements
+-- below that apply, then record this migration as already applied with
+--     python migrate.py baseline 0001
+-- and let `python migrate.py up` apply the rest.
+-- 0003 makes sales_transactions.sale_date NOT NULL and stops before changing
+-- anything while rows without one exist; date or delete them first:
+--     SELECT * FROM sales_transactions WHERE sale_date IS NULL;
+-- ---------------------------------------------------------------------------
+--
+-- Upgrading an existing incentive_calculations table:
+-- ALTER TABLE incentive_calculations
+--     ADD COLUMN period CHAR(7) NOT NULL DEFAULT '' AFTER employee_id,
+--     ADD INDEX idx_calc_date_id (calculation_date, id),
+--     ADD INDEX idx_calc_period_date (period, calculation_date, id),
+--     ADD INDEX idx_calc_employee (employee_id);
+-- UPDATE incentive_calculations SET period = DATE_FORMAT(calculation_date, '%Y-%m') WHERE period = '';
+--
+-- Adding calculation runs to an existing database (create calculation_runs first; legacy rows
+-- are grouped into one completed run per period):
+-- ALTER TABLE incentive_calculations ADD COLUMN run_id CHAR(36) NOT NULL DEFAULT '' AFTER id;
+-- INSERT INTO calculation_runs (id, period, status, started_at, completed_at, employee_count)
+-- SELECT UUID(), period, 'completed', MIN(calculation_date), MAX(calculation_date), COUNT(DISTINCT employee_id)
+-- FROM incentive_calculations GROUP BY period;
+-- UPDATE incentive_calculations ic JOIN calculation_runs r ON r.period = ic.period SET ic.run_id = r.id;
+-- Duplicate (period, employee_id) rows from earlier re-runs must be removed before:
+-- ALTER TABLE incentive_calculations ADD UNIQUE KEY uq_calc_run_employee (run_id, employee_id);
+--
+-- Incremental recalculation:
+-- ALTER TABLE calculation_runs
+--     ADD COLUMN mode VARCHAR(20) NOT NULL DEFAULT 'full' AFTER period,
+--     ADD COLUMN source_cutoff DATETIME NULL AFTER completed_at;
+-- ALTER TABLE uploaded_files ADD INDEX idx_uploaded_files_created (created_at);
+-- ALTER TABLE sales_transactions ADD INDEX idx_sales_file_date (upload_file_id, sale_date, employee_id);
+--
+-- Dashboard summary (create dashboard_summary first, then backfill from current runs):
+-- INSERT INTO dashboard_summary (period, run_id, total_incentive, salesperson_count, last_calculation_run, updated_at)
+-- SELECT r.period, r.id, COALESCE(SUM(ic.total_incentive), 0), COUNT(DISTINCT ic.employee_id), r.completed_at, NOW()
+-- FROM calculation_runs r LEFT JOIN incentive_calculations ic ON ic.run_id = r.id
+-- WHERE r.status = 'completed' GROUP BY r.id, r.period, r.completed_at;
+-- (top performer columns are filled in by the next calculation of each period)
+--
+-- Rule applications / total_units (create incentive_rule_applications first):
+-- ALTER TABLE incentive_calculations ADD COLUMN total_units INT NOT NULL DEFAULT 0 AFTER period;
+-- UPDATE incentive_calculations ic SET total_units = COALESCE((
+--     SELECT SUM(jt.quantity) FROM JSON_TABLE(ic.details, '$.structured[*]' COLUMNS (quantity INT PATH '$.quantity')) jt
+-- ), 0);
+-- INSERT INTO incentive_rule_applications (id, result_id, run_id, employee_id, period, rule_type, rule_id,
+--     vehicle_model, vehicle_type, quantity, calculation_details, incentive_amount, created_at)
+-- SELECT UUID(), ic.id, ic.run_id, ic.employee_id, ic.period, 'structured', jt.rule_applied,
+--     jt.vehicle_model, jt.vehicle_type, jt.quantity, NULL, jt.amount, ic.created_at
+-- FROM incentive_calculations ic, JSON_TABLE(ic.details, '$.structured[*]' COLUMNS (
+--     rule_applied VARCHAR(255) PATH '$.rule_applied', vehicle_model VARCHAR(100) PATH '$.vehicle_model',
+--     vehicle_type VARCHAR(50) PATH '$.vehicle_type', quantity INT PATH '$.quantity', amount DOUBLE PATH '$.amount')) jt
+-- UNION ALL
+-- SELECT UUID(), ic.id, ic.run_id, ic.employee_id, ic.period, 'ad_hoc', jt.scheme_name,
+--     NULL, NULL, NULL, jt.cond, jt.amount, ic.created_at
+-- FROM incentive_calculations ic, JSON_TABLE(ic.details, '$.ad_hoc[*]' COLUMNS (
+--     scheme_name VARCHAR(255) PATH '$.scheme_name', cond TEXT PATH '$.condition', amount DOUBLE PATH '$.amount')) jt;
@@ -0,0 +1,25 @@
+-- 0002: composite indexes for the calculator / results query shapes
+-- (checked by explain_check.py)
+
+-- _fetch_sales: SUM(quantity) ... GROUP BY employee_id, vehicle_type, role, vehicle_model
+-- for one month, optionally for a list of employees. Covering, in GROUP BY
+-- order: the month query reads only this index inside its month partition
+-- (0003) without a temporary table, and the employee query is a range on it.
+ALTER TABLE sales_transactions
+    ADD INDEX idx_sales_calc_cover (employee_id, vehicle_type, role, vehicle_model, sale_date, quantity);
+
+-- _fetch_rules: valid_from <= period end AND valid_to >= period start
+ALTER TABLE structured_rules
+    ADD INDEX idx_rules_validity (valid_from, valid_to, role, vehicle_type);
+
+ALTER TABLE ad_hoc_rules
+    ADD INDEX idx_adhoc_validity (validity_from, validity_to);
+
+-- GETincentiveresults?employee_id=...: filter + keyset order in one index
+ALTER TABLE incentive_calculations
+    DROP INDEX idx_calc_employee,
+    ADD INDEX idx_calc_employee_date (employee_id, calculation_date, id);
+
+-- GETincentiveresults?branch=...&role=...
+ALTER TABLE employees
+    ADD INDEX idx_employees_branch_role (branch, role);
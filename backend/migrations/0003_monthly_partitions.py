@@ -0,0 +1,62 @@
+# 0003: range-partition the two high-volume tables by month
+#
+# sales_transactions is partitioned on sale_date and incentive_calculations on
+# period, so a month's calculation / results only touch that month's partition.
+# MySQL requires the partitioning column in every unique key and does not allow
+# foreign keys on partitioned InnoDB tables, hence the key changes below.
+# Partitions cover the existing data through PARTITION_MONTHS_AHEAD months;
+# `python migrate.py partitions` (e.g. monthly from cron) adds later months.
+#
+# sale_date becomes NOT NULL. MySQL DDL commits implicitly, so sales rows
+# without a sale_date are checked before anything is changed and the migration
+# stops if there are any; date or delete them by hand, then run it again.
+from datetime import datetime
+from migrate import month_partition_clauses, partition_window
+
+
+def _partition_by(table, column, earliest):
+    first, last = partition_window(earliest)
+    clauses = month_partition_clauses(table, first, last) + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+    return f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS ({column}) (\n    " + ",\n    ".join(clauses) + "\n)"
+
+
+def upgrade(cursor):
+    cursor.execute("SELECT COUNT(*) AS missing FROM sales_transactions WHERE sale_date IS NULL")
+    missing = cursor.fetchone()["missing"]
+    if missing:
+        raise RuntimeError(
+            f"0003: {missing} sales_transactions rows have no sale_date and cannot be partitioned. "
+            "Set their sale_date (or delete them), then run `python migrate.py up` again; "
+            "nothing was changed. List them with: SELECT * FROM sales_transactions WHERE sale_date IS NULL"
+        )
+
+    # ---------- sales_transactions: by sale_date ----------
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sales_transactions'
+          AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+    """)
+    for row in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE sales_transactions DROP FOREIGN KEY {row['CONSTRAINT_NAME']}")
+
+    cursor.execute("""
+        ALTER TABLE sales_transactions
+            MODIFY sale_date DATE NOT NULL,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, sale_date)
+    """)
+    cursor.execute("SELECT MIN(sale_date) AS earliest FROM sales_transactions")
+    cursor.execute(_partition_by("sales_transactions", "sale_date", cursor.fetchone()["earliest"]))
+
+    # ---------- incentive_calculations: by period ----------
+    cursor.execute("""
+        ALTER TABLE incentive_calculations
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, period),
+            DROP INDEX uq_calc_run_employee,
+            ADD UNIQUE KEY uq_calc_run_employee (run_id, employee_id, period)
+    """)
+    cursor.execute("SELECT MIN(period) AS earliest FROM incentive_calculations")
+    earliest = cursor.fetchone()["earliest"]
+    earliest = datetime.strptime(earliest, "%Y-%m").date() if earliest else None
+    cursor.execute(_partition_by("incentive_calculations", "period", earliest))
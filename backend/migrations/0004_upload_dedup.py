@@ -0,0 +1,69 @@
+# 0004: content-hash and row-hash deduplication for uploads
+#
+# uploaded_files.content_hash (SHA-256 of the file) is unique per file type so a
+# byte-identical re-upload is answered from the earlier row. sales_transactions,
+# structured_rules and ad_hoc_rules get row_hash (dedup.row_hash of the natural
+# key) under a unique index; inserts use INSERT IGNORE against it.
+#
+# Existing rows are hashed here with the same Python function the upload path
+# uses, in keyset batches by id. Rows that are already duplicated keep their
+# data but only the first copy (lowest id) gets the hash (NULLs do not collide),
+# so nothing is deleted by this migration. Duplicates are resolved in MySQL, so
+# memory stays bounded by one batch whatever the table size.
+from dedup import HASHED_TABLES, row_hash
+from bulk_writer import bulk_insert
+
+BACKFILL_BATCH_ROWS = 50000
+# Unique keys must contain the partitioning column of partitioned tables (0003)
+ROW_HASH_KEYS = {
+    "sales_transactions": "(row_hash, sale_date)",
+    "structured_rules": "(row_hash)",
+    "ad_hoc_rules": "(row_hash)",
+}
+
+
+def _backfill(cursor, table, columns):
+    cursor.execute("""
+        CREATE TEMPORARY TABLE tmp_row_hashes (
+            id CHAR(36) PRIMARY KEY,
+            row_hash BINARY(16) NOT NULL,
+            INDEX (row_hash, id)
+        )
+    """)
+    last_id = ""
+    while True:
+        cursor.execute(
+            f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, BACKFILL_BATCH_ROWS)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        bulk_insert(
+            cursor, "tmp_row_hashes", ["id", "row_hash"],
+            ((row["id"], row_hash(row[column] for column in columns)) for row in rows)
+        )
+
+    # Only the lowest id of each hash gets it; equal hashes imply equal sale_date
+    cursor.execute(f"""
+        UPDATE {table} t
+        JOIN (SELECT row_hash, MIN(id) AS id FROM tmp_row_hashes GROUP BY row_hash) kept ON kept.id = t.id
+        SET t.row_hash = kept.row_hash
+    """)
+    cursor.execute("DROP TEMPORARY TABLE tmp_row_hashes")
+
+
+def upgrade(cursor):
+    # ---------- Whole-file fingerprint ----------
+    cursor.execute("""
+        ALTER TABLE uploaded_files
+            ADD COLUMN content_hash CHAR(64) NULL AFTER file_type,
+            ADD UNIQUE KEY uq_uploaded_files_hash (file_type, content_hash)
+    """)
+
+    # ---------- Row fingerprints ----------
+    for table, columns in HASHED_TABLES.items():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN row_hash BINARY(16) NULL")
+        _backfill(cursor, table, columns)
+        cursor.execute(f"ALTER TABLE {table} ADD UNIQUE KEY uq_{table}_row_hash {ROW_HASH_KEYS[table]}")
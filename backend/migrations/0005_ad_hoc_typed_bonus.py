@@ -0,0 +1,25 @@
+# 0005: typed ad-hoc bonus fields
+#
+# ad_hoc_rules.bonus_amount stays as uploaded (rupees, "1.5x" or "Variable");
+# bonus_kind ('fixed' / 'multiplier' / 'variable') and bonus_value are filled
+# by scheme_parser at upload time so the calculator reads numbers instead of
+# parsing strings. Existing rows are typed here with the same parser, once per
+# distinct bonus_amount.
+from scheme_parser import parse_bonus_amount
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        ALTER TABLE ad_hoc_rules
+            ADD COLUMN bonus_kind VARCHAR(20) NULL AFTER bonus_amount,
+            ADD COLUMN bonus_value DOUBLE NULL AFTER bonus_kind
+    """)
+
+    cursor.execute("SELECT DISTINCT bonus_amount FROM ad_hoc_rules WHERE bonus_amount IS NOT NULL")
+    for row in cursor.fetchall():
+        kind, value = parse_bonus_amount(row["bonus_amount"])
+        if kind is not None:
+            cursor.execute(
+                "UPDATE ad_hoc_rules SET bonus_kind = %s, bonus_value = %s WHERE bonus_amount = %s",
+                (kind, value, row["bonus_amount"])
+            )
@@ -0,0 +1,25 @@
+# 0006: materialized monthly sales aggregate
+#
+# One row per period and sales group with SUM(quantity), maintained by
+# upload_sales_data (sales_aggregate.aggregate_upload) and read by the calculator in
+# place of the GROUP BY over sales_transactions. The primary key is in the
+# calculator's group order, so a period (or a list of its employees) is a key
+# range. Existing sales are aggregated here with the same statement
+# `python sales_aggregate.py rebuild` uses.
+from sales_aggregate import rebuild
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE sales_monthly_agg (
+            period CHAR(7) NOT NULL,
+            employee_id VARCHAR(50) NOT NULL,
+            vehicle_type VARCHAR(50) NOT NULL,
+            role VARCHAR(50) NOT NULL,
+            vehicle_model VARCHAR(100) NOT NULL,
+            total_quantity BIGINT NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (period, employee_id, vehicle_type, role, vehicle_model)
+        )
+    """)
+    rebuild(cursor)
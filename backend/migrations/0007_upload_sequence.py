@@ -0,0 +1,41 @@
+# 0007: commit-ordered upload sequence for incremental runs
+#
+# Incremental runs used to find new uploads by uploaded_files.created_at >
+# calculation_runs.source_cutoff, both app-clock times; created_at is taken
+# when the upload starts, so a file committed just after a run's cutoff but
+# created before it was never picked up. Uploads now take the next
+# upload_sequence.seq right before they commit (the row lock is held until
+# that commit, so seq order is commit order) and runs record the last seq
+# their reads reflect in calculation_runs.source_seq.
+#
+# Existing uploads are numbered by created_at and existing runs get the last
+# seq created before their source_cutoff, which is what they reflected so far.
+BACKFILL_BATCH_ROWS = 1000
+
+
+def upgrade(cursor):
+    cursor.execute("CREATE TABLE upload_sequence (id TINYINT PRIMARY KEY, seq BIGINT NOT NULL)")
+    cursor.execute("""
+        ALTER TABLE uploaded_files
+            ADD COLUMN seq BIGINT NULL AFTER content_hash,
+            ADD UNIQUE KEY uq_uploaded_files_seq (seq)
+    """)
+    cursor.execute("ALTER TABLE calculation_runs ADD COLUMN source_seq BIGINT NULL AFTER source_cutoff")
+
+    # ---------- Number existing uploads ----------
+    cursor.execute("SELECT id FROM uploaded_files ORDER BY created_at, id")
+    ids = [row["id"] for row in cursor.fetchall()]
+    for offset in range(0, len(ids), BACKFILL_BATCH_ROWS):
+        cursor.executemany(
+            "UPDATE uploaded_files SET seq = %s WHERE id = %s",
+            [(offset + i + 1, upload_id) for i, upload_id in enumerate(ids[offset:offset + BACKFILL_BATCH_ROWS])]
+        )
+    cursor.execute("INSERT INTO upload_sequence (id, seq) VALUES (1, %s)", (len(ids),))
+
+    cursor.execute("""
+        UPDATE calculation_runs r
+        SET source_seq = (
+            SELECT COALESCE(MAX(f.seq), 0) FROM uploaded_files f
+            WHERE f.created_at <= COALESCE(r.source_cutoff, r.started_at)
+        )
+    """)
@@ -0,0 +1,8 @@
+-- 0008: drop the calculator's covering index on sales_transactions
+--
+-- idx_sales_calc_cover (0002) served the month GROUP BY of _fetch_sales. The
+-- calculator, the SQL engine and simulations read sales_monthly_agg (0006)
+-- instead, so the index had no readers left but was still maintained on every
+-- sales insert. Sales uploads aggregate their rows through idx_sales_file_date.
+ALTER TABLE sales_transactions
+    DROP INDEX idx_sales_calc_cover;
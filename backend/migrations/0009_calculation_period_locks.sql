@@ -0,0 +1,9 @@
+-- 0009: one lock row per period for publishing calculation runs
+--
+-- complete_run() used to lock only the period's completed runs; two runs of a
+-- period that had none yet both found nothing to supersede and both published.
+-- It now upserts the period's row here first, which X-locks it until commit,
+-- so publications of one period are serialised. Rows are created on demand.
+CREATE TABLE calculation_period_locks (
+    period CHAR(7) PRIMARY KEY
+);
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date,datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 class SalesRow(BaseModel):
     employee_id: str = Field(..., description="Employee ID of the salesperson")
@@ -32,6 +32,38 @@ class AdHocSchemeRow(BaseModel):
 
 class IncentiveCalculationRequest(BaseModel):
     period: str  # "2025-09"
+    # "incremental" only recomputes employees touched by uploads since the last run of the period
+    mode: Literal["full", "incremental"] = "full"
+    # "sql" pushes rule matching and result writes into MySQL; None uses CALC_ENGINE
+    engine: Optional[Literal["python", "sql"]] = None
+
+class BatchCalculationRequest(BaseModel):
+    # Either a list of periods ["2025-07", "2025-08"] or an inclusive range
+    periods: Optional[List[str]] = None
+    period_from: Optional[str] = None  # "2025-07"
+    period_to: Optional[str] = None    # "2025-09"
+    # "sql" pushes rule matching and result writes into MySQL; None uses CALC_ENGINE
+    engine: Optional[Literal["python", "sql"]] = None
+
+class RuleOverride(BaseModel):
+    # Structured rules to change; unset filters match every rule
+    rule_id: Optional[str] = None
+    role: Optional[str] = None
+    vehicle_type: Optional[str] = None
+    # New values for the matched rules ...
+    min_units: Optional[int] = None
+    max_units: Optional[int] = None
+    incentive_amount_inr: Optional[float] = None
+    bonus_per_unit_inr: Optional[float] = None
+    # ... and/or amounts added to them (e.g. bonus_per_unit_delta=200)
+    incentive_amount_delta: float = 0
+    bonus_per_unit_delta: float = 0
+
+class SimulationRequest(BaseModel):
+    period: str  # "2025-09"
+    overrides: List[RuleOverride] = []
+    # Changed employees returned, largest absolute delta first
+    limit: int = Field(100, ge=0, le=100000)
 
 # ----------------------------
 # Ad-Hoc Details Model
@@ -40,6 +72,9 @@ class AdHocDetail(BaseModel):
     scheme_name: str
     condition: str
     amount: float
+    bonus_kind: Optional[str] = None      # fixed / multiplier / variable
+    multiplier: Optional[float] = None
+    needs_review: bool = False            # "Variable" awards are paid as 0 until reviewed
 
 # ----------------------------
 # Incentive Details Model
@@ -87,6 +122,7 @@ class IncentiveResponse(BaseModel):
     message: str
     summary: Summary
     data: List[EmployeeIncentive]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= to fetch the next page
 
 # ----------------------------
 # Dashboard Response Models
@@ -96,6 +132,8 @@ class DashboardResponse(BaseModel):
     salesperson_processed: int
     top_performer: TopPerformer
     last_calculation_run: Optional[datetime] = None
+    period: Optional[str] = None   # period of the run the stats describe
+    run_id: Optional[str] = None
 
 class DashboardAPIResponse(BaseModel):
     status: bool
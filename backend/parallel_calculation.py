@@ -0,0 +1,88 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+from dotenv import load_dotenv
+from calculation_engine import CompiledRules, calculate_employee_incentives
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+####################### PARALLEL CALCULATION SETTINGS ######################
+# CALC_WORKERS=1 keeps everything in the request process (the default).
+CALC_WORKERS = int(os.environ.get("CALC_WORKERS", 1))
+# Periods with fewer employees per worker than this are not worth a process pool.
+CALC_MIN_SHARD_EMPLOYEES = int(os.environ.get("CALC_MIN_SHARD_EMPLOYEES", 5000))
+
+# Compiled rules for the period, set once per worker process by the pool initializer
+_worker_rules: Optional[CompiledRules] = None
+
+
+def _init_worker(rules: CompiledRules):
+    global _worker_rules
+    _worker_rules = rules
+
+
+def _run_shard(df_shard: pd.DataFrame) -> List[Dict[str, Any]]:
+    return calculate_employee_incentives(df_shard, _worker_rules)
+
+
+def shard_sales(df_sales: pd.DataFrame, shards: int) -> List[pd.DataFrame]:
+    """
+    Split aggregated sales into `shards` frames by contiguous ranges of sorted
+    employee_id, so every employee lands in exactly one shard and concatenating
+    shard results in order gives the same ordering as a single-process run.
+    """
+    employee_ids = pd.Series(df_sales["employee_id"].unique()).sort_values(kind="mergesort").to_numpy()
+    shards = max(1, min(shards, len(employee_ids)))
+    bounds = [len(employee_ids) * i // shards for i in range(shards + 1)]
+    shard_of = {}
+    for shard, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        shard_of.update((emp_id, shard) for emp_id in employee_ids[lo:hi])
+    keys = df_sales["employee_id"].map(shard_of)
+    return [df_sales[keys == shard] for shard in range(shards)]
+
+
+def _in_process(df_sales: pd.DataFrame, rules: CompiledRules,
+                on_progress: Optional[Callable[[int], None]]) -> List[Dict[str, Any]]:
+    results = calculate_employee_incentives(df_sales, rules)
+    if on_progress:
+        on_progress(len(results))
+    return results
+
+
+def calculate_incentives_parallel(df_sales: pd.DataFrame, rules: CompiledRules, workers: Optional[int] = None,
+                                  on_progress: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    calculate_employee_incentives() split across a process pool of `workers`
+    employee shards. Falls back to the single-process path when parallelism is
+    disabled, the period is small, or the pool cannot be started.
+    `on_progress` is called with the employees calculated so far as shards finish.
+    """
+    workers = CALC_WORKERS if workers is None else workers
+    if df_sales.empty:
+        return []
+    employee_count = df_sales["employee_id"].nunique()
+    workers = min(workers, employee_count // max(CALC_MIN_SHARD_EMPLOYEES, 1))
+    if workers <= 1:
+        return _in_process(df_sales, rules, on_progress)
+
+    shards = shard_sales(df_sales, workers)
+    shard_results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as executor:
+            # map() yields in submission order -> deterministic merge
+            calculated = 0
+            for results in executor.map(_run_shard, shards):
+                shard_results.append(results)
+                calculated += len(results)
+                if on_progress:
+                    on_progress(calculated)
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("Process pool unavailable (%s); calculating in-process", e)
+        return _in_process(df_sales, rules, on_progress)
+
+    logger.info("Calculated %s employees across %s worker processes", employee_count, workers)
+    return [emp for results in shard_results for emp in results]
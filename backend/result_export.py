@@ -0,0 +1,187 @@
+import csv
+import io
+import os
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from dotenv import load_dotenv
+from metrics import add_rows
+
+try:  # in requirements.txt; without it only CSV exports work
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+load_dotenv()
+
+############################ RESULT EXPORT #########################
+# Turns rows of one calculation run, read in chunks from a server-side
+# cursor, into payroll files. Two flat tables are available: one row per
+# employee ("results") and one row per applied rule / scheme ("breakdown",
+# read from incentive_rule_applications).
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 10000))
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# (column, arrow type name) per export table
+RESULT_EXPORT_COLUMNS = [
+    ("run_id", "string"), ("period", "string"), ("employee_id", "string"),
+    ("branch", "string"), ("role", "string"), ("total_units", "int64"),
+    ("structured_incentive", "float64"), ("ad_hoc_incentive", "float64"),
+    ("total_incentive", "float64"), ("calculation_date", "timestamp"),
+]
+BREAKDOWN_EXPORT_COLUMNS = [
+    ("run_id", "string"), ("period", "string"), ("employee_id", "string"),
+    ("incentive_type", "string"), ("rule_id", "string"), ("scheme_name", "string"),
+    ("condition", "string"), ("vehicle_model", "string"), ("vehicle_type", "string"),
+    ("quantity", "int64"), ("amount", "float64"),
+]
+
+
+def _result_records(row: Dict[str, Any]) -> List[tuple]:
+    return [(
+        row["run_id"], row["period"], row["employee_id"], row.get("branch"), row.get("role"),
+        int(row["total_units"]), float(row["structured_incentive"]), float(row["ad_hoc_incentive"]),
+        float(row["total_incentive"]), row["calculation_date"],
+    )]
+
+
+def _breakdown_records(row: Dict[str, Any]) -> List[tuple]:
+    structured = row["rule_type"] == "structured"
+    return [(
+        row["run_id"], row["period"], row["employee_id"], row["rule_type"],
+        row["rule_id"] if structured else None,
+        None if structured else row["rule_id"],
+        row["calculation_details"], row["vehicle_model"], row["vehicle_type"], row["quantity"],
+        float(row["incentive_amount"]),
+    )]
+
+
+# Both read one run (parameter: run_id) in a stable order
+EXPORT_SQL = {
+    "results": """
+        SELECT ic.run_id, ic.period, ic.employee_id, ic.total_units, ic.structured_incentive,
+               ic.ad_hoc_incentive, ic.total_incentive, ic.calculation_date, e.branch, e.role
+        FROM incentive_calculations ic
+        LEFT JOIN employees e ON e.employee_id = ic.employee_id
+        WHERE ic.run_id = %s
+        ORDER BY ic.employee_id
+    """,
+    "breakdown": """
+        SELECT run_id, period, employee_id, rule_type, rule_id, calculation_details,
+               vehicle_model, vehicle_type, quantity, incentive_amount
+        FROM incentive_rule_applications
+        WHERE run_id = %s
+        ORDER BY employee_id, rule_type DESC, id
+    """,
+}
+
+
+EXPORT_TABLES: Dict[str, Tuple[List[Tuple[str, str]], Callable[[Dict[str, Any]], List[tuple]]]] = {
+    "results": (RESULT_EXPORT_COLUMNS, _result_records),
+    "breakdown": (BREAKDOWN_EXPORT_COLUMNS, _breakdown_records),
+}
+
+
+def iter_record_chunks(db_cursor, table: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """Flattened records of `table`, one list per fetchmany() chunk of an executed cursor."""
+    _, to_records = EXPORT_TABLES[table]
+    while True:
+        rows = db_cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        add_rows(f"export.{table}.rows", len(rows))
+        yield [record for row in rows for record in to_records(row)]
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(columns: List[Tuple[str, str]]):
+    types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "timestamp": pa.timestamp("s")}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _arrow_table(records: List[tuple], schema):
+    values = list(zip(*records))
+    return pa.Table.from_arrays(
+        [pa.array(list(column), type=field.type) for column, field in zip(values, schema)],
+        schema=schema
+    )
+
+
+def csv_stream(chunks: Iterator[List[tuple]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for records in chunks:
+        writer.writerows(records)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def arrow_stream(chunks: Iterator[List[tuple]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """Arrow IPC stream: one record batch per chunk."""
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    for records in chunks:
+        writer.write_table(_arrow_table(records, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_stream(chunks: Iterator[List[tuple]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """Parquet file written incrementally: one row group per chunk, footer at the end."""
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for records in chunks:
+        writer.write_table(_arrow_table(records, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+STREAM_WRITERS = {"csv": csv_stream, "parquet": parquet_stream, "arrow": arrow_stream}
+
+
+def arrow_available() -> bool:
+    return pa is not None
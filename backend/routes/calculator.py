@@ -2,11 +2,33 @@ from fastapi import APIRouter, UploadFile, File, Form,HTTPException
 import os
 import pandas as pd
 from dotenv import load_dotenv
-from database import db,conn,get_connection
+from database import get_connection
 from datetime import date, datetime
-from models import IncentiveCalculationRequest, EmployeeIncentive, IncentiveResponse
+from fastapi.concurrency import run_in_threadpool
+from models import (
+    IncentiveCalculationRequest, EmployeeIncentive, IncentiveResponse, SimulationRequest, BatchCalculationRequest
+)
+from parallel_calculation import calculate_incentives_parallel
+from rule_cache import rule_cache, rules_version
+from bulk_writer import bulk_insert, combine_write_stats
+from calculation_jobs import StageProgress, job_runner
+from calculation_runs import (
+    start_run, complete_run, fail_run, latest_completed_run, refresh_run, source_snapshot
+)
+from calculation_engine import CompiledRules
+from metrics import stage, add_rows
+from sql_engine import calculate_incentives_sql, insert_results_sql
+from sales_cache import sales_cache
+from sales_aggregate import sales_period
+from simulation import apply_overrides, simulation_cache, compare, evaluate
+from routes.data_ingestion import read_structured_rules_csv
+import io
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 import json
-import re
 import calendar
 import uuid
 
@@ -14,170 +36,749 @@ import uuid
 load_dotenv()
 calculator_router = APIRouter()
 
-############################ API ROUTES FOR CALCULATOR #########################
-@calculator_router.post("/api/incentives/calculate")
-def calculate_incentives(request: IncentiveCalculationRequest):
+# Result rows committed per transaction while a run is being written
+CALC_COMMIT_BATCH_SIZE = int(os.environ.get("CALC_COMMIT_BATCH_SIZE", 5000))
+# "python": match rules in pandas; "sql": push matching and result writes into MySQL (sql_engine.py)
+CALC_ENGINE = os.environ.get("CALC_ENGINE", "python")
+# Batch runs: periods calculated at the same time, and the most periods one request may cover
+CALC_BATCH_WORKERS = int(os.environ.get("CALC_BATCH_WORKERS", 3))
+CALC_BATCH_MAX_PERIODS = int(os.environ.get("CALC_BATCH_MAX_PERIODS", 24))
+
+CALC_COLUMNS = [
+    "id", "run_id", "employee_id", "period", "total_units", "total_incentive", "structured_incentive",
+    "ad_hoc_incentive", "calculation_date", "details", "created_at"
+]
+APPLICATION_COLUMNS = [
+    "id", "result_id", "run_id", "employee_id", "period", "rule_type", "rule_id", "vehicle_model",
+    "vehicle_type", "quantity", "calculation_details", "incentive_amount", "created_at"
+]
+
+
+############################ HELPERS #########################
+def _period_bounds(dt: datetime):
+    start_date = dt.date().replace(day=1)
+    last_day = calendar.monthrange(start_date.year, start_date.month)[1]
+    return start_date, start_date.replace(day=last_day)
+
+
+def _fetch_sales(cursor, start_date, end_date, employee_ids=None):
+    """
+    Aggregated sales for the period (read from sales_monthly_agg, so start_date..end_date
+    must be a whole month as given by _period_bounds), optionally restricted to some employees.
+    """
+    params = [sales_period(start_date)]
+    employee_sql = ""
+    if employee_ids is not None:
+        employee_sql = f"AND employee_id IN ({', '.join(['%s'] * len(employee_ids))})"
+        params.extend(employee_ids)
+    cursor.execute(f"""
+        SELECT employee_id, role, vehicle_type, vehicle_model, total_quantity
+        FROM sales_monthly_agg
+        WHERE period = %s {employee_sql}
+        ORDER BY employee_id, vehicle_type, role, vehicle_model
+    """, params)
+    return cursor.fetchall()
+
+
+def _fetch_rules(cursor, start_date, end_date):
+    """Structured and ad-hoc rules valid at any point of the period."""
+    # ---------- Fetch structured rules ----------
+    rules_sql = """
+    SELECT * FROM structured_rules
+    WHERE valid_from <= %s AND valid_to >= %s
+    """
+    cursor.execute(rules_sql, (end_date, start_date))
+    df_rules = pd.DataFrame(cursor.fetchall())
+
+    # ---------- Fetch ad-hoc rules ----------
+    adhoc_sql = """
+    SELECT * FROM ad_hoc_rules
+    WHERE validity_from <= %s AND validity_to >= %s
+    """
+    cursor.execute(adhoc_sql, (end_date, start_date))
+    df_ad_hoc = pd.DataFrame(cursor.fetchall())
+    return df_rules, df_ad_hoc
+
+
+def _get_rules(cursor, period, start_date, end_date):
+    """Compiled rules for the period from the in-process cache; reloaded on a miss or after a rule upload."""
+    return rule_cache.get(
+        period, start_date, end_date, lambda: _fetch_rules(cursor, start_date, end_date), rules_version(cursor)
+    )
+
+
+def _fetch_sales_with_branch(cursor, start_date, end_date):
+    """Aggregated sales for the period (as _fetch_sales) with each employee's branch."""
+    cursor.execute("""
+        SELECT s.employee_id, s.role, s.vehicle_type, s.vehicle_model, s.total_quantity, e.branch
+        FROM sales_monthly_agg s
+        LEFT JOIN employees e ON e.employee_id = s.employee_id
+        WHERE s.period = %s
+        ORDER BY s.employee_id, s.vehicle_type, s.role, s.vehicle_model
+    """, (sales_period(start_date),))
+    return pd.DataFrame(cursor.fetchall())
+
+
+def _result_rows(employee_results, run_id, period, calculated_at):
+    """incentive_calculations rows plus one incentive_rule_applications row per applied rule/scheme."""
+    calc_rows, application_rows = [], []
+    for emp in employee_results:
+        result_id = str(uuid.uuid4())
+        emp_id = emp["employee_id"]
+        calc_rows.append((
+            result_id,
+            run_id,
+            emp_id,
+            period,
+            emp["total_units"],
+            emp["total_incentive"],
+            emp["structured_incentive"],
+            emp["ad_hoc_incentive"],
+            calculated_at,
+            json.dumps(emp["details"]),
+            calculated_at
+        ))
+        for item in emp["details"]["structured"]:
+            application_rows.append((
+                str(uuid.uuid4()), result_id, run_id, emp_id, period, "structured", item["rule_applied"],
+                item["vehicle_model"], item["vehicle_type"], item["quantity"], None, item["amount"], calculated_at
+            ))
+        for item in emp["details"]["ad_hoc"]:
+            application_rows.append((
+                str(uuid.uuid4()), result_id, run_id, emp_id, period, "ad_hoc", item["scheme_name"],
+                None, None, None, item["condition"], item["amount"], calculated_at
+            ))
+    return calc_rows, application_rows
+
+
+def _insert_results(cursor, employee_results, run_id, period, calculated_at):
+    """Bulk insert result rows and their rule applications; returns both write stats."""
+    calc_rows, application_rows = _result_rows(employee_results, run_id, period, calculated_at)
+    return (
+        bulk_insert(cursor, "incentive_calculations", CALC_COLUMNS, calc_rows),
+        bulk_insert(cursor, "incentive_rule_applications", APPLICATION_COLUMNS, application_rows)
+    )
+
+
+def _summaries(employee_results):
+    return [
+        {
+            "employee_id": emp["employee_id"],
+            "total_incentive": emp["total_incentive"],
+            "structured_incentive": emp["structured_incentive"],
+            "ad_hoc_incentive": emp["ad_hoc_incentive"]
+        }
+        for emp in employee_results
+    ]
+
+
+def _stored_summaries(cursor, run_id, period):
+    """_summaries() of a run whose rows were written by the SQL engine."""
+    cursor.execute("""
+        SELECT employee_id, total_incentive, structured_incentive, ad_hoc_incentive
+        FROM incentive_calculations WHERE run_id = %s AND period = %s
+        ORDER BY employee_id
+    """, (run_id, period))
+    return [
+        {key: (float(value) if key != "employee_id" else value) for key, value in row.items()}
+        for row in cursor.fetchall()
+    ]
+
+
+def _affected_employees(cursor, since_seq, until_seq, start_date, end_date):
+    """
+    Employees whose inputs changed by uploads committed after `since_seq` (up to `until_seq`).
+    Returns (employee_ids, upload_file_ids); employee_ids is None when every
+    employee of the period is affected (e.g. a new ad-hoc scheme for ALL roles).
+    """
+    cursor.execute("SELECT id, file_type FROM uploaded_files WHERE seq > %s AND seq <= %s", (since_seq, until_seq))
+    new_files = cursor.fetchall()
+    if not new_files:
+        return set(), []
+
+    file_ids = [f["id"] for f in new_files]
+    in_files = ", ".join(["%s"] * len(file_ids))
+    affected = set()
+
+    # ---------- New sales rows in the period ----------
+    cursor.execute(f"""
+        SELECT DISTINCT employee_id FROM sales_transactions
+        WHERE upload_file_id IN ({in_files}) AND sale_date BETWEEN %s AND %s
+    """, file_ids + [start_date, end_date])
+    affected.update(row["employee_id"] for row in cursor.fetchall())
+
+    # ---------- New rules valid in the period -> every employee with that role ----------
+    cursor.execute(f"""
+        SELECT DISTINCT role FROM structured_rules
+        WHERE upload_file_id IN ({in_files}) AND valid_from <= %s AND valid_to >= %s
+    """, file_ids + [end_date, start_date])
+    roles = {str(row["role"]).strip().lower() for row in cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT DISTINCT role FROM ad_hoc_rules
+        WHERE upload_file_id IN ({in_files}) AND validity_from <= %s AND validity_to >= %s
+    """, file_ids + [end_date, start_date])
+    for row in cursor.fetchall():
+        roles.update(r.strip().lower() for r in str(row["role"]).split(","))
+    if "all" in roles:
+        return None, file_ids
+
+    if roles:
+        in_roles = ", ".join(["%s"] * len(roles))
+        cursor.execute(f"""
+            SELECT DISTINCT employee_id FROM sales_monthly_agg
+            WHERE period = %s AND LOWER(role) IN ({in_roles})
+        """, [sales_period(start_date)] + sorted(roles))
+        affected.update(row["employee_id"] for row in cursor.fetchall())
+
+    return affected, file_ids
+
+
+def _write_results(conn, cursor, employee_results, run_id, period, progress):
+    """
+    Insert a running run's result and rule application rows, committing every CALC_COMMIT_BATCH_SIZE
+    employees. Rows stay invisible to readers until complete_run() publishes
+    the run, and fail_run() removes them if the job dies part way.
+    """
+    calculated_at = datetime.now()
+    calc_parts, application_parts = [], []
+    for offset in range(0, len(employee_results), CALC_COMMIT_BATCH_SIZE):
+        batch = employee_results[offset:offset + CALC_COMMIT_BATCH_SIZE]
+        calc_stats, application_stats = _insert_results(cursor, batch, run_id, period, calculated_at)
+        calc_parts.append(calc_stats)
+        application_parts.append(application_stats)
+        conn.commit()
+        progress.advance(offset + len(batch))
+    return (
+        combine_write_stats("incentive_calculations", calc_parts),
+        combine_write_stats("incentive_rule_applications", application_parts)
+    )
+
+
+def _calculate_incremental(period, start_date, end_date, base_run, progress, engine):
+    """
+    Recompute only employees touched by uploads since the base run and patch that run in place.
+    The base run is already published, so the patch stays a single transaction.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
     try:
-        # ---------- DB connection ----------
+        # Every read below sees exactly the uploads up to source_seq
+        source_seq = source_snapshot(cursor)
+        source_cutoff = datetime.now()
+        if base_run.get("source_seq") is None:
+            return None  # run from before upload sequencing; caller falls back to a full run
+        progress.attach_run(base_run["id"])
+        progress.stage("finding_changes")
+        with stage("calc.find_changes"):
+            affected, file_ids = _affected_employees(cursor, base_run["source_seq"], source_seq, start_date, end_date)
+        if affected is None:
+            return None  # caller falls back to a full run
+
+        write_stats = application_write_stats = None
+        employee_results = []
+        progress.stage("calculating", employees_total=len(affected))
+        if affected:
+            employee_ids = sorted(affected)
+            # Not from rule_cache: a rule upload in this window must be applied, not a cached copy
+            with stage("calc.fetch_rules"):
+                rules = CompiledRules(period, *_fetch_rules(cursor, start_date, end_date))
+            if engine == "sql":
+                with stage("calc.sql_match"):
+                    employee_results = calculate_incentives_sql(cursor, start_date, end_date, rules, employee_ids)
+            else:
+                with stage("calc.fetch_sales"):
+                    sales_data = _fetch_sales(cursor, start_date, end_date, employee_ids)
+                add_rows("calc.sales_groups", len(sales_data))
+                with stage("calc.compute"):
+                    employee_results = calculate_incentives_parallel(
+                        pd.DataFrame(sales_data), rules, on_progress=progress.advance
+                    )
+            add_rows("calc.employees", len(employee_results))
+
+            # ---------- Upsert affected employees into the current run ----------
+            progress.stage("writing")
+            with stage("calc.write_results"):
+                in_employees = ", ".join(["%s"] * len(employee_ids))
+                for table in ("incentive_rule_applications", "incentive_calculations"):
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE period = %s AND run_id = %s AND employee_id IN ({in_employees})",
+                        [period, base_run["id"]] + employee_ids
+                    )
+                write_stats, application_write_stats = _insert_results(
+                    cursor, employee_results, base_run["id"], period, datetime.now()
+                )
+
+        with stage("calc.publish"):
+            refresh_run(cursor, base_run["id"], period, source_cutoff, source_seq)
+            conn.commit()
+        progress.advance(len(affected))
+        return {
+            "status": True,
+            "message": "Incentives recalculated incrementally",
+            "mode": "incremental",
+            "run_id": base_run["id"],
+            "period": period,
+            "new_upload_files": file_ids,
+            "recomputed_employees": len(employee_results),
+            "data": _summaries(employee_results),
+            "write_stats": write_stats,
+            "application_write_stats": application_write_stats
+        }
+
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _run_sql_engine(conn, cursor, run_id, period, start_date, end_date, progress, rules=None):
+    """Full run written by INSERT ... SELECT; returns (employees, sales groups, summaries, both write stats)."""
+    if rules is None:
+        with stage("calc.fetch_rules"):
+            rules = _get_rules(cursor, period, start_date, end_date)
+    progress.stage("calculating")
+    with stage("calc.sql_insert"):
+        outcome = insert_results_sql(cursor, run_id, period, start_date, end_date, rules, datetime.now())
+    if not outcome["sales_groups"]:
+        raise HTTPException(status_code=404, detail="No sales found for the period")
+    add_rows("calc.sales_groups", outcome["sales_groups"])
+    add_rows("calc.employees", outcome["employees"])
+    progress.stage("writing", employees_total=outcome["employees"])
+    conn.commit()
+    progress.advance(outcome["employees"])
+    return (
+        outcome["employees"], outcome["sales_groups"], _stored_summaries(cursor, run_id, period),
+        outcome["write_stats"], outcome["application_write_stats"]
+    )
+
+
+def run_calculation(progress, period: str, mode: str = "full", engine: str = None):
+    """Body of a calculation job: full run of `period`, or an incremental patch of its latest run."""
+    start_date, end_date = _period_bounds(datetime.strptime(period, "%Y-%m"))
+    engine = engine or CALC_ENGINE
+
+    # ---------- Incremental: patch the latest run when one exists ----------
+    if mode == "incremental":
         conn = get_connection()
         cursor = conn.cursor()
-
-        if not request.period:
-            raise HTTPException(status_code=400, detail="Period is required")
-        
         try:
-            dt = datetime.strptime(request.period, "%Y-%m")
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid period format. Expected YYYY-MM"
+            base_run = latest_completed_run(cursor, period)
+        finally:
+            cursor.close()
+            conn.close()
+        if base_run:
+            response = _calculate_incremental(period, start_date, end_date, base_run, progress, engine)
+            if response is not None:
+                return response
+
+    return _calculate_full(progress, period, start_date, end_date, engine)
+
+
+def _calculate_full(progress, period, start_date, end_date, engine, df_sales=None, rules=None, source_seq=None):
+    """
+    Full run of one period, published when complete. Sales and rules are read from
+    the DB unless already loaded by the caller (batch runs, which also pass the
+    source_seq of the snapshot they loaded from); the SQL engine reads sales itself.
+    """
+    run_id = start_run(period, mode="full")
+    progress.attach_run(run_id)
+
+    # ---------- DB connection (a pool timeout must still fail the run) ----------
+    try:
+        conn = get_connection()
+    except Exception as e:
+        fail_run(run_id, f"No database connection: {e}")
+        raise HTTPException(status_code=503, detail=f"Calculation error: no database connection ({e})")
+    cursor = conn.cursor()
+
+    try:
+        if source_seq is None:
+            source_seq = source_snapshot(cursor)
+        source_cutoff = datetime.now()
+
+        progress.stage("loading")
+        if engine == "sql":
+            # ---------- Match and write inside MySQL ----------
+            employee_count, sales_row_count, summaries, write_stats, application_write_stats = _run_sql_engine(
+                conn, cursor, run_id, period, start_date, end_date, progress, rules
             )
-        
-        # ---------- Compute start and end dates ----------
-        start_date = dt.date().replace(day=1)
-        last_day = calendar.monthrange(start_date.year, start_date.month)[1]
-        end_date = start_date.replace(day=last_day)
-
-        # ---------- Fetch all sales ----------
-        sales_sql = f"""
-        SELECT employee_id, role, vehicle_type, vehicle_model, SUM(quantity) AS total_quantity
-        FROM sales_transactions
-        WHERE sale_date BETWEEN '{start_date}' AND '{end_date}'
-        GROUP BY employee_id, vehicle_type, role, vehicle_model
-        """
-        cursor.execute(sales_sql)
-        sales_data = cursor.fetchall()
-        if not sales_data:
-            raise HTTPException(status_code=404, detail="No sales found for the period")
-
-        df_sales = pd.DataFrame(sales_data)
-        # ---------- Fetch structured rules ----------
-        rules_sql = """
-        SELECT * FROM structured_rules
-        WHERE valid_from <= %s AND valid_to >= %s
-        """
-        cursor.execute(rules_sql, (end_date, start_date))
-        structured_rules = cursor.fetchall()
-        df_rules = pd.DataFrame(structured_rules)
-        if not df_rules.empty:
-            df_rules.columns = [c.lower() for c in df_rules.columns]
-            df_rules['min_units'] = df_rules['min_units'].astype(int)
-            df_rules['max_units'] = df_rules['max_units'].astype(int)
-            df_rules['incentive_amount_inr'] = df_rules['incentive_amount_inr'].astype(float)
-            df_rules['bonus_per_unit_inr'] = df_rules['bonus_per_unit_inr'].astype(float)
-            df_rules['role'] = df_rules['role'].str.lower()
-            df_rules['vehicle_type'] = df_rules['vehicle_type'].str.lower()
-
-        # ---------- Fetch ad-hoc rules ----------
-        adhoc_sql = """
-        SELECT * FROM ad_hoc_rules
-        WHERE validity_from <= %s AND validity_to >= %s
-        """
-        cursor.execute(adhoc_sql, (end_date, start_date))
-        adhoc_rules = cursor.fetchall()
-        df_ad_hoc = pd.DataFrame(adhoc_rules)
-        if not df_ad_hoc.empty:
-            df_ad_hoc.columns = [c.lower() for c in df_ad_hoc.columns]
+        else:
+            # ---------- Fetch all sales ----------
+            if df_sales is None:
+                with stage("calc.fetch_sales"):
+                    df_sales = pd.DataFrame(_fetch_sales(cursor, start_date, end_date))
+            add_rows("calc.sales_groups", len(df_sales))
+            if df_sales.empty:
+                raise HTTPException(status_code=404, detail="No sales found for the period")
 
-        results = []
+            if rules is None:
+                with stage("calc.fetch_rules"):
+                    rules = _get_rules(cursor, period, start_date, end_date)
+
+            # ---------- Calculate every employee (sharded across CALC_WORKERS processes) ----------
+            progress.stage("calculating", employees_total=int(df_sales["employee_id"].nunique()))
+            with stage("calc.compute"):
+                employee_results = calculate_incentives_parallel(df_sales, rules, on_progress=progress.advance)
+            add_rows("calc.employees", len(employee_results))
 
-        # ---------- Iterate by employee ----------
-        for emp_id, emp_sales in df_sales.groupby("employee_id"):
-            structured_total = 0.0
-            details_structured = []
-
-            # ---------- Structured incentives ----------
-            if not df_rules.empty:
-                for _, sale in emp_sales.iterrows():
-                    vehicle = str(sale['vehicle_type']).capitalize()
-                    qty = int(sale['total_quantity'])
-                    sale_role = str(sale['role']).lower()
-
-                    matching_rules = df_rules[
-                        (df_rules['role'] == sale_role) &
-                        (df_rules['vehicle_type'] == sale['vehicle_type'].lower()) &
-                        (qty >= df_rules['min_units']) &
-                        (qty <= df_rules['max_units'])
-                    ]
-
-                    if matching_rules.empty:
-                        continue
-
-                    # pick the first matching rule (lowest min_units)
-                    rule = matching_rules.sort_values('min_units').iloc[0]
-
-                    bonus_units = max(0, qty - rule['min_units'])
-                    structured_amount = rule['incentive_amount_inr'] + bonus_units * rule['bonus_per_unit_inr']
-                    structured_total += structured_amount
-                    details_structured.append({
-                        "vehicle_model": sale['vehicle_model'],
-                        "vehicle_type": sale['vehicle_type'],
-                        "quantity": qty,
-                        "rule_applied": rule['rule_id'],
-                        "amount": structured_amount
-                    })
-
-            # ---------- Ad-Hoc incentives ----------
-            ad_hoc_total = 0.0
-            details_ad_hoc = []
-
-            if not df_ad_hoc.empty:
-                for _, scheme in df_ad_hoc.iterrows():
-                    eligible_roles = [r.strip().lower() for r in str(scheme['role']).split(',')]
-                    emp_role = str(emp_sales.iloc[0]['role']).lower()
-                    if emp_role not in eligible_roles and 'all' not in eligible_roles:
-                        continue  # Skip if employee not eligible
-
-                    if scheme['bonus_amount']:
-                        bonus_matches = re.findall(r"\d+", str(scheme['bonus_amount']).replace(",", ""))
-                        for b in bonus_matches:
-                            amount = float(b)
-                            ad_hoc_total += amount
-                            details_ad_hoc.append({
-                                "scheme_name": scheme['scheme_name'],
-                                "condition": scheme['conditions'],
-                                "amount": amount
-                            })
-
-            total_incentive = structured_total + ad_hoc_total
-
-            # ---------- Store calculation ----------
-            calc_id = str(uuid.uuid4())
-            insert_calc_sql = """
-            INSERT INTO incentive_calculations (
-                id, employee_id, total_incentive, structured_incentive, ad_hoc_incentive,
-                calculation_date, details, created_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            details_json = json.dumps({"structured": details_structured, "ad_hoc": details_ad_hoc})
-            cursor.execute(
-                insert_calc_sql,
-                (
-                    calc_id,
-                    emp_id,
-                    total_incentive,
-                    structured_total,
-                    ad_hoc_total,
-                    datetime.now(),
-                    details_json,
-                    datetime.now()
+            # ---------- Store calculations (committed in batches) ----------
+            progress.stage("writing")
+            with stage("calc.write_results"):
+                write_stats, application_write_stats = _write_results(
+                    conn, cursor, employee_results, run_id, period, progress
                 )
-            )
+            employee_count, sales_row_count = len(employee_results), len(df_sales)
+            summaries = _summaries(employee_results)
 
-            results.append({
-                "employee_id": emp_id,
-                "total_incentive": total_incentive,
-                "structured_incentive": structured_total,
-                "ad_hoc_incentive": ad_hoc_total
-            })
+        # ---------- Swap this run in for the period (atomic) ----------
+        progress.stage("publishing")
+        with stage("calc.publish"):
+            replaced_runs = complete_run(
+                cursor, run_id, period, employee_count, sales_row_count, source_cutoff, source_seq
+            )
+            conn.commit()
+        return {
+            "status": True,
+            "message": "Incentives calculated",
+            "mode": "full",
+            "engine": engine,
+            "run_id": run_id,
+            "period": period,
+            "replaced_runs": replaced_runs,
+            "data": summaries,
+            "write_stats": write_stats,
+            "application_write_stats": application_write_stats
+        }
 
-        conn.commit()
-        return {"status": True, "message": "Incentives calculated", "data": results}
+    except HTTPException as e:
+        conn.rollback()
+        fail_run(run_id, str(e.detail))
+        raise
 
     except Exception as e:
         conn.rollback()
+        fail_run(run_id, str(e))
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+############################ API ROUTES FOR CALCULATOR #########################
+@calculator_router.post("/api/incentives/calculate")
+def calculate_incentives(request: IncentiveCalculationRequest):
+    if not request.period:
+        raise HTTPException(status_code=400, detail="Period is required")
+
+    try:
+        dt = datetime.strptime(request.period, "%Y-%m")
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid period format. Expected YYYY-MM"
+        )
+
+    # ---------- Queue the run; progress is polled via the job endpoint ----------
+    period = dt.strftime("%Y-%m")
+    job = job_runner.submit(
+        "calculate", {"period": period, "mode": request.mode, "engine": request.engine}, run_calculation
+    )
+    return {
+        "status": True,
+        "message": "Calculation queued",
+        "job_id": job["job_id"],
+        "period": period,
+        "mode": request.mode,
+        "engine": request.engine or CALC_ENGINE,
+        "status_url": f"/calculator/api/incentives/jobs/{job['job_id']}"
+    }
+
+
+@calculator_router.get("/api/incentives/jobs/{job_id}")
+def get_calculation_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": True, "data": job}
+
+
+############################ WHAT-IF SIMULATION #########################
+def _parse_period(period: str) -> str:
+    try:
+        return datetime.strptime(period, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid period format. Expected YYYY-MM")
+
+
+def _simulation_inputs(period):
+    """(start, end, cached sales aggregate, cached compiled rules) of `period`; nothing is written."""
+    start_date, end_date = _period_bounds(datetime.strptime(period, "%Y-%m"))
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        with stage("simulate.load"):
+            rules = _get_rules(cursor, period, start_date, end_date)
+            sales = sales_cache.get(
+                period, start_date, end_date, lambda: _fetch_sales_with_branch(cursor, start_date, end_date)
+            )
+    finally:
+        cursor.close()
+        conn.close()
+    if sales.empty:
+        raise HTTPException(status_code=404, detail="No sales found for the period")
+    return start_date, end_date, sales, rules
+
+
+def _simulate(period, sales, rules, candidate, limit, **extra):
+    started = time.perf_counter()
+    with stage("simulate.baseline"):
+        profile, baseline = simulation_cache.get(period, sales, rules)
+    with stage("simulate.candidate"):
+        simulated = evaluate(profile, candidate)
+    result = compare(baseline, simulated, limit)
+    add_rows("simulate.employees", result["totals"]["employees"])
+    return {
+        "status": True,
+        "period": period,
+        **extra,
+        **result,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def _simulate_rule_file(period, contents, limit):
+    start_date, end_date, sales, rules = _simulation_inputs(period)
+    candidate_rules, invalid_rows = read_structured_rules_csv(io.BytesIO(contents))
+    # Same validity filter as _fetch_rules
+    candidate_rules = candidate_rules[
+        (candidate_rules["valid_from"] <= end_date) & (candidate_rules["valid_to"] >= start_date)
+    ]
+    return _simulate(
+        period, sales, rules, rules.with_structured(candidate_rules), limit,
+        candidate_rules=len(candidate_rules), invalid_rows_count=len(invalid_rows), invalid_rows=invalid_rows
+    )
+
+
+@calculator_router.post("/api/incentives/simulate")
+def simulate_incentives(request: SimulationRequest):
+    """What-if run of rule overrides against the period's sales; returns deltas, writes nothing."""
+    period = _parse_period(request.period)
+    _, _, sales, rules = _simulation_inputs(period)
+    candidate, matched = apply_overrides(rules.structured, request.overrides)
+    return _simulate(period, sales, rules, rules.with_structured(candidate), request.limit,
+                     overrides_matched=matched)
+
+
+@calculator_router.post("/api/incentives/simulate/file")
+async def simulate_incentives_file(period: str = Form(...), file: UploadFile = File(...), limit: int = Form(100)):
+    """What-if run with a candidate structured-rule CSV replacing the current structured rules."""
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files allowed")
+    period = _parse_period(period)
+    contents = await file.read()
+    return await run_in_threadpool(_simulate_rule_file, period, contents, max(limit, 0))
+
+
+############################ BATCH CALCULATION #########################
+# Several periods in one job (a quarter or a year-end true-up). Sales of all
+# periods come from one sales_monthly_agg query and rules from one query over
+# the whole range, cut per period by valid_from / valid_to. Periods are then
+# calculated concurrently (CALC_BATCH_WORKERS); each is still its own run,
+# written and published on its own, so one failing period leaves the others.
+def _month_range(period_from: str, period_to: str) -> List[str]:
+    year, month = (int(part) for part in period_from.split("-"))
+    periods = []
+    while f"{year:04d}-{month:02d}" <= period_to:
+        periods.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def _batch_periods(request: BatchCalculationRequest) -> List[str]:
+    """Sorted distinct periods of the request (list and/or range)."""
+    periods = [_parse_period(period) for period in request.periods or []]
+    if request.period_from or request.period_to:
+        if not (request.period_from and request.period_to):
+            raise HTTPException(status_code=400, detail="period_from and period_to must be given together")
+        period_from, period_to = _parse_period(request.period_from), _parse_period(request.period_to)
+        if period_from > period_to:
+            raise HTTPException(status_code=400, detail="period_from is after period_to")
+        periods += _month_range(period_from, period_to)
+    periods = sorted(set(periods))
+    if not periods:
+        raise HTTPException(status_code=400, detail="Give periods or period_from / period_to")
+    if len(periods) > CALC_BATCH_MAX_PERIODS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {CALC_BATCH_MAX_PERIODS} periods per batch, got {len(periods)}"
+        )
+    return periods
+
+
+def _rules_in_window(df_rules, df_ad_hoc, start_date, end_date):
+    """What _fetch_rules returns for [start_date, end_date], cut from the rows of a wider window."""
+    if not df_rules.empty:
+        df_rules = df_rules[(df_rules["valid_from"] <= end_date) & (df_rules["valid_to"] >= start_date)]
+    if not df_ad_hoc.empty:
+        df_ad_hoc = df_ad_hoc[(df_ad_hoc["validity_from"] <= end_date) & (df_ad_hoc["validity_to"] >= start_date)]
+    return df_rules.reset_index(drop=True), df_ad_hoc.reset_index(drop=True)
+
+
+def _fetch_sales_periods(cursor, periods) -> Dict[str, pd.DataFrame]:
+    """Aggregated sales of several periods in one query, as _fetch_sales frames per period."""
+    cursor.execute(f"""
+        SELECT period, employee_id, role, vehicle_type, vehicle_model, total_quantity
+        FROM sales_monthly_agg
+        WHERE period IN ({', '.join(['%s'] * len(periods))})
+        ORDER BY period, employee_id, vehicle_type, role, vehicle_model
+    """, list(periods))
+    df = pd.DataFrame(cursor.fetchall())
+    if df.empty:
+        return {}
+    return {
+        period: group.drop(columns="period").reset_index(drop=True)
+        for period, group in df.groupby("period", sort=False)
+    }
+
+
+class _BatchProgress:
+    """
+    Job progress of a batch: employees written / total summed over its periods,
+    and the stage-weighted fraction done of each period weighted by its employees.
+    """
+
+    def __init__(self, progress, employees_total: Dict[str, int]):
+        self._progress = progress
+        self._lock = threading.Lock()
+        self._periods = {period: StageProgress(total) for period, total in employees_total.items()}
+        self._written: Dict[str, int] = {}
+        self.run_ids: Dict[str, str] = {}
+
+    def for_period(self, period: str) -> "_PeriodProgress":
+        return _PeriodProgress(self, period)
+
+    def _report(self, period, stage=None, employees_total=None, employees_done=None):
+        with self._lock:
+            stages = self._periods.setdefault(period, StageProgress())
+            if stage is not None:
+                stages.enter(stage, employees_total)
+            if employees_done is not None:
+                stages.employees_done = employees_done
+                if stages.stage == "writing":
+                    self._written[period] = employees_done
+            weights = [(p.employees_total or 0, p.fraction()) for p in self._periods.values()]
+            total, done = sum(n for n, _ in weights), sum(self._written.values())
+            fraction = sum(n * f for n, f in weights) / total if total else 0.0
+        self._progress.report("calculating", total or None, done, fraction)
+
+
+class _PeriodProgress:
+    """JobProgress stand-in handed to _calculate_full for one period of a batch."""
+
+    def __init__(self, batch: _BatchProgress, period: str):
+        self._batch = batch
+        self._period = period
+
+    def stage(self, stage: str, employees_total=None):
+        self._batch._report(self._period, stage=stage, employees_total=employees_total)
+
+    def advance(self, employees_done: int):
+        self._batch._report(self._period, employees_done=employees_done)
+
+    def attach_run(self, run_id: str):
+        self._batch.run_ids[self._period] = run_id
+
+
+def run_batch_calculation(progress, periods: List[str], engine: str = None):
+    """Body of a batch job: full runs of `periods` sharing one sales and one rule query."""
+    engine = engine or CALC_ENGINE
+    bounds = {period: _period_bounds(datetime.strptime(period, "%Y-%m")) for period in periods}
+    range_start, range_end = bounds[periods[0]][0], bounds[periods[-1]][1]
+
+    # ---------- Load once for the whole range ----------
+    progress.stage("loading")
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        source_seq = source_snapshot(cursor)
+        version = rules_version(cursor)
+        range_rules = []
+
+        def load_rules(start_date, end_date):
+            # Only queried when some period misses rule_cache
+            if not range_rules:
+                with stage("calc.batch.fetch_rules"):
+                    range_rules.append(_fetch_rules(cursor, range_start, range_end))
+            return _rules_in_window(*range_rules[0], start_date, end_date)
+
+        rules = {
+            period: rule_cache.get(period, start, end, lambda start=start, end=end: load_rules(start, end), version)
+            for period, (start, end) in bounds.items()
+        }
+        sales = {}
+        if engine != "sql":
+            with stage("calc.batch.fetch_sales"):
+                sales = _fetch_sales_periods(cursor, periods)
+            add_rows("calc.batch.sales_groups", sum(len(df) for df in sales.values()))
+    finally:
+        cursor.close()
+        conn.close()
+
+    # ---------- Calculate and write the periods concurrently ----------
+    batch = _BatchProgress(progress, {
+        period: int(df["employee_id"].nunique()) for period, df in sales.items()
+    })
+    empty_sales = pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=max(min(CALC_BATCH_WORKERS, len(periods)), 1),
+                            thread_name_prefix="calc-batch") as executor:
+        futures = {
+            period: executor.submit(
+                # each thread gets a copy of the job's context so its stages are recorded with the job
+                contextvars.copy_context().run, _calculate_full, batch.for_period(period), period,
+                start, end, engine, None if engine == "sql" else sales.get(period, empty_sales), rules[period],
+                # the SQL engine reads sales in its own snapshot
+                None if engine == "sql" else source_seq
+            )
+            for period, (start, end) in bounds.items()
+        }
+        results = []
+        for period, future in futures.items():
+            try:
+                outcome = future.result()
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                results.append({"status": False, "period": period, "run_id": batch.run_ids.get(period),
+                                "error": str(error)})
+                continue
+            summaries = outcome.pop("data")
+            results.append({**outcome, "employees": len(summaries)})
+
+    calculated = sum(1 for result in results if result["status"])
+    return {
+        "status": calculated == len(periods),
+        "message": f"Incentives calculated for {calculated} of {len(periods)} periods",
+        "mode": "full",
+        "engine": engine,
+        "periods": results,
+    }
+
+
+@calculator_router.post("/api/incentives/calculate/batch")
+def calculate_incentives_batch(request: BatchCalculationRequest):
+    """Queue full runs of several periods (list or range) as one job."""
+    periods = _batch_periods(request)
+    job = job_runner.submit(
+        "calculate_batch", {"periods": periods, "engine": request.engine}, run_batch_calculation
+    )
+    return {
+        "status": True,
+        "message": "Batch calculation queued",
+        "job_id": job["job_id"],
+        "periods": periods,
+        "engine": request.engine or CALC_ENGINE,
+        "status_url": f"/calculator/api/incentives/jobs/{job['job_id']}"
+    }
@@ -1,6 +1,7 @@
 import shutil
 from pydantic import ValidationError
 from fastapi import APIRouter, UploadFile, File, Form,HTTPException
+from fastapi.concurrency import run_in_threadpool
 import os
 import pandas as pd
 import uuid
@@ -8,9 +9,19 @@ from datetime import datetime,date
 from dotenv import load_dotenv
 from models import SalesRow,StructuredRuleRow,AdHocSchemeRow
 from database import get_connection
-from dateutil import parser as date_parser
-from typing import List,Dict
-import re
+from bulk_writer import bulk_insert, combine_write_stats
+from csv_validation import validate_frame, frame_rows
+from rule_cache import rule_cache
+from sales_cache import sales_cache
+from sales_aggregate import aggregate_upload
+from metrics import stage, record_stage, add_rows
+from dedup import row_hash, find_upload, duplicate_upload_response
+from calculation_runs import stamp_upload
+from scheme_parser import parse_schemes
+from pymysql.err import IntegrityError
+import hashlib
+from typing import Any, List, Dict
+import time
 
 load_dotenv()
 data_ingestion_router = APIRouter()
@@ -18,72 +29,103 @@ data_ingestion_router = APIRouter()
 ##########################DIRECTORY TO SAVE UPLOADED FILES ##########################
 UPLOAD_DIRECTORY = "uploads"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", 50000))
 ############################ API ROUTES FOR DATA INGESTION #########################
-@data_ingestion_router.post("/upload_sales_data")
-async def upload_sales_data(file: UploadFile = File(...)):
-
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files allowed")
-
-    # ---------- Save uploaded file ----------
+SALES_REQUIRED_COLUMNS = [
+    "employee_id", "branch", "role",
+    "vehicle_model", "vehicle_type",
+    "quantity", "sale_date"
+]
+SALES_TEXT_COLUMNS = ["employee_id", "branch", "role", "vehicle_model", "vehicle_type"]
+SALES_ROW_COLUMNS = SALES_TEXT_COLUMNS + ["quantity", "sale_date"]
+STRUCTURED_RULE_COLUMNS = list(StructuredRuleRow.model_fields)
+
+
+def sales_csv_dtypes(column_map: Dict[str, str]) -> Dict[str, Any]:
+    """
+    read_csv dtypes of a sales CSV, keyed by its raw header names (`column_map` raw -> normalized).
+    quantity is read as text too, so its dtype never depends on what a chunk happens
+    to contain; validate_frame parses it and reports bad values per row.
+    """
+    return {raw: str for raw, col in column_map.items() if col in SALES_TEXT_COLUMNS + ["quantity"]}
+
+
+async def _save_upload(file: UploadFile):
+    """Stream an upload to disk in fixed-size chunks; returns (path, SHA-256 of the content)."""
     saved_file_path = os.path.join(UPLOAD_DIRECTORY, f"{uuid.uuid4()}_{file.filename}")
+    digest = hashlib.sha256()
     try:
-        with open(saved_file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        with stage("ingest.save_upload"), open(saved_file_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    return saved_file_path, digest.hexdigest()
 
-    # ---------- Read CSV ----------
-    try:
-        df = pd.read_csv(saved_file_path)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read CSV: {str(e)}")
-
-    if df.empty:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
-
-    # ---------- Normalize headers ----------
-    df.columns = [c.strip().lower() for c in df.columns]
 
-    # ---------- Required columns ----------
-    required_columns = [
-        "employee_id", "branch", "role",
-        "vehicle_model", "vehicle_type",
-        "quantity", "sale_date"
-    ]
-    for col in required_columns:
-        if col not in df.columns:
-            raise HTTPException(status_code=400, detail=f"Missing column: {col}")
-
-    # ---------- Pandas data checks ----------
-    # 1. Remove exact duplicate rows
-    df.drop_duplicates(inplace=True)
+def _previous_upload(file_type: str, content_hash: str, saved_file_path: str):
+    """Response for a byte-identical earlier upload (read-only), or None. Drops the redundant copy."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        upload = find_upload(cursor, file_type, content_hash)
+    finally:
+        cursor.close()
+        conn.close()
+    if upload is None:
+        return None
+    os.remove(saved_file_path)
+    return duplicate_upload_response(upload)
 
-    # 2. Check quantity >= 1
-    if (df["quantity"] <= 0).any():
-        raise HTTPException(status_code=400, detail="Quantity must be >= 1 for all rows")
 
-    # 3. Validate sale_date format
+def _record_upload(cursor, file_name: str, file_type: str, content_hash: str,
+                   total_records: int = 0, invalid_rows=None):
+    """Insert the uploaded_files row; returns its id, or None if the same content was recorded meanwhile."""
+    upload_file_id = str(uuid.uuid4())
+    now = datetime.now()
     try:
-        df["sale_date"] = pd.to_datetime(df["sale_date"], errors='raise').dt.date
+        cursor.execute("""
+            INSERT INTO uploaded_files (
+                id, file_name, file_type, content_hash, uploaded_at, created_at,
+                total_records, invalid_rows_count, invalid_rows
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            upload_file_id, file_name, file_type, content_hash, now, now,
+            total_records, len(invalid_rows or []), str(invalid_rows) if invalid_rows is not None else None
+        ))
+    except IntegrityError:
+        # uq_uploaded_files_hash: a concurrent request stored the same file first
+        return None
+    return upload_file_id
+
+
+def _ingest_sales_csv(saved_file_path: str, file_name: str, content_hash: str) -> Dict:
+    """
+    Validate and insert a sales CSV chunk by chunk inside one transaction.
+    Memory is bounded by CSV_CHUNK_ROWS plus one entry per employee. Repeated
+    rows, whether from an earlier chunk or another file, are skipped by the
+    row_hash unique key and counted in write_stats["skipped"].
+    """
+    previous = _previous_upload("sales_csv", content_hash, saved_file_path)
+    if previous is not None:
+        return previous
+
+    # ---------- Read header / normalize / required columns ----------
+    try:
+        header = pd.read_csv(saved_file_path, nrows=0).columns
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid date format in sale_date: {str(e)}")
-
-    # ---------- Validate rows with Pydantic ----------
-    rows = df.to_dict(orient="records")
-    validated_rows: List[SalesRow] = []
-    invalid_rows: List[Dict] = []
-
-    for i, row in enumerate(rows):
-        try:
-            validated_row = SalesRow(**row)
-            validated_rows.append(validated_row)
-        except ValidationError as e:
-            invalid_rows.append({"row_number": i + 2, "errors": e.errors()})  # +2 for CSV header & 0-index
+        raise HTTPException(status_code=400, detail=f"Failed to read CSV: {str(e)}")
 
-    if not validated_rows:
-        raise HTTPException(status_code=400, detail=f"All rows are invalid: {invalid_rows}")
+    column_map = {c: c.strip().lower() for c in header}
+    for col in SALES_REQUIRED_COLUMNS:
+        if col not in column_map.values():
+            raise HTTPException(status_code=400, detail=f"Missing column: {col}")
+    dtypes = sales_csv_dtypes(column_map)
 
     # ---------- DB connection ----------
     try:
@@ -93,64 +135,110 @@ async def upload_sales_data(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
     try:
-        # ---------- Insert into uploaded_files ----------
-        upload_file_id = str(uuid.uuid4())
-        insert_file_sql = """
-        INSERT INTO uploaded_files (
-            id, file_name, file_type, uploaded_at, created_at,
-            total_records, invalid_rows_count, invalid_rows
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(
-            insert_file_sql,
-            (
-                upload_file_id,
-                file.filename,
-                "sales_csv",
-                datetime.now(),
-                datetime.now(),
-                len(validated_rows),
-                len(invalid_rows),
-                str(invalid_rows)  # store as JSON string
-            )
-        )
+        # ---------- Insert into uploaded_files (totals filled in at the end) ----------
+        now = datetime.now()
+        upload_file_id = _record_upload(cursor, file_name, "sales_csv", content_hash)
+        if upload_file_id is None:
+            return duplicate_upload_response(find_upload(cursor, "sales_csv", content_hash))
+
+        total_rows = 0
+        valid_count = 0
+        invalid_rows: List[Dict] = []
+        employees = {}
+        chunk_write_stats = []
+        sale_dates = []
 
-        # ---------- Insert validated sales rows ----------
-        insert_sales_sql = """
-        INSERT INTO sales_transactions (
-            id, employee_id, branch, role, vehicle_model,
-            vehicle_type, quantity, sale_date, upload_file_id, created_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        for row in validated_rows:
-            cursor.execute(
-                insert_sales_sql,
-                (
-                    str(uuid.uuid4()),
-                    row.employee_id,
-                    row.branch,
-                    row.role,
-                    row.vehicle_model,
-                    row.vehicle_type,
-                    row.quantity,
-                    row.sale_date,
-                    upload_file_id,
-                    datetime.now()
+        try:
+            reader = pd.read_csv(saved_file_path, chunksize=CSV_CHUNK_ROWS, dtype=dtypes)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to read CSV: {str(e)}")
+
+        validate_started = time.perf_counter()
+        for chunk in reader:
+            total_rows += len(chunk)
+            add_rows("ingest.sales.rows_read", len(chunk))
+            chunk = chunk.rename(columns=column_map)
+
+            # ---------- Pandas data checks ----------
+            # 1. Remove exact duplicate rows within the chunk; repeats of earlier
+            #    chunks are left to INSERT IGNORE on the row_hash key
+            chunk = chunk.drop_duplicates()
+
+            # ---------- Validate rows against SalesRow (columnar) ----------
+            # Unparsable or < 1 quantities and bad sale_dates are reported per row in invalid_rows
+            validated, chunk_invalid = validate_frame(chunk, SalesRow)
+            invalid_rows.extend(chunk_invalid)
+            record_stage("ingest.sales.parse_validate", time.perf_counter() - validate_started)
+
+            # ---------- Insert validated sales rows ----------
+            with stage("ingest.sales.insert"):
+                stats = bulk_insert(
+                    cursor,
+                    "sales_transactions",
+                    [
+                        "id", "employee_id", "branch", "role", "vehicle_model",
+                        "vehicle_type", "quantity", "sale_date", "upload_file_id", "created_at", "row_hash"
+                    ],
+                    (
+                        (str(uuid.uuid4()), *row, upload_file_id, now, row_hash(row))
+                        for row in frame_rows(validated, SALES_ROW_COLUMNS)
+                    ),
+                    ignore=True
                 )
+            add_rows("ingest.sales.rows_inserted", stats["rows"] - stats["skipped"])
+            chunk_write_stats.append(stats)
+            valid_count += len(validated)
+            if len(validated):
+                sale_dates += [validated["sale_date"].min(), validated["sale_date"].max()]
+            employees.update(
+                zip(validated["employee_id"], zip(validated["branch"], validated["role"]))
             )
+            validate_started = time.perf_counter()
+
+        if total_rows == 0:
+            raise HTTPException(status_code=400, detail="CSV file is empty")
+
+        if not valid_count:
+            raise HTTPException(status_code=400, detail=f"All rows are invalid: {invalid_rows}")
+
+        # ---------- Upsert employee dimension (last row per employee wins) ----------
+        with stage("ingest.sales.employees"):
+            bulk_insert(
+                cursor,
+                "employees",
+                ["employee_id", "branch", "role", "updated_at"],
+                ((emp_id, branch, role, now) for emp_id, (branch, role) in employees.items()),
+                on_duplicate="branch = VALUES(branch), role = VALUES(role), updated_at = VALUES(updated_at)"
+            )
+
+        # ---------- Add this file's rows to the monthly aggregate (same transaction) ----------
+        with stage("ingest.sales.aggregate"):
+            aggregate_upload(cursor, upload_file_id)
 
+        cursor.execute("""
+            UPDATE uploaded_files SET total_records = %s, invalid_rows_count = %s, invalid_rows = %s
+            WHERE id = %s
+        """, (valid_count, len(invalid_rows), str(invalid_rows), upload_file_id))
+
+        stamp_upload(cursor, upload_file_id)
         conn.commit()
+        sales_cache.invalidate(min(sale_dates), max(sale_dates))
 
         return {
             "status": True,
             "message": "Sales data uploaded successfully",
             "file_id": upload_file_id,
-            "total_records": len(validated_rows),
+            "total_records": valid_count,
             "invalid_rows_count": len(invalid_rows),
             "invalid_rows": invalid_rows,
-            "saved_file": saved_file_path
+            "saved_file": saved_file_path,
+            "write_stats": combine_write_stats("sales_transactions", chunk_write_stats)
         }
 
+    except HTTPException:
+        conn.rollback()
+        raise
+
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -159,24 +247,25 @@ async def upload_sales_data(file: UploadFile = File(...)):
         cursor.close()
         conn.close()
 
-@data_ingestion_router.post("/upload_structured_rule")
-async def upload_structured_rule(file: UploadFile = File(...)):
+
+@data_ingestion_router.post("/upload_sales_data")
+async def upload_sales_data(file: UploadFile = File(...)):
 
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files allowed")
 
-    # ---------- Save uploaded file ----------
-    saved_file_path = os.path.join(UPLOAD_DIRECTORY, f"{uuid.uuid4()}_{file.filename}")
-    try:
-        with open(saved_file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    # ---------- Save uploaded file (chunked) ----------
+    saved_file_path, content_hash = await _save_upload(file)
 
+    # ---------- Parse, validate and insert chunk by chunk off the event loop ----------
+    return await run_in_threadpool(_ingest_sales_csv, saved_file_path, file.filename, content_hash)
+
+
+def read_structured_rules_csv(source):
+    """Read and validate a structured-rule CSV (path or file object); returns (validated DataFrame, invalid rows)."""
     # ---------- Read CSV ----------
     try:
-        df = pd.read_csv(saved_file_path)
+        df = pd.read_csv(source)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read CSV: {str(e)}")
 
@@ -214,20 +303,29 @@ async def upload_structured_rule(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format in valid_from/valid_to: {str(e)}")
 
-    # ---------- Validate rows with Pydantic ----------
-    rows = df.to_dict(orient="records")
-    validated_rows: List[StructuredRuleRow] = []
-    invalid_rows: List[Dict] = []
-
-    for i, row in enumerate(rows):
-        try:
-            validated_row = StructuredRuleRow(**row)
-            validated_rows.append(validated_row)
-        except ValidationError as e:
-            invalid_rows.append({"row_number": i + 2, "errors": e.errors()})
+    # ---------- Validate rows against StructuredRuleRow (columnar) ----------
+    with stage("ingest.structured.validate"):
+        validated_rows, invalid_rows = validate_frame(df, StructuredRuleRow)
+    add_rows("ingest.structured.rows_read", len(df))
 
-    if not validated_rows:
+    if validated_rows.empty:
         raise HTTPException(status_code=400, detail=f"All rows are invalid: {invalid_rows}")
+    return validated_rows, invalid_rows
+
+
+@data_ingestion_router.post("/upload_structured_rule")
+async def upload_structured_rule(file: UploadFile = File(...)):
+
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files allowed")
+
+    # ---------- Save uploaded file; identical re-uploads stop here ----------
+    saved_file_path, content_hash = await _save_upload(file)
+    previous = await run_in_threadpool(_previous_upload, "structured_rule_csv", content_hash, saved_file_path)
+    if previous is not None:
+        return previous
+
+    validated_rows, invalid_rows = await run_in_threadpool(read_structured_rules_csv, saved_file_path)
 
     # ---------- DB connection ----------
     try:
@@ -238,56 +336,34 @@ async def upload_structured_rule(file: UploadFile = File(...)):
 
     try:
         # ---------- Insert into uploaded_files ----------
-        upload_file_id = str(uuid.uuid4())
-        insert_file_sql = """
-        INSERT INTO uploaded_files (
-            id, file_name, file_type, uploaded_at, created_at,
-            total_records, invalid_rows_count, invalid_rows
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(
-            insert_file_sql,
-            (
-                upload_file_id,
-                file.filename,
-                "structured_rule_csv",
-                datetime.now(),
-                datetime.now(),
-                len(validated_rows),
-                len(invalid_rows),
-                str(invalid_rows)
-            )
+        upload_file_id = _record_upload(
+            cursor, file.filename, "structured_rule_csv", content_hash, len(validated_rows), invalid_rows
         )
+        if upload_file_id is None:
+            return duplicate_upload_response(find_upload(cursor, "structured_rule_csv", content_hash))
 
         # ---------- Insert validated structured rules ----------
-        insert_rule_sql = """
-        INSERT INTO structured_rules (
-            id, rule_id, role, vehicle_type, min_units, max_units,
-            incentive_amount_inr, bonus_per_unit_inr, valid_from, valid_to,
-            rule_type, upload_file_id, created_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        for row in validated_rows:
-            cursor.execute(
-                insert_rule_sql,
+        now = datetime.now()
+        with stage("ingest.structured.insert"):
+            write_stats = bulk_insert(
+                cursor,
+                "structured_rules",
+                [
+                    "id", "rule_id", "role", "vehicle_type", "min_units", "max_units",
+                    "incentive_amount_inr", "bonus_per_unit_inr", "valid_from", "valid_to",
+                    "rule_type", "upload_file_id", "created_at", "row_hash"
+                ],
                 (
-                    str(uuid.uuid4()),
-                    row.rule_id,
-                    row.role,
-                    row.vehicle_type,
-                    row.min_units,
-                    row.max_units,
-                    row.incentive_amount_inr,
-                    row.bonus_per_unit_inr,
-                    row.valid_from,
-                    row.valid_to,
-                    row.rule_type,
-                    upload_file_id,
-                    datetime.now()
-                )
+                    (str(uuid.uuid4()), *row, upload_file_id, now, row_hash(row))
+                    for row in frame_rows(validated_rows, STRUCTURED_RULE_COLUMNS)
+                ),
+                ignore=True
             )
+        add_rows("ingest.structured.rows_inserted", write_stats["rows"] - write_stats["skipped"])
 
+        stamp_upload(cursor, upload_file_id)
         conn.commit()
+        rule_cache.invalidate(validated_rows["valid_from"].min(), validated_rows["valid_to"].max())
 
         return {
             "status": True,
@@ -296,7 +372,8 @@ async def upload_structured_rule(file: UploadFile = File(...)):
             "total_records": len(validated_rows),
             "invalid_rows_count": len(invalid_rows),
             "invalid_rows": invalid_rows,
-            "saved_file": saved_file_path
+            "saved_file": saved_file_path,
+            "write_stats": write_stats
         }
 
     except Exception as e:
@@ -313,11 +390,11 @@ async def upload_ad_hoc_rule(file: UploadFile = File(...)):
     if not file.filename.endswith(".txt"):
         raise HTTPException(status_code=400, detail="Only TXT files allowed")
 
-    # ---------- Save uploaded file ----------
-    saved_file_path = os.path.join(UPLOAD_DIRECTORY, f"{uuid.uuid4()}_{file.filename}")
-    content = await file.read()
-    with open(saved_file_path, "wb") as f:
-        f.write(content)
+    # ---------- Save uploaded file; identical re-uploads stop here ----------
+    saved_file_path, content_hash = await _save_upload(file)
+    previous = await run_in_threadpool(_previous_upload, "ad_hoc_txt", content_hash, saved_file_path)
+    if previous is not None:
+        return previous
 
     # ---------- Read TXT ----------
     with open(saved_file_path, "r", encoding="utf-8") as f:
@@ -327,128 +404,13 @@ async def upload_ad_hoc_rule(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="TXT file is empty")
 
     # ---------- Extract schemes ----------
-    scheme_pattern = r"\*SCHEME\s(\d+):(.*?)(?=\*SCHEME|\Z)"
-    matches = re.findall(scheme_pattern, text, re.DOTALL | re.IGNORECASE)
-
-    if not matches:
+    parse_started = time.perf_counter()
+    schemes_found, validated_rows, invalid_rows = parse_schemes(text)
+    if not schemes_found:
         raise HTTPException(status_code=400, detail="No schemes found in the TXT")
 
-    validated_rows: List[Dict] = []
-    invalid_rows: List[Dict] = []
-
-    role_mapping = {
-        "ASMs": "ASM",
-        "RMs": "RM",
-        "employees": "ALL",
-        "All roles": "ALL"
-    }
-
-    def normalize_role(role_text: str):
-        role_text = role_text.strip()
-        for key, value in role_mapping.items():
-            if key.lower() in role_text.lower():
-                return value
-        return role_text
-
-    # ---------- Refined condition parser ----------
-    def clean_condition(line: str):
-        """Make condition human-readable instead of underscore format"""
-        line = line.strip()
-        line = re.sub(r"[\*]+", "", line)  # remove extra stars
-        line = line.replace("_", " ")
-        line = re.sub(r"\s+", " ", line)
-        return line
-
-    for scheme_id, scheme_text in matches:
-        try:
-            scheme_text = scheme_text.strip()
-            lines = [line.strip("- ").strip() for line in scheme_text.split("\n") if line.strip()]
-            if not lines:
-                continue
-
-            # ---------- Scheme name ----------
-            scheme_name = lines[0].title()
-
-            # ---------- Roles ----------
-            role_match = re.search(r"Applicable to:\s*(.*?)\s*(?:Valid:|$)", scheme_text, re.IGNORECASE)
-            default_roles = normalize_role(role_match.group(1).strip()) if role_match else "ALL"
-
-            # ---------- Validity ----------
-            valid_from, valid_to = None, None
-            date_match = re.search(r"Valid:\s*(.*)", scheme_text, re.IGNORECASE)
-            if date_match:
-                date_text = date_match.group(1).strip()
-                try:
-                    if "-" in date_text:
-                        parts = date_text.split("-")
-                        valid_from = date_parser.parse(parts[0].strip(), dayfirst=False).date()
-                        valid_to = date_parser.parse(parts[1].strip(), dayfirst=False).date()
-                    else:
-                        valid_from = valid_to = date_parser.parse(date_text, dayfirst=False).date()
-                except Exception:
-                    valid_from = date(2025, 9, 1)
-                    valid_to = date(2025, 9, 30)
-            else:
-                valid_from = date(2025, 9, 1)
-                valid_to = date(2025, 9, 30)
-
-            # ---------- Process each line ----------
-            for line in lines[1:]:
-                if not line:
-                    continue
-
-                # Notes detection
-                notes_keywords = ["promotional", "inventory", "base eligibility", "end of month",
-                                  "schemes are cumulative", "branch target", "requires minimum",
-                                  "insurance", "registration", "rules may change"]
-                notes = ""
-                if any(k.lower() in line.lower() for k in notes_keywords):
-                    notes = line
-                    validated_rows.append({
-                        "scheme_id": int(scheme_id),
-                        "scheme_name": scheme_name,
-                        "condition": "",
-                        "role": "ALL",
-                        "bonus_amount": None,
-                        "validity_from": valid_from,
-                        "validity_to": valid_to,
-                        "notes": notes
-                    })
-                    continue
-
-                if line.startswith("Applicable to") or line.startswith("Valid") or line.startswith("NOTES"):
-                    continue
-
-                # ---------- Bonus amount ----------
-                bonus_amount = None
-                match_numeric = re.search(r"₹([\d,]+)", line)
-                match_variable = re.search(r"(\d+\.?\d*\s*x)|Variable", line, re.IGNORECASE)
-                if match_numeric:
-                    bonus_amount = int(match_numeric.group(1).replace(",", ""))
-                elif match_variable:
-                    bonus_amount = match_variable.group(0).strip()
-
-                # ---------- Role ----------
-                role_line_match = re.search(r"All\s+([A-Za-z, ]+)", line)
-                role = normalize_role(role_line_match.group(1).strip()) if role_line_match else default_roles
-
-                # ---------- Condition ----------
-                condition_text = clean_condition(line)
-
-                validated_rows.append({
-                    "scheme_id": int(scheme_id),
-                    "scheme_name": scheme_name,
-                    "condition": condition_text,
-                    "role": role,
-                    "bonus_amount": bonus_amount,
-                    "validity_from": valid_from,
-                    "validity_to": valid_to,
-                    "notes": notes
-                })
-
-        except Exception as e:
-            invalid_rows.append({"scheme_id": scheme_id, "error": str(e)})
-
+    record_stage("ingest.ad_hoc.parse", time.perf_counter() - parse_started)
+    add_rows("ingest.ad_hoc.schemes", schemes_found)
     if not validated_rows:
         raise HTTPException(status_code=400, detail=f"All schemes invalid: {invalid_rows}")
 
@@ -457,43 +419,48 @@ async def upload_ad_hoc_rule(file: UploadFile = File(...)):
         conn = get_connection()
         cursor = conn.cursor()
 
-        upload_file_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO uploaded_files (
-                id, file_name, file_type, uploaded_at, created_at,
-                total_records, invalid_rows_count, invalid_rows
-            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            upload_file_id,
-            file.filename,
-            "ad_hoc_txt",
-            datetime.now(),
-            datetime.now(),
-            len(validated_rows),
-            len(invalid_rows),
-            str(invalid_rows)
-        ))
-
-        insert_sql = """
-        INSERT INTO ad_hoc_rules (
-            scheme_id, scheme_name, conditions, role, bonus_amount,
-            validity_from, validity_to, notes, upload_file_id, created_at
-        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """
-        for row in validated_rows:
-            cursor.execute(insert_sql, (
-                row["scheme_id"],
-                row["scheme_name"],
-                row["condition"],
-                row["role"],
-                row["bonus_amount"],
-                row["validity_from"],
-                row["validity_to"],
-                row["notes"],
-                upload_file_id,
-                datetime.now()
-            ))
+        upload_file_id = _record_upload(
+            cursor, file.filename, "ad_hoc_txt", content_hash, len(validated_rows), invalid_rows
+        )
+        if upload_file_id is None:
+            return duplicate_upload_response(find_upload(cursor, "ad_hoc_txt", content_hash))
+
+        now = datetime.now()
+        insert_started = time.perf_counter()
+        write_stats = bulk_insert(
+            cursor,
+            "ad_hoc_rules",
+            [
+                "scheme_id", "scheme_name", "conditions", "role", "bonus_amount",
+                "validity_from", "validity_to", "notes", "bonus_kind", "bonus_value",
+                "upload_file_id", "created_at", "row_hash"
+            ],
+            (
+                (*key, row["bonus_kind"], row["bonus_value"], upload_file_id, now, row_hash(key))
+                for row, key in (
+                    (row, (
+                        row["scheme_id"],
+                        row["scheme_name"],
+                        row["condition"],
+                        row["role"],
+                        row["bonus_amount"],
+                        row["validity_from"],
+                        row["validity_to"],
+                        row["notes"]
+                    ))
+                    for row in validated_rows
+                )
+            ),
+            ignore=True
+        )
+        record_stage("ingest.ad_hoc.insert", time.perf_counter() - insert_started)
+        add_rows("ingest.ad_hoc.rows_inserted", write_stats["rows"] - write_stats["skipped"])
+        stamp_upload(cursor, upload_file_id)
         conn.commit()
+        rule_cache.invalidate(
+            min(row["validity_from"] for row in validated_rows),
+            max(row["validity_to"] for row in validated_rows)
+        )
 
     except Exception as e:
         conn.rollback()
@@ -509,5 +476,6 @@ async def upload_ad_hoc_rule(file: UploadFile = File(...)):
         "total_records": len(validated_rows),
         "invalid_rows_count": len(invalid_rows),
         "invalid_rows": invalid_rows,
-        "saved_file": saved_file_path
+        "saved_file": saved_file_path,
+        "write_stats": write_stats
     }
@@ -1,150 +1,422 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from database import db, conn,get_connection
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any
+from database import get_connection
+from pymysql.cursors import SSDictCursor
+from datetime import datetime
+import base64
 import json
 from models import EmployeeIncentive,Summary,IncentiveResponse,TopPerformer,DashboardResponse,DashboardAPIResponse,IncentiveDetails
+from calculation_runs import latest_completed_run
+from metrics import stage, add_rows
+from result_export import EXPORT_FORMATS, EXPORT_SQL, EXPORT_TABLES, STREAM_WRITERS, arrow_available, iter_record_chunks
 from dotenv import load_dotenv
-import pandas as pd
 load_dotenv()
 
 results_router = APIRouter()
 
 ############################ API ROUTES FOR RESULTS #########################
 
+# Only rows of completed runs are visible; superseded runs are deleted when replaced
+RESULT_FROM_SQL = """
+    FROM incentive_calculations ic
+    JOIN calculation_runs r ON r.id = ic.run_id AND r.status = 'completed'
+    LEFT JOIN employees e ON e.employee_id = ic.employee_id
+"""
+
+RESULT_COLUMNS_SQL = """
+    SELECT ic.id, ic.run_id, ic.employee_id, ic.period, ic.total_units, ic.total_incentive, ic.structured_incentive,
+           ic.ad_hoc_incentive, ic.calculation_date, ic.details, e.branch, e.role
+""" + RESULT_FROM_SQL
+
+
+def _build_filters(period: Optional[str], branch: Optional[str], role: Optional[str],
+                   employee_id: Optional[str], run_id: Optional[str] = None):
+    """Translate optional query filters into a WHERE clause list and its parameters."""
+    clauses, params = [], []
+    if run_id:
+        clauses.append("ic.run_id = %s")
+        params.append(run_id)
+    if period:
+        clauses.append("ic.period = %s")
+        params.append(period)
+    if branch:
+        clauses.append("e.branch = %s")
+        params.append(branch)
+    if role:
+        clauses.append("e.role = %s")
+        params.append(role)
+    if employee_id:
+        clauses.append("ic.employee_id = %s")
+        params.append(employee_id)
+    return clauses, params
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["calculation_date"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        calculation_date, calc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return datetime.fromisoformat(calculation_date), calc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _row_to_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape one joined incentive_calculations row like EmployeeIncentive."""
+    details = json.loads(row.get("details") or "{}")
+    total_incentive = float(row["total_incentive"])
+    return {
+        "employee_id": row["employee_id"],
+        "branch": row.get("branch") or "Unknown Branch",
+        "role": row.get("role") or "Unknown Role",
+        # Units matched by structured rules, stored at calculation time
+        "total_units": int(row["total_units"]),
+        "structured_incentive": float(row["structured_incentive"]),
+        "adhoc_incentive": float(row["ad_hoc_incentive"]),
+        "total_incentive": total_incentive,
+        "status": "Completed" if total_incentive > 0 else "Exception",
+        "details": {"structured": details.get("structured", []), "ad_hoc": details.get("ad_hoc", [])}
+    }
+
+
 @results_router.get("/GETincentiveresults", response_model=IncentiveResponse)
-async def GETincentiveresults():
+def GETincentiveresults(
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    period: Optional[str] = None,
+    branch: Optional[str] = None,
+    role: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    run_id: Optional[str] = None
+):
+    conn = get_connection()
+    db_cursor = conn.cursor()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        clauses, params = _build_filters(period, branch, role, employee_id, run_id)
+        where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
 
-        # Fetch all incentive calculation records
-        cursor.execute("SELECT * FROM incentive_calculations ORDER BY calculation_date DESC")
-        incentive_rows = cursor.fetchall()
+        # ---------- Summary over the whole filtered set ----------
+        with stage("results.summary"):
+            db_cursor.execute(f"""
+                SELECT COUNT(*) AS total_records, COALESCE(SUM(ic.total_incentive), 0) AS total_incentives
+                {RESULT_FROM_SQL}
+                {where_sql}
+            """, params)
+            totals = db_cursor.fetchone()
 
-        if not incentive_rows:
+        if not totals["total_records"]:
             return {
                 "status": True,
                 "message": "No incentive results found",
                 "summary": {"total_records": 0, "total_incentives": 0, "top_performer": None},
-                "data": []
+                "data": [],
+                "next_cursor": None
             }
 
-        results = []
-        top_performer = None
-
-        for row in incentive_rows:
-            details = json.loads(row.get("details", "{}"))
+        with stage("results.top_performer"):
+            db_cursor.execute(f"""
+                SELECT ic.employee_id, e.branch, e.role, ic.total_incentive
+                {RESULT_FROM_SQL}
+                {where_sql}
+                ORDER BY ic.total_incentive DESC
+                LIMIT 1
+            """, params)
+            top = db_cursor.fetchone()
+        top_performer = {
+            "employee_id": top["employee_id"],
+            "branch": top.get("branch") or "Unknown Branch",
+            "role": top.get("role") or "Unknown Role",
+            "total_incentive": float(top["total_incentive"])
+        }
 
-            # Total units from structured incentives
-            total_units = sum(item.get("quantity", 0) for item in details.get("structured", []))
+        # ---------- Keyset page (calculation_date DESC, id DESC) ----------
+        page_clauses, page_params = list(clauses), list(params)
+        if cursor:
+            after_date, after_id = _decode_cursor(cursor)
+            page_clauses.append("(ic.calculation_date < %s OR (ic.calculation_date = %s AND ic.id < %s))")
+            page_params.extend([after_date, after_date, after_id])
+        page_where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
 
-            # Fetch branch & role from sales_transactions table
-            cursor.execute(
-                "SELECT branch, role FROM sales_transactions WHERE employee_id = %s LIMIT 1",
-                (row["employee_id"],)
+        with stage("results.page"):
+            db_cursor.execute(
+                f"{RESULT_COLUMNS_SQL} {page_where} ORDER BY ic.calculation_date DESC, ic.id DESC LIMIT %s",
+                page_params + [limit + 1]
             )
-            sales_data = cursor.fetchone()
-            branch = sales_data["branch"] if sales_data else "Unknown Branch"
-            role = sales_data["role"] if sales_data else "Unknown Role"
-
-            emp_incentive = EmployeeIncentive(
-                employee_id=row["employee_id"],
-                branch=branch,
-                role=role,
-                total_units=total_units,
-                structured_incentive=float(row["structured_incentive"]),
-                adhoc_incentive=float(row["ad_hoc_incentive"]),
-                total_incentive=float(row["total_incentive"]),
-                status="Completed" if float(row["total_incentive"]) > 0 else "Exception",
-                details=IncentiveDetails(**details)
-            )
-            results.append(emp_incentive)
-
-            # Determine top performer
-            if not top_performer or emp_incentive.total_incentive > top_performer["total_incentive"]:
-                top_performer = {
-                    "employee_id": emp_incentive.employee_id,
-                    "branch": emp_incentive.branch,
-                    "role": emp_incentive.role,
-                    "total_incentive": emp_incentive.total_incentive
-                }
+            rows = db_cursor.fetchall()
+        add_rows("results.rows", min(len(rows), limit))
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
 
-        # Summary
-        total_records = len(results)
-        total_incentives = sum(emp.total_incentive for emp in results)
         summary = Summary(
-            total_records=total_records,
-            total_incentives=total_incentives,
+            total_records=int(totals["total_records"]),
+            total_incentives=float(totals["total_incentives"]),
             top_performer=top_performer
         )
 
-        cursor.close()
-        conn.close()
-
         return {
             "status": True,
             "message": "Detailed incentive results fetched successfully",
             "summary": summary.model_dump(),  # Pydantic v2 dict
-            "data": [emp.model_dump() for emp in results]
+            "data": [_row_to_result(row) for row in rows[:limit]],
+            "next_cursor": next_cursor
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-@results_router.get("/GETdashboard_stats", response_model=DashboardAPIResponse)
-def GETdashboard_stats():
+
+    finally:
+        db_cursor.close()
+        conn.close()
+
+
+@results_router.get("/GETincentiveresults/stream")
+def GETincentiveresults_stream(
+    period: Optional[str] = None,
+    branch: Optional[str] = None,
+    role: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    run_id: Optional[str] = None
+):
+    """Stream filtered results as NDJSON straight from a server-side (unbuffered) cursor."""
+    clauses, params = _build_filters(period, branch, role, employee_id, run_id)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"{RESULT_COLUMNS_SQL} {where_sql} ORDER BY ic.calculation_date DESC, ic.id DESC"
+
+    def generate():
+        # Acquired on the first chunk: a client gone before that never starts the
+        # generator, and its finally (which returns the connection) would not run
+        conn = get_connection()
+        db_cursor = conn.cursor(SSDictCursor)
+        try:
+            db_cursor.execute(sql, params)
+            for row in db_cursor:
+                yield json.dumps(_row_to_result(row)) + "\n"
+        finally:
+            db_cursor.close()
+            conn.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@results_router.get("/GETincentiveresults/export")
+def GETincentiveresults_export(
+    format: str = Query("csv", pattern="^(csv|parquet|arrow)$"),
+    table: str = Query("results", pattern="^(results|breakdown)$"),
+    run_id: Optional[str] = None,
+    period: Optional[str] = None
+):
+    """
+    Payroll export of one run (run_id, else the period's current run, else the latest run).
+    `table=results` is one row per employee, `table=breakdown` one row per applied rule/scheme.
+    """
+    if format != "csv" and not arrow_available():
+        raise HTTPException(status_code=501, detail=f"{format} export requires pyarrow to be installed")
+
+    conn = get_connection()
     try:
+        db_cursor = conn.cursor()
+        try:
+            if run_id:
+                db_cursor.execute("SELECT * FROM calculation_runs WHERE id = %s AND status = 'completed'", (run_id,))
+                run = db_cursor.fetchone()
+            else:
+                run = latest_completed_run(db_cursor, period)
+        finally:
+            db_cursor.close()
+    finally:
+        conn.close()
+    if not run:
+        raise HTTPException(status_code=404, detail="No completed calculation run found")
+
+    columns, _ = EXPORT_TABLES[table]
+    media_type, extension = EXPORT_FORMATS[format]
+    sql = EXPORT_SQL[table]
+
+    def generate():
+        # Acquired inside the generator, as in GETincentiveresults_stream
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        # ---------- Fetch all incentive calculations ----------
-        cursor.execute("SELECT * FROM incentive_calculations")
-        rows = cursor.fetchall()
-        if not rows:
+        db_cursor = conn.cursor(SSDictCursor)
+        try:
+            db_cursor.execute(sql, (run["id"],))
+            yield from STREAM_WRITERS[format](iter_record_chunks(db_cursor, table), columns)
+        finally:
+            db_cursor.close()
+            conn.close()
+
+    filename = f"incentives_{run['period']}_{table}.{extension}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _application_filters(period: Optional[str], run_id: Optional[str], rule_type: Optional[str]):
+    clauses, params = [], []
+    if run_id:
+        clauses.append("a.run_id = %s")
+        params.append(run_id)
+    if period:
+        clauses.append("a.period = %s")
+        params.append(period)
+    if rule_type:
+        clauses.append("a.rule_type = %s")
+        params.append(rule_type)
+    return clauses, params
+
+
+APPLICATION_FROM_SQL = """
+    FROM incentive_rule_applications a
+    JOIN calculation_runs r ON r.id = a.run_id AND r.status = 'completed'
+"""
+
+
+@results_router.get("/GETbreakdown/rules")
+def GETbreakdown_rules(
+    period: Optional[str] = None,
+    run_id: Optional[str] = None,
+    rule_type: Optional[str] = Query(None, pattern="^(structured|ad_hoc)$")
+):
+    """Totals per structured rule / ad-hoc scheme across completed runs."""
+    clauses, params = _application_filters(period, run_id, rule_type)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_connection()
+    db_cursor = conn.cursor()
+    try:
+        db_cursor.execute(f"""
+            SELECT a.rule_type, a.rule_id,
+                   COUNT(DISTINCT a.employee_id) AS employees,
+                   COALESCE(SUM(a.quantity), 0) AS total_units,
+                   SUM(a.incentive_amount) AS total_amount
+            {APPLICATION_FROM_SQL}
+            {where_sql}
+            GROUP BY a.rule_type, a.rule_id
+            ORDER BY total_amount DESC
+        """, params)
+        rows = db_cursor.fetchall()
+        return {
+            "status": True,
+            "data": [
+                {
+                    "rule_type": row["rule_type"],
+                    "rule_id": row["rule_id"],
+                    "employees": int(row["employees"]),
+                    "total_units": int(row["total_units"]),
+                    "total_amount": float(row["total_amount"])
+                }
+                for row in rows
+            ]
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Breakdown error: {str(e)}")
+
+    finally:
+        db_cursor.close()
+        conn.close()
+
+
+@results_router.get("/GETbreakdown/rules/{rule_id}/employees")
+def GETbreakdown_rule_employees(
+    rule_id: str,
+    rule_type: str = Query("structured", pattern="^(structured|ad_hoc)$"),
+    period: Optional[str] = None,
+    run_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Employees a rule (or scheme, with rule_type=ad_hoc) was applied to, highest amount first."""
+    clauses, params = _application_filters(period, run_id, rule_type)
+    clauses.append("a.rule_id = %s")
+    params.append(rule_id)
+    conn = get_connection()
+    db_cursor = conn.cursor()
+    try:
+        db_cursor.execute(f"""
+            SELECT a.employee_id, a.period, e.branch, e.role,
+                   COALESCE(SUM(a.quantity), 0) AS quantity,
+                   SUM(a.incentive_amount) AS amount
+            {APPLICATION_FROM_SQL}
+            LEFT JOIN employees e ON e.employee_id = a.employee_id
+            WHERE {' AND '.join(clauses)}
+            GROUP BY a.employee_id, a.period, e.branch, e.role
+            ORDER BY amount DESC
+            LIMIT %s
+        """, params + [limit])
+        rows = db_cursor.fetchall()
+        return {
+            "status": True,
+            "rule_id": rule_id,
+            "rule_type": rule_type,
+            "data": [
+                {
+                    "employee_id": row["employee_id"],
+                    "period": row["period"],
+                    "branch": row.get("branch") or "Unknown Branch",
+                    "role": row.get("role") or "Unknown Role",
+                    "quantity": int(row["quantity"]),
+                    "amount": float(row["amount"])
+                }
+                for row in rows
+            ]
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Breakdown error: {str(e)}")
+
+    finally:
+        db_cursor.close()
+        conn.close()
+
+
+@results_router.get("/GETdashboard_stats", response_model=DashboardAPIResponse)
+def GETdashboard_stats(period: Optional[str] = None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+
+        # ---------- Pre-aggregated summary row (written when a run completes) ----------
+        if period:
+            cursor.execute("SELECT * FROM dashboard_summary WHERE period = %s", (period,))
+        else:
+            cursor.execute("SELECT * FROM dashboard_summary ORDER BY last_calculation_run DESC LIMIT 1")
+        summary = cursor.fetchone()
+        if not summary:
             return {"status": True, "data": DashboardResponse(
                 total_incentive_calculated=0,
                 salesperson_processed=0,
-                top_performer=TopPerformer(employee_id=None, total_incentive=0),
+                top_performer=TopPerformer(),
                 last_calculation_run=None
             )}
-        
-        # ---------- Load into pandas ----------
-        df = pd.DataFrame(rows)
-        
-        # ---------- Total incentive ----------
-        total_incentive_calculated = df['total_incentive'].sum()
-        
-        # ---------- Salesperson processed ----------
-        salesperson_processed = df['employee_id'].nunique()
-        
-        # ---------- Top performer ----------
-        top_df = df.groupby('employee_id')['total_incentive'].sum().reset_index()
-        top_df = top_df.sort_values('total_incentive', ascending=False).head(1)
-        if not top_df.empty:
+
+        if summary["top_employee_id"]:
             top_performer = TopPerformer(
-                employee_id=top_df.iloc[0]['employee_id'],
-                total_incentive=float(top_df.iloc[0]['total_incentive'])
+                employee_id=summary["top_employee_id"],
+                branch=summary["top_branch"] or "",
+                role=summary["top_role"] or "",
+                total_incentive=float(summary["top_total_incentive"])
             )
         else:
-            top_performer = TopPerformer(employee_id=None, total_incentive=0)
-        
-        # ---------- Last calculation run ----------
-        df['calculation_date'] = pd.to_datetime(df['calculation_date'])
-        last_calculation_run = df['calculation_date'].max()
-        
+            top_performer = TopPerformer()
+
         return {
             "status": True,
             "data": DashboardResponse(
-                total_incentive_calculated=float(total_incentive_calculated),
-                salesperson_processed=int(salesperson_processed),
+                total_incentive_calculated=float(summary["total_incentive"]),
+                salesperson_processed=int(summary["salesperson_count"]),
                 top_performer=top_performer,
-                last_calculation_run=last_calculation_run
+                last_calculation_run=summary["last_calculation_run"],
+                period=summary["period"],
+                run_id=summary["run_id"]
             )
         }
-    
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dashboard error: {str(e)}")
-    
+
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
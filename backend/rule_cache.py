@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Optional, Tuple
+import pandas as pd
+from dotenv import load_dotenv
+from calculation_engine import CompiledRules
+
+load_dotenv()
+
+####################### RULE CACHE SETTINGS ######################
+RULE_CACHE_MAX_PERIODS = int(os.environ.get("RULE_CACHE_MAX_PERIODS", 12))
+# Upload endpoints invalidate the cache of the process that served them; other
+# worker processes notice rule uploads through rules_version(). The TTL is a backstop.
+RULE_CACHE_TTL = float(os.environ.get("RULE_CACHE_TTL", 300))
+
+# uploaded_files.file_type of rule uploads
+RULE_FILE_TYPES = ("structured_rule_csv", "ad_hoc_txt")
+
+RuleLoader = Callable[[], Tuple[pd.DataFrame, pd.DataFrame]]
+
+
+def rules_version(cursor) -> int:
+    """
+    Upload seq (migration 0007) of the last committed rule file: changes with
+    every rule upload, whichever worker process served it.
+    """
+    cursor.execute(
+        "SELECT COALESCE(MAX(seq), 0) AS version FROM uploaded_files WHERE file_type IN (%s, %s)",
+        RULE_FILE_TYPES
+    )
+    return int(cursor.fetchone()["version"])
+
+
+class RuleCache:
+    """
+    Per-process LRU of CompiledRules keyed by period ("YYYY-MM"). An entry is
+    only served for the `version` it was loaded at, and a load that overlaps an
+    invalidate() is returned to its caller but not cached.
+    """
+
+    def __init__(self, max_periods: int = RULE_CACHE_MAX_PERIODS, ttl: float = RULE_CACHE_TTL):
+        self.max_periods = max(max_periods, 1)
+        self.ttl = ttl
+        # period -> (rules, start, end, loaded_at, version)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(); a load that started under an older generation is not cached
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "discarded": 0}
+
+    def get(self, period: str, start_date: date, end_date: date, loader: RuleLoader,
+            version: Any = None) -> CompiledRules:
+        """
+        Return compiled rules for `period`, calling `loader()` for (structured_df, ad_hoc_df) on a miss.
+        `version` (e.g. rules_version()) must match the cached entry's for a hit.
+        """
+        with self._lock:
+            entry = self._entries.get(period)
+            if entry and entry[4] == version and time.monotonic() - entry[3] <= self.ttl:
+                self._entries.move_to_end(period)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        # Load and compile outside the lock; a concurrent miss just compiles twice
+        rules = self._build(period, loader())
+
+        with self._lock:
+            if generation != self._generation:
+                # invalidate() ran during the load, which may predate the upload behind it
+                self._stats["discarded"] += 1
+                return rules
+            self._entries[period] = (rules, start_date, end_date, time.monotonic(), version)
+            self._entries.move_to_end(period)
+            while len(self._entries) > self.max_periods:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return rules
+
+    def _build(self, period: str, loaded):
+        df_rules, df_ad_hoc = loaded
+        return CompiledRules(period, df_rules, df_ad_hoc)
+
+    def invalidate(self, valid_from: Optional[date] = None, valid_to: Optional[date] = None):
+        """Drop cached periods overlapping [valid_from, valid_to]; everything when no range is given."""
+        with self._lock:
+            self._generation += 1
+            if valid_from is None or valid_to is None:
+                dropped = list(self._entries)
+            else:
+                dropped = [
+                    period for period, (_, start, end, *_) in self._entries.items()
+                    if start <= valid_to and end >= valid_from
+                ]
+            for period in dropped:
+                del self._entries[period]
+            self._stats["invalidations"] += len(dropped)
+        return dropped
+
+    def stats(self):
+        with self._lock:
+            return {"periods": list(self._entries), "max_periods": self.max_periods, **self._stats}
+
+
+rule_cache = RuleCache()
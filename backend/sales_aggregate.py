@@ -0,0 +1,91 @@
+import sys
+import argparse
+from datetime import date
+from typing import List, Optional
+from database import get_connection
+
+############################ MONTHLY SALES AGGREGATE #########################
+# sales_monthly_agg (migration 0006) holds SUM(quantity) per period and sales
+# group (employee_id, vehicle_type, role, vehicle_model), i.e. exactly what the
+# calculator used to GROUP BY over a month of sales_transactions. It is kept
+# current inside the upload transaction: after a sales file is inserted, only
+# that file's rows are aggregated and added to the existing groups. Rows skipped
+# by INSERT IGNORE (dedup.py) belong to another upload_file_id, so they are
+# never counted twice.
+#
+# Readers (calculator, sql_engine, simulation cache) read one period's groups
+# by primary key prefix instead of scanning the month partition.
+#
+#   python sales_aggregate.py rebuild [--period YYYY-MM]   recompute from sales_transactions
+
+AGG_TABLE = "sales_monthly_agg"
+AGG_COLUMNS = ["period", "employee_id", "vehicle_type", "role", "vehicle_model", "total_quantity", "updated_at"]
+
+# %% because these statements are always executed with parameters
+_AGGREGATE_SELECT = """
+    SELECT DATE_FORMAT(sale_date, '%%Y-%%m') AS period, employee_id, vehicle_type, role, vehicle_model,
+           SUM(quantity) AS total_quantity, NOW() AS updated_at
+    FROM sales_transactions
+    WHERE {where}
+    GROUP BY period, employee_id, vehicle_type, role, vehicle_model
+"""
+
+
+def sales_period(day: date) -> str:
+    """sales_monthly_agg.period of a sale date (or of a period's start date)."""
+    return day.strftime("%Y-%m")
+
+
+def aggregate_upload(cursor, upload_file_id: str) -> int:
+    """
+    Add the rows of one sales upload to their monthly groups. Runs in the
+    caller's transaction, after the upload's rows are inserted; returns the
+    affected row count reported by MySQL.
+    """
+    cursor.execute(f"""
+        INSERT INTO {AGG_TABLE} ({', '.join(AGG_COLUMNS)})
+        {_AGGREGATE_SELECT.format(where="upload_file_id = %s")}
+        ON DUPLICATE KEY UPDATE
+            total_quantity = {AGG_TABLE}.total_quantity + VALUES(total_quantity),
+            updated_at = VALUES(updated_at)
+    """, (upload_file_id,))
+    return cursor.rowcount
+
+
+def rebuild(cursor, period: Optional[str] = None) -> int:
+    """Recompute one period (or every period) from sales_transactions; returns the groups written."""
+    if period is None:
+        cursor.execute(f"DELETE FROM {AGG_TABLE}")
+        where, params = "1 = 1", ()
+    else:
+        year, month = (int(part) for part in period.split("-"))
+        start_date = date(year, month, 1)
+        end_date = date(year + month // 12, month % 12 + 1, 1)
+        cursor.execute(f"DELETE FROM {AGG_TABLE} WHERE period = %s", (period,))
+        where, params = "sale_date >= %s AND sale_date < %s", (start_date, end_date)
+    cursor.execute(
+        f"INSERT INTO {AGG_TABLE} ({', '.join(AGG_COLUMNS)}) {_AGGREGATE_SELECT.format(where=where)}", params
+    )
+    return cursor.rowcount
+
+
+def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the sales_monthly_agg table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--period", help="YYYY-MM (default: every period)")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        groups = rebuild(cursor, args.period)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"{AGG_TABLE}: {groups} sales groups written for {args.period or 'every period'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
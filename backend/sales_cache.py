@@ -0,0 +1,23 @@
+import os
+import pandas as pd
+from dotenv import load_dotenv
+from rule_cache import RuleCache
+
+load_dotenv()
+
+####################### SALES CACHE SETTINGS ######################
+# Aggregated sales of recent periods kept for what-if simulations (simulation.py)
+SALES_CACHE_MAX_PERIODS = int(os.environ.get("SALES_CACHE_MAX_PERIODS", 3))
+# Sales uploads invalidate the cache of the process that served them; the TTL
+# bounds staleness for other worker processes.
+SALES_CACHE_TTL = float(os.environ.get("SALES_CACHE_TTL", 300))
+
+
+class SalesAggregateCache(RuleCache):
+    """Per-process LRU of a period's aggregated sales DataFrame, keyed by period ("YYYY-MM")."""
+
+    def _build(self, period: str, loaded) -> pd.DataFrame:
+        return loaded
+
+
+sales_cache = SalesAggregateCache(SALES_CACHE_MAX_PERIODS, SALES_CACHE_TTL)
@@ -0,0 +1,242 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from dateutil import parser as date_parser
+
+############################ AD-HOC SCHEME PARSER #########################
+# Parses scheme circulars (TXT) for /data-ingestion/upload_ad_hoc_rule.
+#
+#   *SCHEME 3: Festive Drive
+#   - Applicable to: All RMs
+#   - Valid: September 1, 2025 - September 30, 2025
+#   - Sell 5+ SUV units this month: ₹5,000 bonus
+#   - Top performer in each branch: 1.5x base structured incentive
+#
+# The text is read once, line by line: each line is classified as a scheme
+# header, metadata (Applicable to / Valid / NOTES) or a condition line, and a
+# scheme's rows are emitted when the next header (or the end) is reached.
+# Every pattern is compiled once at import, note keywords are pre-lowered
+# once, dates go through a cached strptime fast path, and the bonus is
+# returned already typed (bonus_kind / bonus_value) so the calculator never
+# parses strings.
+
+NOTES_KEYWORDS = [
+    "promotional", "inventory", "base eligibility", "end of month",
+    "schemes are cumulative", "branch target", "requires minimum",
+    "insurance", "registration", "rules may change"
+]
+ROLE_MAPPING = {
+    "asms": "ASM",
+    "rms": "RM",
+    "employees": "ALL",
+    "all roles": "ALL"
+}
+# Used when a scheme has no (parseable) Valid: line
+DEFAULT_VALIDITY = (date(2025, 9, 1), date(2025, 9, 30))
+DATE_FORMATS = ["%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%d %B %Y", "%Y-%m-%d", "%d/%m/%Y"]
+
+BONUS_FIXED = "fixed"
+BONUS_MULTIPLIER = "multiplier"
+BONUS_VARIABLE = "variable"
+
+# ---------- Precompiled patterns ----------
+SCHEME_HEADER = re.compile(r"^\s*\*SCHEME\s(\d+):(.*)$", re.IGNORECASE)
+APPLICABLE_LINE = re.compile(r"^Applicable to:\s*(.*?)\s*(?:Valid:\s*(.*))?$", re.IGNORECASE)
+VALID_LINE = re.compile(r"^Valid:\s*(.*)$", re.IGNORECASE)
+DATE_RANGE_SEPARATOR = re.compile(r"\s+(?:-|–|to)\s+|(?<=[A-Za-z0-9,])-(?=\s*[A-Za-z])", re.IGNORECASE)
+RUPEE_AMOUNT = re.compile(r"₹([\d,]+)")
+MULTIPLIER_OR_VARIABLE = re.compile(r"(\d+(?:\.\d+)?)\s*x\b|Variable", re.IGNORECASE)
+LINE_ROLE = re.compile(r"All\s+([A-Za-z, ]+)")
+STARS = re.compile(r"\*+")
+WHITESPACE = re.compile(r"\s+")
+
+
+# ---------- Keyword matching ----------
+class KeywordMatcher:
+    """
+    Case-insensitive "does the line contain any of these keywords" check.
+    Keywords are lowered once; each line is lowered once and scanned with
+    str.find, which for a handful of short keywords beats a pure-Python
+    Aho-Corasick automaton walking the line character by character.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(k.lower() for k in keywords if k))
+
+    def search(self, text: str) -> Optional[str]:
+        """First keyword found in `text`, or None."""
+        lowered = text.lower()
+        for keyword in self.keywords:
+            if keyword in lowered:
+                return keyword
+        return None
+
+
+NOTES_MATCHER = KeywordMatcher(NOTES_KEYWORDS)
+
+
+# ---------- Field parsers ----------
+def normalize_roles(role_text: str) -> str:
+    """'All RMs and ASMs' -> 'ASM,RM'; unknown text is kept as written."""
+    role_text = role_text.strip()
+    lowered = role_text.lower()
+    roles = [role for key, role in ROLE_MAPPING.items() if key in lowered]
+    if not roles:
+        return role_text
+    if "ALL" in roles:
+        return "ALL"
+    return ",".join(dict.fromkeys(roles))
+
+
+def parse_bonus(line: str) -> Tuple[Any, Optional[str], Optional[float]]:
+    """
+    (bonus_amount, bonus_kind, bonus_value) of a condition line. bonus_amount
+    is what is stored in ad_hoc_rules.bonus_amount: the rupee amount as int,
+    the multiplier text ("1.5x") or "Variable".
+    """
+    rupees = RUPEE_AMOUNT.search(line)
+    if rupees:
+        amount = int(rupees.group(1).replace(",", ""))
+        return amount, BONUS_FIXED, float(amount)
+    other = MULTIPLIER_OR_VARIABLE.search(line)
+    if other:
+        if other.group(1) is not None:
+            return other.group(0).strip(), BONUS_MULTIPLIER, float(other.group(1))
+        return other.group(0), BONUS_VARIABLE, None
+    return None, None, None
+
+
+def parse_bonus_amount(bonus_amount: Any) -> Tuple[Optional[str], Optional[float]]:
+    """(bonus_kind, bonus_value) of an already stored bonus_amount value."""
+    if bonus_amount is None or str(bonus_amount).strip() == "":
+        return None, None
+    text = str(bonus_amount).strip()
+    try:
+        return BONUS_FIXED, float(text.replace(",", ""))
+    except ValueError:
+        pass
+    _, kind, value = parse_bonus(text)
+    return kind, value
+
+
+@lru_cache(maxsize=1024)
+def parse_date(text: str) -> date:
+    # Circulars repeat the same few dates; try the common layouts before dateutil
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return date_parser.parse(text, dayfirst=False).date()
+
+
+@lru_cache(maxsize=256)
+def parse_validity(text: str) -> Tuple[date, date]:
+    """'September 1, 2025 - September 30, 2025' -> (from, to); DEFAULT_VALIDITY when unreadable."""
+    try:
+        parts = DATE_RANGE_SEPARATOR.split(text.strip(), maxsplit=1)
+        if len(parts) == 2:
+            return parse_date(parts[0]), parse_date(parts[1])
+        single = parse_date(parts[0])
+        return single, single
+    except (ValueError, OverflowError):
+        return DEFAULT_VALIDITY
+
+
+def clean_condition(line: str) -> str:
+    """Make condition human-readable instead of underscore format"""
+    line = STARS.sub("", line.strip())
+    return WHITESPACE.sub(" ", line.replace("_", " ")).strip()
+
+
+# ---------- Tokenizer ----------
+class _Scheme:
+    __slots__ = ("scheme_id", "header", "lines", "roles", "validity")
+
+    def __init__(self, scheme_id: str, header: str):
+        self.scheme_id = scheme_id
+        self.header = header
+        self.lines: List[str] = []
+        self.roles = "ALL"
+        self.validity: Optional[Tuple[date, date]] = None
+
+
+def tokenize(text: str) -> Iterator[_Scheme]:
+    """Single pass over `text`, yielding each scheme with its metadata and condition lines."""
+    scheme: Optional[_Scheme] = None
+    for raw in text.splitlines():
+        header = SCHEME_HEADER.match(raw)
+        if header:
+            if scheme is not None:
+                yield scheme
+            scheme = _Scheme(header.group(1), header.group(2).strip("- ").strip())
+            continue
+        if scheme is None:
+            continue
+        line = raw.strip().strip("- ").strip()
+        if not line:
+            continue
+        if not scheme.header:
+            scheme.header = line
+            continue
+        first = line[0].lower()
+        if first == "a":
+            applicable = APPLICABLE_LINE.match(line)
+            if applicable:
+                scheme.roles = normalize_roles(applicable.group(1))
+                if applicable.group(2) and scheme.validity is None:
+                    scheme.validity = parse_validity(applicable.group(2))
+                continue
+        elif first == "v":
+            valid = VALID_LINE.match(line)
+            if valid:
+                if scheme.validity is None:
+                    scheme.validity = parse_validity(valid.group(1))
+                continue
+        scheme.lines.append(line)
+    if scheme is not None:
+        yield scheme
+
+
+# ---------- Rows ----------
+def _scheme_rows(scheme: _Scheme) -> List[Dict[str, Any]]:
+    scheme_id = int(scheme.scheme_id)
+    scheme_name = scheme.header.title()
+    valid_from, valid_to = scheme.validity or DEFAULT_VALIDITY
+    base = {"scheme_id": scheme_id, "scheme_name": scheme_name, "validity_from": valid_from, "validity_to": valid_to}
+    rows = []
+    for line in scheme.lines:
+        if NOTES_MATCHER.search(line) is not None:
+            rows.append({**base, "condition": "", "role": "ALL", "bonus_amount": None,
+                         "bonus_kind": None, "bonus_value": None, "notes": line})
+            continue
+        if line.startswith("NOTES"):
+            continue
+        bonus_amount, bonus_kind, bonus_value = parse_bonus(line)
+        line_role = LINE_ROLE.search(line)
+        rows.append({
+            **base,
+            "condition": clean_condition(line),
+            "role": normalize_roles(line_role.group(1)) if line_role else scheme.roles,
+            "bonus_amount": bonus_amount,
+            "bonus_kind": bonus_kind,
+            "bonus_value": bonus_value,
+            "notes": ""
+        })
+    return rows
+
+
+def parse_schemes(text: str) -> Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(schemes found, ad_hoc_rules rows, invalid schemes) for a whole circular."""
+    found = 0
+    rows: List[Dict[str, Any]] = []
+    invalid: List[Dict[str, Any]] = []
+    for scheme in tokenize(text):
+        found += 1
+        try:
+            rows.extend(_scheme_rows(scheme))
+        except Exception as e:
+            invalid.append({"scheme_id": scheme.scheme_id, "error": str(e)})
+    return found, rows, invalid
@@ -0,0 +1,245 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from calculation_engine import CompiledRules, match_structured_rules, price_ad_hoc_awards
+from sales_cache import SALES_CACHE_MAX_PERIODS, SALES_CACHE_TTL
+
+############################ WHAT-IF SIMULATION #########################
+# Evaluates candidate structured rules against a period's aggregated sales
+# (kept in sales_cache) and reports how payouts would change per employee,
+# branch and rule. Nothing is written. Only totals are computed, not the
+# per-employee `details` lists; sales are profiled once per cached aggregate
+# and the current rules' evaluation is reused while sales and rules are
+# unchanged, so a request costs one small rule match plus array sums.
+
+OVERRIDE_VALUE_COLUMNS = ["min_units", "max_units", "incentive_amount_inr", "bonus_per_unit_inr"]
+# Amounts are rupees; smaller differences are float noise
+DELTA_EPSILON = 0.005
+
+
+# ---------- Candidate rules ----------
+def apply_overrides(structured: pd.DataFrame, overrides: Sequence[Any]) -> Tuple[pd.DataFrame, List[int]]:
+    """
+    Copy of prepared structured rules (CompiledRules.structured) with the
+    RuleOverride list applied in order; also returns the rules each override matched.
+    """
+    rules = structured.copy()
+    if rules.empty:
+        return rules, [0] * len(overrides)
+    matched = []
+    for override in overrides:
+        mask = pd.Series(True, index=rules.index)
+        if override.rule_id is not None:
+            mask &= rules["rule_id"].astype(str) == override.rule_id
+        if override.role is not None:
+            mask &= rules["role"] == override.role.lower()
+        if override.vehicle_type is not None:
+            mask &= rules["vehicle_type"] == override.vehicle_type.lower()
+        for column in OVERRIDE_VALUE_COLUMNS:
+            value = getattr(override, column)
+            if value is not None:
+                rules.loc[mask, column] = value
+        rules.loc[mask, "incentive_amount_inr"] += override.incentive_amount_delta
+        rules.loc[mask, "bonus_per_unit_inr"] += override.bonus_per_unit_delta
+        matched.append(int(mask.sum()))
+    return rules, matched
+
+
+# ---------- Evaluation ----------
+class SalesProfile:
+    """
+    Rule-independent view of a period's aggregated sales (calculator._fetch_sales
+    rows plus the employee's branch), built once per cached DataFrame. Sales
+    groups are reduced to their distinct (role, vehicle_type, quantity) combos:
+    band matching only depends on those, so a candidate rule set is matched
+    against a few hundred combos instead of every sales group.
+    """
+
+    def __init__(self, sales: pd.DataFrame):
+        self.employee_codes, employee_ids = pd.factorize(sales["employee_id"], sort=True)
+        first = sales.groupby("employee_id", sort=True)[["role", "branch"]].first()
+        self.employee_ids = first.index
+        self.roles = first["role"]
+        self.branches = first["branch"].fillna("")
+
+        keys = pd.MultiIndex.from_arrays(
+            [
+                sales["role"].to_numpy(), sales["vehicle_type"].to_numpy(),
+                sales["total_quantity"].astype(int).to_numpy()
+            ],
+        )
+        self.combo_codes, combos = keys.factorize()
+        self.combos = combos.to_frame(index=False, name=["role", "vehicle_type", "total_quantity"])
+        # match_structured_rules reports matches per "employee"; use the combo position
+        self.combos["employee_id"] = range(len(self.combos))
+        self.combos["vehicle_model"] = ""
+
+
+def evaluate(profile: SalesProfile, rules: CompiledRules) -> Dict[str, pd.DataFrame]:
+    """
+    Totals of `rules` over the profiled sales, as calculate_employee_incentives
+    would compute them: `employees` indexed by employee_id and `rules` indexed
+    by (rule_type, rule_id) with amount paid and employees reached.
+    """
+    employees_count = len(profile.employee_ids)
+
+    # ---------- Structured: match combos, then spread to sales groups ----------
+    matched = match_structured_rules(profile.combos, rules.structured)
+    rule_codes, rule_ids = pd.factorize(matched["rule_applied"])
+    combo_amount = np.zeros(len(profile.combos))
+    combo_rule = np.full(len(profile.combos), -1, dtype=np.int64)
+    combo_positions = matched["employee_id"].to_numpy(dtype=np.int64)
+    combo_amount[combo_positions] = matched["amount"].to_numpy(dtype=float)
+    combo_rule[combo_positions] = rule_codes
+
+    group_amount = combo_amount[profile.combo_codes]
+    group_rule = combo_rule[profile.combo_codes]
+    structured = pd.Series(
+        np.bincount(profile.employee_codes, weights=group_amount, minlength=employees_count),
+        index=profile.employee_ids
+    )
+    hit = group_rule >= 0
+    pairs = np.unique(group_rule[hit] * employees_count + profile.employee_codes[hit])
+    structured_rules = pd.DataFrame({
+        "amount": np.bincount(group_rule[hit], weights=group_amount[hit], minlength=len(rule_ids)),
+        "employees": np.bincount(pairs // max(employees_count, 1), minlength=len(rule_ids)),
+    }, index=pd.Index(rule_ids, name="rule_id"))
+
+    # ---------- Ad-hoc: per-role award table priced on the structured totals ----------
+    awards = price_ad_hoc_awards(profile.roles, structured, rules)
+    ad_hoc = awards.groupby("employee_id")["amount"].sum().reindex(profile.employee_ids, fill_value=0.0)
+    ad_hoc_rules = awards.groupby("scheme_name").agg(amount=("amount", "sum"), employees=("employee_id", "nunique"))
+    ad_hoc_rules.index.name = "rule_id"
+
+    employees = pd.DataFrame({
+        "branch": profile.branches,
+        "role": profile.roles,
+        "structured": structured,
+        "ad_hoc": ad_hoc.astype(float),
+    })
+    employees["total"] = employees["structured"] + employees["ad_hoc"]
+    by_rule = pd.concat([structured_rules.assign(rule_type="structured"), ad_hoc_rules.assign(rule_type="ad_hoc")])
+    by_rule = by_rule.reset_index().set_index(["rule_type", "rule_id"])
+    return {"employees": employees, "rules": by_rule}
+
+
+class SimulationCache:
+    """
+    Per period: the SalesProfile of the cached sales DataFrame and the
+    evaluation of the current rules, rebuilt when sales_cache / rule_cache
+    hand out a different object. Entries hold on to that sales DataFrame, so
+    they are bounded by the same LRU size and TTL as sales_cache.
+    """
+
+    def __init__(self, max_periods: int = SALES_CACHE_MAX_PERIODS, ttl: float = SALES_CACHE_TTL):
+        self.max_periods = max(max_periods, 1)
+        self.ttl = ttl
+        # period -> (sales, rules, profile, baseline, stored_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, period: str, sales: pd.DataFrame,
+            rules: CompiledRules) -> Tuple[SalesProfile, Dict[str, pd.DataFrame]]:
+        with self._lock:
+            entry = self._entries.get(period)
+            if entry and time.monotonic() - entry[4] > self.ttl:
+                del self._entries[period]
+                entry = None
+        if entry and entry[0] is sales and entry[1] is rules:
+            with self._lock:
+                if period in self._entries:
+                    self._entries.move_to_end(period)
+            return entry[2], entry[3]
+        profile = entry[2] if entry and entry[0] is sales else SalesProfile(sales)
+        baseline = evaluate(profile, rules)
+        with self._lock:
+            self._entries[period] = (sales, rules, profile, baseline, time.monotonic())
+            self._entries.move_to_end(period)
+            while len(self._entries) > self.max_periods:
+                self._entries.popitem(last=False)
+        return profile, baseline
+
+
+simulation_cache = SimulationCache()
+
+
+# ---------- Comparison ----------
+def _money(value) -> float:
+    return round(float(value), 2)
+
+
+def compare(baseline: Dict[str, pd.DataFrame], simulated: Dict[str, pd.DataFrame], limit: int) -> Dict[str, Any]:
+    """Differences between two evaluate() results, largest absolute changes first."""
+    columns = ["structured", "ad_hoc", "total"]
+    emp = baseline["employees"].join(simulated["employees"][columns], rsuffix="_simulated")
+    for column in columns:
+        emp[f"{column}_delta"] = emp[f"{column}_simulated"] - emp[column]
+    changed = emp[
+        (emp["total_delta"].abs() > DELTA_EPSILON) | (emp["structured_delta"].abs() > DELTA_EPSILON)
+    ]
+    changed = changed.iloc[changed["total_delta"].abs().argsort(kind="mergesort")[::-1]]
+
+    branches = emp.groupby("branch").agg(
+        baseline=("total", "sum"), simulated=("total_simulated", "sum"), employees=("total", "size")
+    )
+    branches["delta"] = branches["simulated"] - branches["baseline"]
+    branches["employees_changed"] = changed.groupby("branch").size().reindex(branches.index, fill_value=0)
+    branches = branches.iloc[branches["delta"].abs().argsort(kind="mergesort")[::-1]]
+
+    rules = baseline["rules"].join(simulated["rules"], how="outer", lsuffix="_baseline", rsuffix="_simulated")
+    rules = rules.fillna(0)
+    rules["delta"] = rules["amount_simulated"] - rules["amount_baseline"]
+    rules = rules[
+        (rules["delta"].abs() > DELTA_EPSILON) | (rules["employees_baseline"] != rules["employees_simulated"])
+    ]
+    rules = rules.iloc[rules["delta"].abs().argsort(kind="mergesort")[::-1]]
+
+    baseline_total, simulated_total = emp["total"].sum(), emp["total_simulated"].sum()
+    return {
+        "totals": {
+            "employees": len(emp),
+            "employees_changed": len(changed),
+            "baseline": _money(baseline_total),
+            "simulated": _money(simulated_total),
+            "delta": _money(simulated_total - baseline_total),
+        },
+        "employees": [
+            {
+                "employee_id": emp_id,
+                "branch": row.branch,
+                "role": row.role,
+                "baseline_total": _money(row.total),
+                "simulated_total": _money(row.total_simulated),
+                "delta": _money(row.total_delta),
+                "structured_delta": _money(row.structured_delta),
+                "ad_hoc_delta": _money(row.ad_hoc_delta),
+            }
+            for emp_id, row in zip(changed.index[:limit], changed.head(limit).itertuples(index=False))
+        ],
+        "branches": [
+            {
+                "branch": branch,
+                "baseline": _money(row.baseline),
+                "simulated": _money(row.simulated),
+                "delta": _money(row.delta),
+                "employees": int(row.employees),
+                "employees_changed": int(row.employees_changed),
+            }
+            for branch, row in zip(branches.index, branches.itertuples(index=False))
+        ],
+        "rules": [
+            {
+                "rule_type": rule_type,
+                "rule_id": rule_id,
+                "baseline": _money(row.amount_baseline),
+                "simulated": _money(row.amount_simulated),
+                "delta": _money(row.delta),
+                "employees_baseline": int(row.employees_baseline),
+                "employees_simulated": int(row.employees_simulated),
+            }
+            for (rule_type, rule_id), row in zip(rules.index, rules.itertuples(index=False))
+        ],
+    }
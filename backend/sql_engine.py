@@ -0,0 +1,353 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import pandas as pd
+from bulk_writer import bulk_insert
+from calculation_engine import CompiledRules, ad_hoc_awards
+from sales_aggregate import sales_period
+
+############################ SQL CALCULATION ENGINE #########################
+# Optional pushdown of the structured-rule matching into MySQL (CALC_ENGINE=sql).
+# A period's sales groups (sales_monthly_agg) are joined to structured_rules
+# on role / vehicle_type and the unit band; ROW_NUMBER() keeps the lowest
+# min_units band per sales group, which is what
+# calculation_engine.match_structured_rules does in pandas.
+# Ad-hoc schemes only depend on the employee's role, so the per-role award
+# table of the cached CompiledRules is joined in; multiplier awards are priced
+# from the employee's structured incentive like in the Python engine.
+#
+# Differences to the Python engine, both only visible on inconsistent data:
+#   - an employee selling under several roles gets the ad-hoc schemes of
+#     MIN(LOWER(role)) instead of the role of its first sales row;
+#   - in query mode, bands with equal min_units are tie-broken by
+#     structured_rules.id (insert mode uses the CompiledRules order).
+#
+# Locking: CREATE TABLE ... SELECT and INSERT ... SELECT read their source
+# tables with shared locks on the latest committed rows, outside the run's
+# consistent snapshot (calculation_runs.source_snapshot). Insert mode therefore
+# reads sales_monthly_agg with a plain SELECT in the snapshot and loads the
+# rows, and the CompiledRules' structured rules, into session temporary
+# tables itself; every later statement only reads temporary tables and the
+# run's own rows. Concurrent sales uploads are never blocked, and the run's
+# source_seq is exactly the uploads it read.
+# Detail lists follow the sales group order (sales_monthly_agg key order, as
+# _fetch_sales returns it) and the award order. JSON_ARRAYAGG has no ORDER BY,
+# so insert mode aggregates over an ordered window instead of a GROUP BY.
+# Role / vehicle_type are compared with the column collation (case-insensitive
+# by default), matching the engine's lower-cased comparison.
+
+# Aggregated sales groups with their structured rule match (NULLs if none).
+MATCH_SQL = """
+    WITH sales AS (
+        SELECT employee_id, role, vehicle_type, vehicle_model, total_quantity
+        FROM sales_monthly_agg
+        WHERE period = %s {employee_sql}
+    ),
+    ranked AS (
+        SELECT
+            s.employee_id, s.role, s.vehicle_model, s.vehicle_type, s.total_quantity AS quantity,
+            r.rule_id,
+            r.incentive_amount_inr + GREATEST(s.total_quantity - r.min_units, 0) * r.bonus_per_unit_inr AS amount,
+            ROW_NUMBER() OVER (
+                PARTITION BY s.employee_id, s.vehicle_type, s.role, s.vehicle_model
+                ORDER BY r.min_units, r.id
+            ) AS band_rank
+        FROM sales s
+        LEFT JOIN structured_rules r
+               ON r.role = s.role AND r.vehicle_type = s.vehicle_type
+              AND s.total_quantity BETWEEN r.min_units AND r.max_units
+              AND r.valid_from <= %s AND r.valid_to >= %s
+    )
+    SELECT
+        employee_id, vehicle_model, vehicle_type, quantity, rule_id, amount,
+        MIN(LOWER(role)) OVER (PARTITION BY employee_id) AS role_key,
+        SUM(CASE WHEN rule_id IS NOT NULL THEN quantity ELSE 0 END) OVER (PARTITION BY employee_id) AS total_units,
+        COALESCE(SUM(amount) OVER (PARTITION BY employee_id), 0) AS structured_incentive
+    FROM ranked
+    WHERE band_rank = 1
+    ORDER BY employee_id, vehicle_type, role, vehicle_model
+"""
+
+TEMP_TABLES = [
+    "tmp_sales_groups", "tmp_structured_rules", "tmp_structured_matches", "tmp_employee_totals", "tmp_ad_hoc_awards", "tmp_employee_ad_hoc"
+]
+
+
+def _match_params(start_date, end_date, employee_ids: Optional[Sequence[str]]):
+    employee_sql = ""
+    params: List[Any] = [sales_period(start_date)]
+    if employee_ids is not None:
+        employee_sql = f"AND employee_id IN ({', '.join(['%s'] * len(employee_ids))})"
+        params.extend(employee_ids)
+    return MATCH_SQL.format(employee_sql=employee_sql), params + [end_date, start_date]
+
+
+# ---------- Query mode: one set-based query, results assembled per employee ----------
+def calculate_incentives_sql(cursor, start_date, end_date, rules: CompiledRules,
+                             employee_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Same output as calculation_engine.calculate_employee_incentives, with matching done by MySQL."""
+    sql, params = _match_params(start_date, end_date, employee_ids)
+    cursor.execute(sql, params)
+
+    results: List[Dict[str, Any]] = []
+    roles: Dict[str, str] = {}
+    current = None
+    for row in cursor.fetchall():
+        if current is None or current["employee_id"] != row["employee_id"]:
+            roles[row["employee_id"]] = row["role_key"] or ""
+            current = {
+                "employee_id": row["employee_id"],
+                "total_units": int(row["total_units"]),
+                "structured_incentive": float(row["structured_incentive"]),
+                "ad_hoc_incentive": 0.0,
+                "total_incentive": 0.0,
+                "details": {"structured": [], "ad_hoc": []}
+            }
+            results.append(current)
+        if row["rule_id"] is not None:
+            current["details"]["structured"].append({
+                "vehicle_model": row["vehicle_model"],
+                "vehicle_type": row["vehicle_type"],
+                "quantity": int(row["quantity"]),
+                "rule_applied": row["rule_id"],
+                "amount": float(row["amount"])
+            })
+
+    # ---------- Ad-hoc awards joined per role ----------
+    awards = ad_hoc_awards(
+        pd.Series(roles, dtype=object),
+        pd.Series({emp["employee_id"]: emp["structured_incentive"] for emp in results}, dtype=float),
+        rules
+    )
+    for emp in results:
+        ad_hoc_total, emp["details"]["ad_hoc"] = awards.get(emp["employee_id"], (0.0, []))
+        emp["ad_hoc_incentive"] = ad_hoc_total
+        emp["total_incentive"] = emp["structured_incentive"] + ad_hoc_total
+    return results
+
+
+# ---------- Insert mode: results written with INSERT ... SELECT ----------
+def _statement_stats(table: str, rows: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "table": table,
+        "rows": rows,
+        "batches": 1,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else float(rows),
+    }
+
+
+def _drop_temp_tables(cursor):
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {', '.join(TEMP_TABLES)}")
+
+
+def insert_results_sql(cursor, run_id: str, period: str, start_date, end_date, rules: CompiledRules,
+                       calculated_at) -> Dict[str, Any]:
+    """
+    Compute and insert a run's incentive_calculations and incentive_rule_applications rows
+    with the matching and aggregation done by MySQL. Session temporary tables hold the
+    intermediate sets (MySQL reads a temporary table at most once per statement). The caller
+    owns the transaction, opened with calculation_runs.source_snapshot().
+    Returns employee / sales group counts and write stats per table.
+    """
+    _drop_temp_tables(cursor)
+    try:
+        # ---------- Source rows: consistent reads in the caller's snapshot, no locks ----------
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_sales_groups (
+                employee_id VARCHAR(50) NOT NULL, role VARCHAR(50) NOT NULL, vehicle_type VARCHAR(50) NOT NULL,
+                vehicle_model VARCHAR(100) NOT NULL, total_quantity BIGINT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            SELECT employee_id, role, vehicle_type, vehicle_model, total_quantity
+            FROM sales_monthly_agg
+            WHERE period = %s
+        """, (sales_period(start_date),))
+        sales_columns = ["employee_id", "role", "vehicle_type", "vehicle_model", "total_quantity"]
+        sales_rows = cursor.fetchall()
+        sales_groups = bulk_insert(
+            cursor, "tmp_sales_groups", sales_columns, ([row[c] for c in sales_columns] for row in sales_rows)
+        )["rows"]
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_structured_rules (
+                rule_pos INT NOT NULL, rule_id VARCHAR(50) NULL, role VARCHAR(50) NULL,
+                vehicle_type VARCHAR(50) NULL, min_units INT NOT NULL, max_units INT NOT NULL,
+                incentive_amount_inr DOUBLE NOT NULL, bonus_per_unit_inr DOUBLE NOT NULL, INDEX (role, vehicle_type)
+            )
+        """)
+        structured = rules.structured
+        if not structured.empty:
+            bulk_insert(
+                cursor, "tmp_structured_rules",
+                ["rule_pos", "rule_id", "role", "vehicle_type", "min_units", "max_units",
+                 "incentive_amount_inr", "bonus_per_unit_inr"],
+                (
+                    (pos, rule_id, role, vehicle_type, int(min_units), int(max_units), float(amount), float(bonus))
+                    for pos, (rule_id, role, vehicle_type, min_units, max_units, amount, bonus) in enumerate(zip(
+                        structured["rule_id"], structured["role"], structured["vehicle_type"],
+                        structured["min_units"], structured["max_units"],
+                        structured["incentive_amount_inr"], structured["bonus_per_unit_inr"]
+                    ))
+                )
+            )
+
+        # ---------- Best structured band per sales group ----------
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_structured_matches
+            SELECT employee_id, role, vehicle_model, vehicle_type, quantity, rule_id, amount
+            FROM (
+                SELECT
+                    s.employee_id, s.role, s.vehicle_model, s.vehicle_type, s.total_quantity AS quantity, r.rule_id,
+                    r.incentive_amount_inr + GREATEST(s.total_quantity - r.min_units, 0) * r.bonus_per_unit_inr AS amount,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY s.employee_id, s.vehicle_type, s.role, s.vehicle_model
+                        ORDER BY r.min_units, r.rule_pos
+                    ) AS band_rank
+                FROM tmp_sales_groups s
+                JOIN tmp_structured_rules r
+                  ON r.role = s.role AND r.vehicle_type = s.vehicle_type
+                 AND s.total_quantity BETWEEN r.min_units AND r.max_units
+            ) ranked
+            WHERE band_rank = 1
+        """)
+
+        # ---------- Per-employee role and structured totals ----------
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_employee_totals (PRIMARY KEY (employee_id))
+            SELECT
+                e.employee_id, e.role_key, COALESCE(m.total_units, 0) AS total_units,
+                COALESCE(m.structured_incentive, 0) AS structured_incentive, m.structured_details
+            FROM (
+                SELECT employee_id, MIN(LOWER(role)) AS role_key FROM tmp_sales_groups GROUP BY employee_id
+            ) e
+            LEFT JOIN (
+                SELECT employee_id, total_units, structured_incentive, structured_details
+                FROM (
+                    SELECT
+                        employee_id, SUM(quantity) OVER w AS total_units, SUM(amount) OVER w AS structured_incentive,
+                        JSON_ARRAYAGG(JSON_OBJECT(
+                            'vehicle_model', vehicle_model, 'vehicle_type', vehicle_type, 'quantity', quantity,
+                            'rule_applied', rule_id, 'amount', CAST(amount AS DOUBLE)
+                        )) OVER w AS structured_details,
+                        ROW_NUMBER() OVER (PARTITION BY employee_id) AS employee_row
+                    FROM tmp_structured_matches
+                    WINDOW w AS (
+                        PARTITION BY employee_id ORDER BY vehicle_type, role, vehicle_model
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    )
+                ) ordered
+                WHERE employee_row = 1
+            ) m ON m.employee_id = e.employee_id
+        """)
+        employees = cursor.rowcount
+
+        # ---------- Ad-hoc award table per role (from CompiledRules), priced per employee ----------
+        cursor.execute("SELECT DISTINCT role_key FROM tmp_employee_totals")
+        award_table = rules.award_table([row["role_key"] or "" for row in cursor.fetchall()])
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_ad_hoc_awards (
+                role_key VARCHAR(50) NOT NULL, award_order INT NOT NULL, scheme_name VARCHAR(255) NOT NULL,
+                conditions TEXT NOT NULL, bonus_kind VARCHAR(20) NOT NULL, fixed_amount DOUBLE NOT NULL,
+                multiplier DOUBLE NULL, needs_review TINYINT NOT NULL, INDEX (role_key)
+            )
+        """)
+        if not award_table.empty:
+            cursor.executemany(
+                "INSERT INTO tmp_ad_hoc_awards VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                [
+                    (role_key, int(order), scheme_name, condition, kind, float(fixed),
+                     None if pd.isna(multiplier) else float(multiplier), int(bool(review)))
+                    for role_key, order, scheme_name, condition, kind, fixed, multiplier, review
+                    in award_table.itertuples(index=False, name=None)
+                ]
+            )
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_employee_ad_hoc (PRIMARY KEY (employee_id))
+            SELECT employee_id, ad_hoc_incentive, ad_hoc_details
+            FROM (
+                SELECT
+                    t.employee_id,
+                    SUM(a.fixed_amount + GREATEST(COALESCE(a.multiplier, 1) - 1, 0) * t.structured_incentive)
+                        OVER w AS ad_hoc_incentive,
+                    JSON_ARRAYAGG(JSON_OBJECT(
+                        'scheme_name', a.scheme_name, 'condition', a.conditions,
+                        'amount', CAST(a.fixed_amount + GREATEST(COALESCE(a.multiplier, 1) - 1, 0) * t.structured_incentive
+                                       AS DOUBLE),
+                        'bonus_kind', a.bonus_kind, 'multiplier', a.multiplier,
+                        'needs_review', IF(a.needs_review, CAST('true' AS JSON), CAST('false' AS JSON))
+                    )) OVER w AS ad_hoc_details,
+                    ROW_NUMBER() OVER (PARTITION BY t.employee_id) AS employee_row
+                FROM tmp_employee_totals t
+                JOIN tmp_ad_hoc_awards a ON a.role_key = t.role_key
+                WINDOW w AS (
+                    PARTITION BY t.employee_id ORDER BY a.award_order
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                )
+            ) ordered
+            WHERE employee_row = 1
+        """)
+
+        # ---------- incentive_calculations ----------
+        started = time.perf_counter()
+        cursor.execute("""
+            INSERT INTO incentive_calculations (
+                id, run_id, employee_id, period, total_units, total_incentive, structured_incentive,
+                ad_hoc_incentive, calculation_date, details, created_at
+            )
+            SELECT
+                UUID(), %s, t.employee_id, %s, t.total_units,
+                t.structured_incentive + COALESCE(h.ad_hoc_incentive, 0),
+                t.structured_incentive, COALESCE(h.ad_hoc_incentive, 0), %s,
+                JSON_OBJECT(
+                    'structured', COALESCE(t.structured_details, JSON_ARRAY()),
+                    'ad_hoc', COALESCE(h.ad_hoc_details, JSON_ARRAY())
+                ),
+                %s
+            FROM tmp_employee_totals t
+            LEFT JOIN tmp_employee_ad_hoc h ON h.employee_id = t.employee_id
+        """, (run_id, period, calculated_at, calculated_at))
+        calc_stats = _statement_stats("incentive_calculations", cursor.rowcount, time.perf_counter() - started)
+
+        # ---------- incentive_rule_applications (structured, then ad-hoc) ----------
+        started = time.perf_counter()
+        cursor.execute("""
+            INSERT INTO incentive_rule_applications (
+                id, result_id, run_id, employee_id, period, rule_type, rule_id, vehicle_model,
+                vehicle_type, quantity, calculation_details, incentive_amount, created_at
+            )
+            SELECT UUID(), ic.id, ic.run_id, x.employee_id, ic.period, 'structured', x.rule_id, x.vehicle_model,
+                   x.vehicle_type, x.quantity, NULL, x.amount, %s
+            FROM tmp_structured_matches x
+            JOIN incentive_calculations ic
+              ON ic.run_id = %s AND ic.employee_id = x.employee_id AND ic.period = %s
+        """, (calculated_at, run_id, period))
+        application_rows = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO incentive_rule_applications (
+                id, result_id, run_id, employee_id, period, rule_type, rule_id, vehicle_model,
+                vehicle_type, quantity, calculation_details, incentive_amount, created_at
+            )
+            SELECT UUID(), ic.id, ic.run_id, ic.employee_id, ic.period, 'ad_hoc', a.scheme_name, NULL,
+                   NULL, NULL, a.conditions,
+                   a.fixed_amount + GREATEST(COALESCE(a.multiplier, 1) - 1, 0) * ic.structured_incentive, %s
+            FROM tmp_employee_totals t
+            JOIN tmp_ad_hoc_awards a ON a.role_key = t.role_key
+            JOIN incentive_calculations ic
+              ON ic.run_id = %s AND ic.employee_id = t.employee_id AND ic.period = %s
+        """, (calculated_at, run_id, period))
+        application_rows += cursor.rowcount
+        application_stats = _statement_stats(
+            "incentive_rule_applications", application_rows, time.perf_counter() - started
+        )
+
+        return {
+            "employees": employees,
+            "sales_groups": sales_groups,
+            "write_stats": calc_stats,
+            "application_write_stats": application_stats,
+        }
+    finally:
+        _drop_temp_tables(cursor)
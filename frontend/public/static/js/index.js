@@ -327,6 +327,36 @@ document.getElementById('addAdhocBtn').addEventListener('click', () => {
 // CALCULATION SYSTEM - SIMPLIFIED
 // ================================
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
+async function pollCalculationJob(jobId, statusText) {
+    while (true) {
+        const response = await fetch(`${API_URL}/calculator/api/incentives/jobs/${jobId}`);
+        if (!response.ok) {
+            throw new Error(`Job status failed with status ${response.status}`);
+        }
+        const job = (await response.json()).data;
+
+        if (job.status === 'completed') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Calculation failed');
+        }
+
+        let progress = `Processing (${job.stage})...`;
+        if (job.employees_total) {
+            progress = `Processing (${job.stage}): ${job.employees_done.toLocaleString()} / ${job.employees_total.toLocaleString()} employees`;
+            if (job.eta_seconds !== null) {
+                progress += `, ~${Math.ceil(job.eta_seconds)}s left`;
+            }
+        }
+        statusText.textContent = progress;
+
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
 document.getElementById('runCalcBtn').addEventListener('click', async () => {
     const month = document.getElementById('calcMonth').value;
 
@@ -349,7 +379,7 @@ document.getElementById('runCalcBtn').addEventListener('click', async () => {
     const startTime = Date.now();
 
     try {
-        // Call the API
+        // Queue the calculation job
         const response = await fetch(`${API_URL}/calculator/api/incentives/calculate`, {
             method: 'POST',
             headers: {
@@ -362,9 +392,16 @@ document.getElementById('runCalcBtn').addEventListener('click', async () => {
             throw new Error(`API call failed with status ${response.status}`);
         }
 
-        const data = await response.json();
+        const queued = await response.json();
+        if (!queued.status) {
+            throw new Error(queued.message || 'Unknown error from API');
+        }
 
-        if (data.status) {
+        // Poll the job until it finishes, showing progress meanwhile
+        const job = await pollCalculationJob(queued.job_id, statusText);
+        const data = job.result;
+
+        if (data && data.status) {
             const incentives = data.data;
 
             // Calculate metrics
@@ -403,26 +440,40 @@ document.getElementById('viewResultsBtn').addEventListener('click', () => {
     loadIncentiveResults();
 });
 
+document.getElementById('loadMoreResultsBtn').addEventListener('click', () => {
+    loadIncentiveResults(resultsNextCursor);
+});
+
 // ================================
 // LOAD INCENTIVE RESULTS FROM API
 // ================================
 
-async function loadIncentiveResults() {
+// next_cursor of the last loaded page; null once every page is shown
+let resultsNextCursor = null;
+
+async function loadIncentiveResults(cursor = null) {
     const tbody = document.getElementById('resultsTableBody');
     const totalRecordsEl = document.getElementById('resultsTotalRecords');
     const totalIncentivesEl = document.getElementById('resultsTotalIncentives');
     const topPerformerEl = document.getElementById('resultsTopPerformer');
-    // Show loading
-    tbody.innerHTML = '<tr><td colspan="9" style="text-align:center;padding:2rem;">Loading results...</td></tr>';
+    const loadMoreBtn = document.getElementById('loadMoreResultsBtn');
+    // Show loading (a first page replaces the table, later pages are appended)
+    loadMoreBtn.style.display = 'none';
+    if (!cursor) {
+        tbody.innerHTML = '<tr><td colspan="9" style="text-align:center;padding:2rem;">Loading results...</td></tr>';
+    }
 
     try {
-        const response = await fetch(`${API_URL}/results/GETincentiveresults`);
+        // Results are paginated server-side; fetch one page, "Load More" follows next_cursor
+        const url = `${API_URL}/results/GETincentiveresults` + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : '');
+        const response = await fetch(url);
         if (!response.ok) throw new Error(`API failed with status ${response.status}`);
 
         const data = await response.json();
         if (!data.status) throw new Error(data.message || 'Failed to fetch results');
+        resultsNextCursor = data.next_cursor || null;
 
-        // Update summary info
+        // Update summary info (summary covers every page)
         const summary = data.summary || {};
         if (totalRecordsEl) totalRecordsEl.textContent = (summary.total_records || 0).toLocaleString();
         if (totalIncentivesEl) totalIncentivesEl.textContent = '₹' + (summary.total_incentives || 0).toLocaleString('en-IN');
@@ -432,9 +483,9 @@ async function loadIncentiveResults() {
         }
 
         // Clear table
-        tbody.innerHTML = '';
+        if (!cursor) tbody.innerHTML = '';
 
-        if (!data.data || data.data.length === 0) {
+        if (!cursor && (!data.data || data.data.length === 0)) {
             tbody.innerHTML = '<tr><td colspan="9" style="text-align:center;padding:2rem;color:gray;">No results found. Please run calculation first.</td></tr>';
             switchScreen('results');
             return;
@@ -463,6 +514,7 @@ async function loadIncentiveResults() {
             tbody.appendChild(row);
         });
 
+        if (resultsNextCursor) loadMoreBtn.style.display = '';
         switchScreen('results');
 
     } catch (err) {
@@ -485,7 +537,7 @@ async function showBreakdown(employeeId) {
     modal.classList.add('active');
 
     try {
-        const response = await fetch(`${API_URL}/results/GETincentiveresults`);
+        const response = await fetch(`${API_URL}/results/GETincentiveresults?employee_id=${encodeURIComponent(employeeId)}&limit=1`);
         if (!response.ok) throw new Error(`API failed with status ${response.status}`);
         const data = await response.json();
         if (!data.status) throw new Error('Failed to fetch breakdown data');